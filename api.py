@@ -4,161 +4,316 @@ from spotipy.oauth2 import SpotifyOAuth
 import os
 import base64
 import logging
+import time
+from collections import deque
 from config import Config  
-from flask import session, redirect, url_for
+from flask import session, redirect, url_for, has_request_context
 import requests
-from spotipy.cache_handler import FlaskSessionCacheHandler
+import asyncio
+import httpx
+import metrics
+from cache import artist_cache, user_profiles
+from ratelimit import ScheduledSpotify, INTERACTIVE
+from http_pool import get_http_session
+from session_store import (
+    ServerSessionCacheHandler, SessionTokenManager, get_session_store, current_session_id, start_session, end_session
+)
+from async_client import AsyncSpotifyClient, iter_offset_pages_async, get_async_bridge, run_async
+from library_index import (
+    PlaylistIndex, ArtistIndex, TrackIndex, playlist_indexes, artist_indexes, track_indexes, playlist_scans,
+    library_locks
+)
+from bulk import (
+    run_bulk_async, BulkReport, SAVED_TRACKS_DELETE_LIMIT, ARTISTS_UNFOLLOW_LIMIT, PLAYLIST_ADD_LIMIT,
+    PLAYLIST_REMOVE_LIMIT
+)
+from cleanup import cleanup_plan, MATCH_ALL
+from dedupe import find_duplicates
+from playlist_scan import PlaylistOverlapIndex, changed_playlists, CONTAINED_THRESHOLD, SHARED_MIN_PLAYLISTS
+from library_store import (
+    get_library_store, track_row, artist_row, playlist_row, playlist_track_row,
+    SAVED_TRACKS, FOLLOWED_ARTISTS, PLAYLISTS, PLAYLIST_ITEMS
+)
 
 # Configuração do logger
 logger = logging.getLogger(__name__)
 
+SCOPE = (
+    "user-library-read user-library-modify playlist-read-private playlist-modify-public "
+    "playlist-modify-private user-follow-read user-follow-modify"
+)
+
+# Tamanho máximo de página aceito pelos endpoints de biblioteca
+SAVED_TRACKS_PAGE_SIZE = 50
+FOLLOWED_ARTISTS_PAGE_SIZE = 50
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLIST_ITEMS_PAGE_SIZE = 100
+
+# Campos lidos de cada item de playlist (reduz o payload de playlists grandes)
+PLAYLIST_ITEM_FIELDS = 'total,items(track(id,type,name,duration_ms,external_ids(isrc),artists(name),album(name)))'
+
+# Rótulo das trocas de código e renovações de token nas métricas
+TOKEN_ENDPOINT = 'POST accounts:api/token'
+
 class SpotifyHandlerError(Exception):
     """Classe de exceção personalizada para erros do SpotifyHandler."""
     pass
 
-class SpotifyHandler:
-    def __init__(self):
-        self.scope = "user-library-read user-library-modify playlist-modify-public user-follow-read user-follow-modify"
-        
-        # Cria um gerenciador de cache isolado para cada usuário usando a sessão do Flask
-        cache_handler = FlaskSessionCacheHandler(session)
+class AmbiguousArtistError(SpotifyHandlerError):
+    """O nome informado corresponde a mais de um artista da biblioteca.
+
+    `candidates` traz os artistas encontrados (ver LibraryStore.saved_artists_by_name)
+    para que o usuário escolha pelo ID.
+    """
+
+    def __init__(self, artist_name, candidates):
+        super().__init__(f'Mais de um artista da biblioteca se chama "{artist_name}".')
+        self.artist_name = artist_name
+        self.candidates = candidates
 
-        self.sp_oauth = SpotifyOAuth(
+def is_retryable_error(error):
+    """Erros de rede, 429 e 5xx podem ser tentados de novo; os demais 4xx não."""
+    if isinstance(error, spotipy.exceptions.SpotifyException):
+        return error.http_status in (None, 429) or error.http_status >= 500
+    return isinstance(error, (requests.exceptions.RequestException, httpx.TransportError))
+
+_oauth_manager = None
+
+def get_oauth_manager():
+    """Retorna o SpotifyOAuth compartilhado pelo processo.
+
+    O cache handler lê a sessão do servidor da requisição atual (ID no cookie do
+    Flask), então o mesmo handler continua isolando o token de cada usuário.
+    """
+    global _oauth_manager
+    if _oauth_manager is None:
+        _oauth_manager = SpotifyOAuth(
             client_id=Config.SPOTIFY_CLIENT_ID,
             client_secret=Config.SPOTIFY_CLIENT_SECRET,
             redirect_uri=Config.REDIRECT_URI,
-            scope=self.scope,
+            scope=SCOPE,
             show_dialog=True,
-            cache_handler=cache_handler  # O Spotipy agora respeita a individualidade dos usuários
+            cache_handler=ServerSessionCacheHandler(),
+            requests_session=get_http_session(),
+            requests_timeout=Config.SPOTIFY_REQUEST_TIMEOUT
         )
+        _oauth_manager.OAUTH_AUTHORIZE_URL = f"{Config.SPOTIFY_ACCOUNTS_URL}/authorize"
+        _oauth_manager.OAUTH_TOKEN_URL = f"{Config.SPOTIFY_ACCOUNTS_URL}/api/token"
+    return _oauth_manager
+
+class SpotifyHandler:
+    def __init__(self, priority=INTERACTIVE):
+        self.scope = SCOPE
+        self.sp_oauth = get_oauth_manager()
         self.sp = None
+        self.token_info = None
+        self.user_id = None
+        self.priority = priority  # Prioridade das chamadas no token bucket compartilhado
+        self.store = get_library_store()
+        self.session_tokens = None  # SessionTokenManager dos handlers criados por from_session
+        self._aio = None
+
+    @classmethod
+    def from_session(cls, session_id, user_id, priority=INTERACTIVE):
+        """Cria um handler fora de uma requisição Flask (ex.: jobs em segundo plano).
+
+        O token vem da sessão no servidor e é renovado por ela sempre que expirar.
+        Levanta SessionExpired se a sessão já tiver sido encerrada.
+        """
+        handler = cls(priority=priority)
+        handler.session_tokens = SessionTokenManager(session_id, handler.sp_oauth.is_token_expired, handler._refresh_token)
+        handler._set_token(handler.session_tokens.get_token_info())
+        handler.user_id = user_id
+        return handler
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @user_id.setter
+    def user_id(self, user_id):
+        # As respostas do usuário no cache de HTTP ficam separadas pelo ID dele
+        self._user_id = user_id
+        if self.sp is not None:
+            self.sp.cache_owner = user_id
+
+    def _set_token(self, token_info):
+        self.token_info = token_info
+        # Cliente leve por requisição: só troca o token, as conexões vêm do pool do processo
+        # Fora de requisições, o token é lido (e renovado) pela sessão a cada chamada
+        auth = {'auth_manager': self.session_tokens} if self.session_tokens else {'auth': token_info['access_token']}
+        self.sp = ScheduledSpotify(
+            requests_session=get_http_session(), requests_timeout=Config.SPOTIFY_REQUEST_TIMEOUT,
+            priority=self.priority, **auth
+        )
+        self.sp.prefix = Config.SPOTIFY_API_URL
+        self.sp.cache_owner = self.user_id
+
+    @property
+    def aio(self):
+        """Contraparte assíncrona com o mesmo token, para as operações com muitas chamadas."""
+        if self._aio is None or self._aio.token_info is not self.token_info:
+            self._aio = AsyncSpotifyHandler(self.token_info, self.user_id, self.priority, self.session_tokens)
+        self._aio.user_id = self._aio.user_id or self.user_id
+        return self._aio
 
     def get_auth_url(self):
         """Retorna a URL de autorização do Spotify."""
         return self.sp_oauth.get_authorize_url()
 
     def get_access_token(self, code=None):
-        """Obtém e renova o token de acesso usando o código de autenticação ou refresh_token."""
+        """Obtém e renova o token de acesso usando o código de autenticação ou refresh_token.
+
+        Com `code` (login), abre uma sessão nova no servidor. Sem ele, lê o token da
+        sessão atual e o renova se expirou; a renovação é única por sessão, mesmo com
+        requisições simultâneas (ver session_store). Retorna None se não houver sessão.
+        """
         try:
             if code:
-                token_info = self.sp_oauth.get_access_token(code=code)
+                # Login (talvez de outra conta): troca o código sem reaproveitar o token da sessão
+                with metrics.timed_call(TOKEN_ENDPOINT):
+                    token_info = self.sp_oauth.get_access_token(code=code, check_cache=False)
+                start_session(token_info)
             else:
-                token_info = session.get('spotify_token_info')
-                if token_info and self.sp_oauth.is_token_expired(token_info):
-                    token_info = self.sp_oauth.refresh_access_token(token_info['refresh_token'])
+                token_info = get_session_store().fresh_token(
+                    current_session_id(), self.sp_oauth.is_token_expired, self._refresh_token
+                )
+                if token_info is None:
+                    return None
 
-            # Armazenar o token renovado ou obtido na sessão
-            session['spotify_token_info'] = token_info
-            self.sp = spotipy.Spotify(auth=token_info['access_token'])
+            self._set_token(token_info)
             return token_info
         except spotipy.exceptions.SpotifyException as e:
             logger.error(f"Erro ao obter ou renovar o token de acesso: {e}")
             raise SpotifyHandlerError(f"Erro ao obter ou renovar o token de acesso: {e}")
 
+    def _refresh_token(self, token_info):
+        with metrics.timed_call(TOKEN_ENDPOINT):
+            token_info = self.sp_oauth.refresh_access_token(token_info['refresh_token'])
+        logger.info("Token renovado com sucesso.")
+        return token_info
+
     def is_authenticated(self):
         """Verifica se o usuário está autenticado."""
-        return 'spotify_token_info' in session and self.sp is not None
+        return self.token_info is not None and self.sp is not None
 
     def logout(self):
         """Remove a instância do cliente Spotify."""
         self.sp = None
-        session.clear() # Limpa o cookie do navegador do usuário
+        self.token_info = None
+        end_session()  # Apaga a sessão no servidor e limpa o cookie do navegador
 
-    def create_playlist(self, playlist_name, artist_list):
+    def create_playlist(self, playlist_name, artist_list, progress=None):
         """Cria uma playlist no Spotify baseada em uma lista de artistas."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        self.get_user_id()
+        return run_async(self.aio.create_playlist(playlist_name, artist_list, progress))
 
-        if not playlist_name or not artist_list:
-            raise SpotifyHandlerError("Nome da playlist e lista de artistas são obrigatórios")
-
-        track_ids = []
-        try:
-            user_id = self.sp.me()["id"]
-
-            for artist_name in artist_list:
-                artist_search = self.sp.search(q=f'artist:"{artist_name.strip()}"', type="artist", limit=1)
-                if artist_search['artists']['items']:
-                    artist_id = artist_search['artists']['items'][0]['id']
-                    results = self.sp.artist_top_tracks(artist_id)
-                    track_ids.extend([track["id"] for track in results['tracks']])
-                else:
-                    logger.warning(f"Artista '{artist_name}' não encontrado.")
-
-            track_ids = list(set(track_ids))
-            if track_ids:
-                playlist = self.sp.user_playlist_create(user_id, playlist_name)
-                self.sp.user_playlist_add_tracks(user_id, playlist["id"], track_ids)
-                logger.info(f'Playlist "{playlist_name}" criada com {len(track_ids)} músicas.')
-            else:
-                raise SpotifyHandlerError("Nenhuma música encontrada para adicionar à playlist.")
-        except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao criar a playlist: {e}")
-            raise SpotifyHandlerError(f"Erro ao criar a playlist: {e}")
+    def resolve_artist_id(self, artist_name):
+        """Busca o ID do artista pelo nome (com cache); retorna None se não houver resultado."""
+        return run_async(self.aio.resolve_artist_id(artist_name))
 
     def remove_playlist(self, playlist_id):
         """Remove uma playlist do usuário."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
         try:
-            user_id = self.sp.me()["id"]
+            user_id = self.get_user_id()
             self.sp.user_playlist_unfollow(user_id, playlist_id)
+            self.store.delete_playlists(user_id, [playlist_id])
             logger.info(f'Playlist com ID {playlist_id} removida com sucesso.')
         except spotipy.exceptions.SpotifyException as e:
             logger.error(f"Erro ao remover a playlist: {e}")
             raise SpotifyHandlerError(f"Erro ao remover a playlist: {e}")
 
-    def remove_liked_tracks(self, track_ids=None, artist_list=None):
-        """Remove músicas curtidas do usuário, com base em IDs de faixas ou artistas."""
+    def remove_playlists(self, playlist_ids, progress=None):
+        """Remove várias playlists em paralelo e retorna um BulkReport por playlist."""
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        self.get_user_id()
+        return run_async(self.aio.remove_playlists(playlist_ids, progress))
+
+    def remove_liked_tracks(self, track_ids=None, artist_list=None, artist_ids=None, progress=None):
+        """Remove músicas curtidas do usuário, com base em IDs de faixas ou artistas.
+
+        Os artistas podem vir por nome (`artist_list`) ou por ID (`artist_ids`). Cada nome
+        precisa corresponder a um único artista da biblioteca; se houver mais de um, nada
+        é removido e AmbiguousArtistError traz os candidatos.
+
+        Retorna um BulkReport com o resultado de cada ID.
+        """
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
 
         try:
-            if track_ids:
-                self.sp.current_user_saved_tracks_delete(tracks=track_ids)
-            elif artist_list:
-                for artist in artist_list:
-                    results = self.sp.search(q=f"artist:{artist}", type="track", limit=50)
-                    tracks = results['tracks']['items']
-                    if tracks:
-                        track_ids = [track["id"] for track in tracks]
-                        self.sp.current_user_saved_tracks_delete(tracks=track_ids)
+            if not track_ids and (artist_list or artist_ids):
+                # Consulta o índice artista → músicas da própria biblioteca do usuário, em vez
+                # de buscar no catálogo inteiro: remove todas as curtidas do artista, e só elas.
+                self.sync_saved_tracks()
+                user_id = self.get_user_id()
+                artist_ids = list(artist_ids or [])
+                for artist in artist_list or []:
+                    candidates = self.store.saved_artists_by_name(user_id, artist)
+                    if len(candidates) > 1:
+                        raise AmbiguousArtistError(artist, candidates)
+                    if candidates:
+                        artist_ids.append(candidates[0]['id'])
                     else:
-                        logger.warning(f"Nenhuma música encontrada para o artista: {artist}")
-            else:
+                        logger.warning(f"Nenhuma música curtida encontrada para o artista: {artist}")
+                track_ids = []
+                for artist_id in dict.fromkeys(artist_ids):
+                    track_ids.extend(self.store.saved_track_ids_by_artist(user_id, artist_id))
+            elif not track_ids:
                 results = self.sp.current_user_saved_tracks(limit=50)
                 track_ids = [item['track']['id'] for item in results['items']]
-                if track_ids:
-                    self.sp.current_user_saved_tracks_delete(tracks=track_ids)
+
+            self.get_user_id()
+            return run_async(self.aio.remove_liked_tracks(track_ids, progress))
         except spotipy.exceptions.SpotifyException as e:
             logger.error(f"Erro ao remover músicas curtidas: {e}")
             raise SpotifyHandlerError(f"Erro ao remover músicas curtidas: {e}")
 
-    def get_liked_tracks(self, limit=50, offset=0):
-        """Obtém as músicas curtidas pelo usuário."""
+    def remove_playlist_items(self, playlist_id, items, progress=None):
+        """Remove ocorrências específicas (uri + posição) de uma playlist; ver AsyncSpotifyHandler."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        self.get_user_id()
+        return run_async(self.aio.remove_playlist_items(playlist_id, items, progress))
 
-        try:
-            liked_tracks = self.sp.current_user_saved_tracks(limit=limit, offset=offset)
-
-            if not liked_tracks['items']:
-                logger.info("Nenhuma música curtida encontrada.")
-                return []
-
-            # Formatar o retorno
-            tracks = []
-            for item in liked_tracks['items']:
-                track_info = item['track']
-                tracks.append({
-                    'title': track_info['name'],
-                    'artist': ', '.join(artist['name'] for artist in track_info['artists'])
-                })
-
-            return tracks
-        except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao obter músicas curtidas: {e}")
-            raise SpotifyHandlerError(f"Erro ao obter músicas curtidas: {e}")
+    def remove_duplicates(self, track_ids, playlist_items, progress=None):
+        """Aplica as remoções sugeridas por find_library_duplicates.
+
+        `playlist_items` mapeia o ID da playlist para as ocorrências a remover. O
+        BulkReport usa o ID da faixa para curtidas e `playlist_id:posição` para playlists.
+        """
+        report = BulkReport()
+        total = len(track_ids) + sum(len(items) for items in playlist_items.values())
+
+        def track_progress(track_report, _):
+            if progress:
+                progress(track_report, total)
+
+        if track_ids:
+            report.results.update(self.remove_liked_tracks(track_ids=track_ids, progress=track_progress).results)
+        for playlist_id, items in playlist_items.items():
+            playlist_report = self.remove_playlist_items(playlist_id, items)
+            report.results.update(
+                (f'{playlist_id}:{position}', error) for position, error in playlist_report.results.items()
+            )
+            if progress:
+                progress(report, total)
+        return report
+
+    def iter_saved_track_pages(self):
+        """Itera sobre todas as páginas de músicas curtidas do usuário, na ordem da biblioteca.
+
+        As páginas vêm do cliente assíncrono (todas em voo ao mesmo tempo, até o limite do
+        AsyncBridge) e são entregues aqui uma a uma, de forma síncrona.
+        """
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        return get_async_bridge().iterate(self.aio.iter_saved_track_pages())
 
     def get_user_info(self):
         """Retorna informações do usuário logado."""
@@ -166,74 +321,444 @@ class SpotifyHandler:
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
         return self.sp.me()
 
-    def get_recommended_tracks(self, limit=5):
-        """Obtém músicas recomendadas com base nas músicas curtidas pelo usuário."""
+    def get_user_id(self):
+        """Retorna o ID do usuário no Spotify, guardado na sessão após a primeira consulta."""
+        if self.user_id:
+            return self.user_id
+        in_request = has_request_context()
+        user_id = session.get('spotify_user_id') if in_request else None
+        if not user_id:
+            profile = self.get_user_info()
+            user_id = profile['id']
+            user_profiles.set(user_id, profile)
+            if in_request:
+                session['spotify_user_id'] = user_id
+        self.user_id = user_id
+        return user_id
+
+    def get_user_profile(self):
+        """Retorna o perfil do usuário (nome, imagem), guardado em cache entre requisições."""
+        user_id = self.get_user_id()
+        profile = user_profiles.get(user_id, None)
+        if profile is None:
+            profile = self.get_user_info()
+            user_profiles.set(user_id, profile)
+        return profile
+
+    def warm_up(self, progress=None):
+        """Carrega perfil, músicas curtidas, artistas e playlists nos caches do servidor.
+
+        Roda em segundo plano logo após o login (job `warm_up`), para que a primeira
+        visita às páginas pesadas já encontre os índices prontos. Cada etapa é
+        independente: uma falha fica no relatório e não impede as demais.
+        """
+        steps = {
+            'profile': self.get_user_profile,
+            'tracks': self.get_track_index,
+            'artists': self.get_artist_index,
+            'playlists': self.get_playlist_index,
+        }
+        report = BulkReport()
+        for name, load in steps.items():
+            try:
+                load()
+                report.results[name] = None
+            except (SpotifyHandlerError, spotipy.exceptions.SpotifyException) as e:
+                logger.error(f"Erro ao carregar {name} de {self.user_id} no aquecimento: {e}")
+                report.results[name] = str(e)
+            if progress:
+                progress(report, len(steps))
+        return report
+
+    def sync_saved_tracks(self):
+        """Sincroniza o snapshot local de músicas curtidas com o Spotify.
+
+        A primeira carga traz a biblioteca inteira. Depois disso, lê as músicas da mais
+        recente para a mais antiga e para ao chegar nas que o snapshot já conhece.
+        """
+        user_id = self.get_user_id()
+        latest = self.store.latest_saved_tracks(user_id)
+        state = self.store.get_sync_state(user_id, SAVED_TRACKS)
+        if latest is None or state is None:
+            return self._full_sync_saved_tracks(user_id)
+
+        new_rows = []
+        offset = 0
+        try:
+            while True:
+                page = self.sp.current_user_saved_tracks(limit=SAVED_TRACKS_PAGE_SIZE, offset=offset)
+                total = page['total']
+                reached_known = False
+                for item in page['items']:
+                    if not item.get('track'):
+                        continue
+                    if item['added_at'] < latest[0]:
+                        reached_known = True
+                        break
+                    # No mesmo instante da mais recente, a ordem do Spotify é arbitrária:
+                    # pula as já conhecidas e segue até um added_at mais antigo
+                    if item['added_at'] == latest[0] and item['track']['id'] in latest[1]:
+                        continue
+                    new_rows.append(track_row(item))
+                offset += SAVED_TRACKS_PAGE_SIZE
+                if reached_known or offset >= total:
+                    break
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao sincronizar músicas curtidas: {e}")
+            raise SpotifyHandlerError(f"Erro ao sincronizar músicas curtidas: {e}")
+
+        # Remoções feitas fora do app não aparecem na leitura incremental: se o total
+        # não bater com o esperado, refaz a carga completa.
+        if total != (state[1] or 0) + len(new_rows):
+            logger.info(f"Snapshot de {user_id} divergiu do Spotify; recarregando a biblioteca.")
+            return self._full_sync_saved_tracks(user_id)
+
+        if new_rows:
+            self.store.add_saved_tracks(user_id, new_rows, total)
+        logger.info(f"{len(new_rows)} novas músicas curtidas sincronizadas para {user_id}.")
+
+    def _full_sync_saved_tracks(self, user_id):
+        rows, total = run_async(self.aio.saved_track_snapshot())
+        self.store.replace_saved_tracks(user_id, rows, total)
+        logger.info(f"Snapshot completo de {len(rows)} músicas curtidas criado para {user_id}.")
+
+    def get_track_index(self, sync=True):
+        """Retorna o índice em memória (ordenação e busca) das músicas curtidas.
+
+        Com `sync=False` o Spotify só é consultado se ainda não houver snapshot, para a
+        busca enquanto o usuário digita; com `sync=True`, também não é consultado se o
+        snapshot acabou de ser sincronizado (SAVED_TRACKS_SYNC_INTERVAL). Quando o
+        snapshot muda de versão (músicas curtidas ou removidas), o índice existente
+        recebe só a diferença.
+        """
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        # Uma carga por vez: quem chega durante o aquecimento do login espera e usa o resultado
+        with library_locks(user_id, SAVED_TRACKS):
+            state = self.store.get_sync_state(user_id, SAVED_TRACKS)
+            if state is None or (sync and time.time() - state[0] >= Config.SAVED_TRACKS_SYNC_INTERVAL):
+                self.sync_saved_tracks()
+                state = self.store.get_sync_state(user_id, SAVED_TRACKS)
+            version = state[2]
+
+            index = track_indexes.get(user_id, None)
+            if index is None:
+                index = TrackIndex(self.store.saved_tracks(user_id), version)
+                track_indexes.set(user_id, index)
+            elif index.version != version:
+                current = self.store.saved_track_ids(user_id)
+                indexed = index.ids
+                added = self.store.saved_tracks(user_id, current - indexed)
+                index.update(added, indexed - current, version)
+                logger.info(f"Índice de músicas de {user_id}: {len(added)} adicionadas, {len(indexed - current)} removidas.")
+        return index
+
+    def iter_followed_artist_pages(self):
+        """Itera sobre todas as páginas de artistas seguidos, seguindo o cursor `after`."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        return (items for items, _ in self._iter_followed_artist_pages())
+
+    def _iter_followed_artist_pages(self, after=None):
+        """Gera (artistas, cursor da próxima página) a partir do cursor `after`."""
         try:
-            recommendations = self.sp.recommendations(seed_genres=['pop'], limit=limit)
-            return recommendations['tracks']
+            while True:
+                page = self.sp.current_user_followed_artists(limit=FOLLOWED_ARTISTS_PAGE_SIZE, after=after)['artists']
+                after = (page.get('cursors') or {}).get('after') if page['items'] else None
+                yield page['items'], after
+                if not after:
+                    break
         except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao obter músicas recomendadas: {e}")
-            raise SpotifyHandlerError(f"Erro ao obter músicas recomendadas: {e}")
+            logger.error(f"Erro ao obter artistas seguidos: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter artistas seguidos: {e}")
+
+    def sync_followed_artists(self):
+        """Recarrega os artistas seguidos percorrendo a cadeia de cursores.
+
+        Cada página é gravada junto com o cursor da próxima; se a carga for interrompida
+        (ex.: limite de requisições), a próxima tentativa continua do último checkpoint.
+        """
+        user_id = self.get_user_id()
+        checkpoint = self.store.artist_checkpoint(user_id, Config.LIBRARY_SNAPSHOT_TTL)
+        if checkpoint and checkpoint[0]:
+            after = checkpoint[0]
+            logger.info(f"Retomando a carga de artistas de {user_id} a partir de {checkpoint[1]} artistas.")
+        else:
+            after = None
+            self.store.start_artist_refresh(user_id)
 
-    def get_liked_artists(self, limit=50, offset=0):
-        """Retorna uma lista de artistas cujas músicas estão entre as faixas curtidas pelo usuário."""
+        for items, next_after in self._iter_followed_artist_pages(after):
+            self.store.append_artist_page(user_id, [artist_row(artist) for artist in items], next_after)
+
+    def get_library_artists(self):
+        """Retorna os artistas seguidos a partir do snapshot local, recarregado quando expira."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        if not self.store.is_fresh(user_id, FOLLOWED_ARTISTS, Config.LIBRARY_SNAPSHOT_TTL):
+            self.sync_followed_artists()
+        return self.store.followed_artists(user_id)
 
-        try:
-            liked_tracks = self.sp.current_user_saved_tracks(limit=limit, offset=offset)
-            artists = set()
+    def get_artist_index(self):
+        """Retorna o índice em memória de todos os artistas seguidos (mesma lógica das playlists)."""
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        index = artist_indexes.get(user_id, None)
+        if self._is_current(index, user_id, FOLLOWED_ARTISTS):
+            return index
+
+        with library_locks(user_id, FOLLOWED_ARTISTS):
+            # Outra requisição (ou o aquecimento do login) pode ter carregado enquanto esperávamos
+            index = artist_indexes.get(user_id, None)
+            if self._is_current(index, user_id, FOLLOWED_ARTISTS):
+                return index
+            artists = self.get_library_artists()
+            index = ArtistIndex(artists, self.store.get_sync_state(user_id, FOLLOWED_ARTISTS)[2])
+            artist_indexes.set(user_id, index)
+        return index
 
-            if not liked_tracks['items']:
-                logger.info("Nenhuma música curtida encontrada.")
-                return []
+    def _is_current(self, index, user_id, collection):
+        """Indica se o índice em cache está na versão atual de um snapshot ainda dentro do TTL."""
+        state = self.store.get_sync_state(user_id, collection)
+        fresh = state is not None and time.time() - state[0] < Config.LIBRARY_SNAPSHOT_TTL
+        return index is not None and fresh and index.version == state[2]
 
-            for item in liked_tracks['items']:
-                track = item.get('track')
-                if track:
-                    for artist in track.get('artists', []):
-                        artists.add(artist['name'])
+    def get_library_playlists(self):
+        """Retorna as playlists a partir do snapshot local, recarregado quando expira."""
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        if not self.store.is_fresh(user_id, PLAYLISTS, Config.LIBRARY_SNAPSHOT_TTL):
+            rows = [playlist_row(playlist) for items in self.iter_playlist_pages() for playlist in items]
+            self.store.replace_playlists(user_id, rows)
+        return self.store.playlists(user_id)
 
-            if not artists:
-                logger.info("Nenhum artista encontrado entre as músicas curtidas.")
-                return []
+    def iter_playlist_pages(self):
+        """Itera sobre todas as páginas de playlists do usuário (itens brutos da API)."""
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        return get_async_bridge().iterate(self.aio.iter_playlist_pages())
 
-            return list(artists)
+    def iter_playlists_with_tracks(self):
+        """Itera sobre as playlists do usuário (itens brutos da API) junto com as faixas de cada uma."""
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        return get_async_bridge().iterate(self.aio.iter_playlists_with_tracks())
 
-        except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao obter artistas curtidos: {e}")
-            raise SpotifyHandlerError(f"Erro ao obter artistas curtidos: {e}")
+    def find_library_duplicates(self, progress=None):
+        """Procura gravações repetidas nas músicas curtidas e nas playlists do usuário.
+
+        O conteúdo das playlists vem da varredura (scan_playlists), que só relê as
+        playlists alteradas; as que falharem ficam de fora e são listadas em `failed_playlists`.
+        """
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        self.sync_saved_tracks()
+        saved_tracks = self.store.saved_tracks(user_id)
+        scan, report = self.scan_playlists(progress)
+        playlists = {playlist['id']: playlist for playlist in self.get_library_playlists()}
+        contents = {
+            playlist_id: tracks for playlist_id, (_, tracks) in scan.contents.items() if playlist_id not in scan.failed
+        }
+        started = time.perf_counter()
+        result = find_duplicates(saved_tracks, [
+            {
+                'id': playlist_id, 'name': playlists[playlist_id]['name'], 'tracks': tracks,
+                'editable': playlists[playlist_id]['owner_id'] == user_id,
+            }
+            for playlist_id, tracks in contents.items()
+        ])
+        logger.info(
+            f"{len(result['groups'])} grupos de duplicadas em {len(saved_tracks)} curtidas e "
+            f"{len(contents)} playlists ({time.perf_counter() - started:.2f}s)."
+        )
+        result['failed_playlists'] = report.failed
+        return result
+
+    def scan_playlists(self, progress=None, refresh=True):
+        """Lê o conteúdo de todas as playlists e monta o índice faixa → playlists.
+
+        Só as playlists novas ou com snapshot_id diferente do da última varredura são
+        lidas de novo (pelo cliente assíncrono, todas ao mesmo tempo); o conteúdo das
+        demais vem da memória ou do snapshot local. Com `refresh=True` a lista de
+        playlists é relida antes, para enxergar os snapshot_ids atuais.
+
+        Retorna (PlaylistOverlapIndex, BulkReport das playlists lidas). Uma playlist que
+        falhar mantém o conteúdo da varredura anterior, se houver, e fica no relatório.
+        """
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        with library_locks(user_id, PLAYLIST_ITEMS):
+            if refresh:
+                self.store.invalidate(user_id, PLAYLISTS)
+            playlists = self.get_library_playlists()
+            version = self.store.get_sync_state(user_id, PLAYLISTS)[2]
+            previous = playlist_scans.get(user_id, None)
+            known = previous.contents if previous is not None else self.store.playlist_contents(user_id)
+
+            changed = changed_playlists(playlists, known)
+            fetched, report = run_async(self.aio.get_playlists_tracks(changed, progress))
+            snapshots = {playlist['id']: playlist['snapshot_id'] for playlist in playlists}
+            fetched = {playlist_id: (snapshots[playlist_id], tracks) for playlist_id, tracks in fetched.items()}
+            self.store.save_playlist_contents(user_id, fetched, snapshots)
+
+            contents = {
+                playlist_id: fetched.get(playlist_id) or known[playlist_id]
+                for playlist_id in snapshots if playlist_id in fetched or playlist_id in known
+            }
+            index = PlaylistOverlapIndex(contents, version, report.failed)
+            playlist_scans.set(user_id, index)
+        logger.info(
+            f"Varredura de {len(playlists)} playlists: {len(report.succeeded)} lidas, "
+            f"{len(playlists) - len(changed)} sem mudanças, {len(report.failed)} falharam."
+        )
+        return index, report
+
+    def get_playlist_overlap(self, threshold=CONTAINED_THRESHOLD, min_playlists=SHARED_MIN_PLAYLISTS, progress=None):
+        """Varre as playlists e responde às consultas de sobreposição entre elas.
+
+        `contained`: playlists com pelo menos `threshold` das faixas em outra (candidatas
+        a juntar ou apagar); `shared_tracks`: faixas em `min_playlists` playlists ou mais.
+        """
+        index, report = self.scan_playlists(progress)
+        names = {playlist['id']: playlist['name'] for playlist in self.get_playlist_index().playlists}
+        contained_total, contained = index.contained(threshold)
+        for pair in contained:
+            pair['name'] = names.get(pair['id'], '')
+            pair['container_name'] = names.get(pair['container_id'], '')
+        shared_total, shared = index.shared_tracks(min_playlists)
+        for track in shared:
+            track['playlists'] = [
+                {'id': playlist_id, 'name': names.get(playlist_id, '')} for playlist_id in track['playlists']
+            ]
+        return {
+            'threshold': threshold,
+            'min_playlists': min_playlists,
+            'playlists_total': len(index.contents),
+            'tracks_total': len(index.tracks),
+            'scanned': len(report.succeeded),
+            'contained_total': contained_total,
+            'contained': contained,
+            'shared_total': shared_total,
+            'shared_tracks': shared,
+            'failed_playlists': report.failed,
+        }
 
-    def get_user_playlists(self, limit=50, offset=0):
-        """Retorna as playlists do usuário."""
+    def get_playlist_index(self):
+        """Retorna o índice em memória de todas as playlists do usuário.
+
+        O índice é reaproveitado entre requisições enquanto o snapshot estiver dentro do
+        TTL e na mesma versão; remoções e criações de playlists mudam a versão.
+        """
+        if not self.is_authenticated():
+            raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
+        user_id = self.get_user_id()
+        index = playlist_indexes.get(user_id, None)
+        if self._is_current(index, user_id, PLAYLISTS):
+            return index
+
+        with library_locks(user_id, PLAYLISTS):
+            index = playlist_indexes.get(user_id, None)
+            if self._is_current(index, user_id, PLAYLISTS):
+                return index
+            playlists = self.get_library_playlists()
+            index = PlaylistIndex(playlists, self.store.get_sync_state(user_id, PLAYLISTS)[2])
+            playlist_indexes.set(user_id, index)
+        return index
+
+    def get_playlist_track_ids(self):
+        """IDs de todas as faixas das playlists do usuário, lidas pelo cliente assíncrono."""
+        return self._load_playlist_track_ids()[1]
+
+    def _load_playlist_track_ids(self, load=True):
+        """Retorna ({playlist_id: frozenset de IDs de faixas}, união de todos).
+
+        Vem da última varredura (scan_playlists) enquanto o snapshot de playlists estiver
+        na mesma versão; senão, varre de novo, relendo só as playlists alteradas. Se
+        alguma playlist falhar, levanta erro em vez de devolver um conjunto incompleto
+        (que faria faixas dessa playlist parecerem "fora de playlists"). Com `load=False`,
+        retorna None se ainda não estiver em cache, sem ler as playlists.
+        """
+        user_id = self.get_user_id()
+        state = self.store.get_sync_state(user_id, PLAYLISTS)
+        index = playlist_scans.get(user_id, None)
+        if not load:
+            current = state is not None and index is not None and index.version == state[2] and not index.failed
+            return (index.track_ids, index.all_track_ids) if current else None
+        self.get_library_playlists()
+        version = self.store.get_sync_state(user_id, PLAYLISTS)[2]
+        if index is None or index.version != version or index.failed:
+            index, _ = self.scan_playlists(refresh=False)
+        if index.failed:
+            raise SpotifyHandlerError(f"Não foi possível ler {len(index.failed)} playlists.")
+        return index.track_ids, index.all_track_ids
+
+    def get_library_stats(self, overlap=False):
+        """Estatísticas das músicas curtidas (stats.LibraryStats.summary) para o dashboard.
+
+        A sobreposição com playlists exige ler o conteúdo de todas elas: só é calculada
+        com `overlap=True` ou se esse conteúdo já estiver em cache (ex.: limpeza por
+        regras); senão, `playlists` fica None.
+        """
+        index = self.get_track_index(sync=False)
+        summary = dict(index.stats.summary())
+        contents = self._load_playlist_track_ids(load=overlap)
+        summary['playlists'] = None
+        if contents is not None:
+            summary['playlists'] = index.stats.playlist_overlap(contents[0])
+            names = {playlist['id']: playlist['name'] for playlist in self.get_playlist_index().playlists}
+            for playlist in summary['playlists']['playlists']:
+                playlist['name'] = names.get(playlist['id'], '')
+        return summary
+
+    def plan_cleanup(self, rules, match=MATCH_ALL, sync=False):
+        """Prévia (dry-run) de uma limpeza por regras sobre todas as músicas curtidas.
+
+        `rules` vem de cleanup.parse_rules. Com `sync=False` (prévia enquanto o usuário
+        ajusta as regras) o snapshot só é sincronizado se ainda não existir; a remoção
+        reavalia com `sync=True`. Os IDs do plano vão para `remove_liked_tracks`.
+        """
+        index = self.get_track_index(sync=sync)
+        in_playlists = None
+        if any(rule == 'not_in_playlist' for rule, _ in rules):
+            in_playlists = self.get_playlist_track_ids()
+        return cleanup_plan(index.columns, rules, match, in_playlists)
+
+    def get_recommended_tracks(self, limit=5):
+        """Obtém músicas recomendadas com base nas músicas curtidas pelo usuário.
+
+        As sementes são os artistas mais curtidos recentemente (stats.LibraryStats);
+        sem curtidas, recomenda a partir do gênero pop.
+        """
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
         try:
-            playlists = self.sp.current_user_playlists(limit=limit, offset=offset)
-            return playlists['items']
+            seeds = self.get_track_index(sync=False).stats.seeds()
+            if seeds:
+                recommendations = self.sp.recommendations(seed_artists=seeds, limit=limit)
+            else:
+                recommendations = self.sp.recommendations(seed_genres=['pop'], limit=limit)
+            return recommendations['tracks']
         except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao obter playlists: {e}")
-            raise SpotifyHandlerError(f"Erro ao obter playlists: {e}")
+            logger.error(f"Erro ao obter músicas recomendadas: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter músicas recomendadas: {e}")
 
-    def unfollow_artists(self, artist_ids):
+    def unfollow_artists(self, artist_ids, progress=None):
         """Desfazer o follow em uma lista de artistas."""
         if not self.is_authenticated():
             raise SpotifyHandlerError("Usuário não está autenticado. Faça login para continuar.")
         if not artist_ids:
             raise SpotifyHandlerError("Nenhum ID de artista fornecido")
-
-        try:
-            self.sp.user_unfollow_artists(artist_ids)
-            logger.info(f'Artistas com IDs {artist_ids} foram desfavoritados com sucesso.')
-        except spotipy.exceptions.SpotifyException as e:
-            logger.error(f"Erro ao desfazer o follow nos artistas: {e}")
-            raise SpotifyHandlerError(f"Erro ao desfazer o follow nos artistas: {e}")
+        self.get_user_id()
+        return run_async(self.aio.unfollow_artists(artist_ids, progress))
 
     def revoke_token(self):
         """Revoga o token de acesso do usuário no Spotify."""
-        token_info = session.get('spotify_token_info')
+        token_info = self.token_info or get_session_store().get(current_session_id())
         if token_info:
             client_id = Config.SPOTIFY_CLIENT_ID
             client_secret = Config.SPOTIFY_CLIENT_SECRET
@@ -254,18 +779,17 @@ class SpotifyHandler:
 
             data = {'token': token}
 
-            logger.info(f"Revogando o token: {token}")
-            logger.info(f"Headers: {headers}")
-            logger.info(f"Data: {data}")
-
             # Fazendo a requisição para revogar o token
-            response = requests.post("https://accounts.spotify.com/api/token", headers=headers, data=data)
+            response = get_http_session().post(
+                f"{Config.SPOTIFY_ACCOUNTS_URL}/api/token", headers=headers, data=data,
+                timeout=Config.SPOTIFY_REQUEST_TIMEOUT
+            )
 
-            logger.info("Response content: %s", response.text)
+            logger.info(f"Revogação do token respondeu com status {response.status_code}.")
 
             if response.status_code == 200:
                 logger.info("Token revogado com sucesso.")
-                session.clear()  # Limpa a sessão após revogar o token
+                end_session()  # Limpa a sessão após revogar o token
             else:
                 try:
                     error_response = response.json()
@@ -275,3 +799,268 @@ class SpotifyHandler:
                 logger.error(f"Erro ao revogar token: {response.status_code} - {error_message}")
         else:
             logger.warning("Nenhum token encontrado para revogar.")
+
+
+class AsyncSpotifyHandler:
+    """Contraparte assíncrona do SpotifyHandler para as operações com muitas chamadas.
+
+    Mesmos nomes, parâmetros e retornos dos métodos síncronos, sobre o
+    AsyncSpotifyClient: paginação completa, resolução de artistas, remoções em lote e
+    leitura de várias playlists ficam todas em voo no event loop do processo, limitadas
+    pelo semáforo do AsyncBridge e não pelo número de threads. Código síncrono usa estes
+    métodos pelo SpotifyHandler (que delega com run_async) ou pelo próprio AsyncBridge.
+    """
+
+    def __init__(self, token_info, user_id=None, priority=INTERACTIVE, auth_manager=None):
+        self.token_info = token_info
+        self.priority = priority
+        self.store = get_library_store()
+        self.sp = AsyncSpotifyClient(
+            token_info['access_token'], priority=priority, trace=metrics.current_trace(), auth_manager=auth_manager
+        )
+        self.user_id = user_id
+
+    @property
+    def user_id(self):
+        return self._user_id
+
+    @user_id.setter
+    def user_id(self, user_id):
+        self._user_id = user_id
+        self.sp.cache_owner = user_id
+
+    async def get_user_id(self):
+        """Retorna o ID do usuário, consultando o Spotify só se ainda não for conhecido."""
+        if not self.user_id:
+            self.user_id = (await self.sp.me())['id']
+        return self.user_id
+
+    async def create_playlist(self, playlist_name, artist_list, progress=None):
+        """Cria uma playlist no Spotify baseada em uma lista de artistas."""
+        if not playlist_name or not artist_list:
+            raise SpotifyHandlerError("Nome da playlist e lista de artistas são obrigatórios")
+
+        # Nomes repetidos ou vazios geram uma única busca (ou nenhuma)
+        artist_names = list(dict.fromkeys(name.strip() for name in artist_list if name and name.strip()))
+        try:
+            user_id = await self.get_user_id()
+
+            # Todos os artistas são resolvidos ao mesmo tempo; gather devolve os resultados
+            # na ordem da lista informada pelo usuário.
+            per_artist = await asyncio.gather(*(self._artist_top_track_ids(name) for name in artist_names))
+
+            # Remove duplicados preservando a ordem (artista a artista, faixa a faixa)
+            track_ids = list(dict.fromkeys(track_id for ids in per_artist for track_id in ids))
+            if not track_ids:
+                raise SpotifyHandlerError("Nenhuma música encontrada para adicionar à playlist.")
+            playlist = await self.sp.user_playlist_create(user_id, playlist_name)
+            # Blocos sequenciais (max_workers=1) para manter a ordem das faixas na playlist
+            report = await run_bulk_async(
+                lambda chunk: self.sp.user_playlist_add_tracks(user_id, playlist["id"], chunk),
+                track_ids, PLAYLIST_ADD_LIMIT, max_workers=1, is_retryable=is_retryable_error,
+                progress=progress
+            )
+            self.store.invalidate(user_id, PLAYLISTS)
+            logger.info(f'Playlist "{playlist_name}" criada com {len(report.succeeded)} músicas.')
+            return report
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao criar a playlist: {e}")
+            raise SpotifyHandlerError(f"Erro ao criar a playlist: {e}")
+
+    async def resolve_artist_id(self, artist_name):
+        """Busca o ID do artista pelo nome (com cache); retorna None se não houver resultado."""
+        async def search():
+            artist_search = await self.sp.search(q=f'artist:"{artist_name}"', type="artist", limit=1)
+            items = artist_search['artists']['items']
+            return items[0]['id'] if items else None
+        return await artist_cache.resolve_async(artist_name, search)
+
+    async def _artist_top_track_ids(self, artist_name):
+        """Resolve o artista e retorna os IDs das suas músicas mais tocadas."""
+        artist_id = await self.resolve_artist_id(artist_name)
+        if artist_id is None:
+            logger.warning(f"Artista '{artist_name}' não encontrado.")
+            return []
+        market = Config.TOP_TRACKS_MARKET
+
+        async def load():
+            return [track["id"] for track in (await self.sp.artist_top_tracks(artist_id, country=market))['tracks']]
+        return await artist_cache.top_track_ids_async(artist_id, market, load)
+
+    async def remove_playlists(self, playlist_ids, progress=None):
+        """Remove várias playlists ao mesmo tempo e retorna um BulkReport por playlist."""
+        user_id = await self.get_user_id()
+        report = await run_bulk_async(
+            lambda chunk: self.sp.user_playlist_unfollow(user_id, chunk[0]),
+            playlist_ids, 1, is_retryable=is_retryable_error, progress=progress
+        )
+        if report.succeeded:
+            self.store.delete_playlists(user_id, report.succeeded)
+        logger.info(f'{len(report.succeeded)} playlists removidas com sucesso.')
+        return report
+
+    async def remove_liked_tracks(self, track_ids, progress=None):
+        """Remove as músicas curtidas informadas e retorna um BulkReport por ID."""
+        report = await run_bulk_async(
+            lambda chunk: self.sp.current_user_saved_tracks_delete(chunk),
+            track_ids, SAVED_TRACKS_DELETE_LIMIT, is_retryable=is_retryable_error, progress=progress
+        )
+        # Mantém o snapshot local coerente sem precisar buscar a biblioteca de novo
+        if report.succeeded:
+            self.store.delete_saved_tracks(await self.get_user_id(), report.succeeded)
+        return report
+
+    async def remove_playlist_items(self, playlist_id, items, progress=None):
+        """Remove ocorrências específicas (uri + posição) de uma playlist.
+
+        As posições são removidas da maior para a menor, em blocos sequenciais, para que
+        cada bloco não desloque as posições dos blocos seguintes. Retorna um BulkReport
+        indexado pela posição.
+        """
+        uris = {int(item['position']): item['uri'] for item in items}
+
+        async def remove(positions):
+            by_uri = {}
+            for position in map(int, positions):
+                by_uri.setdefault(uris[position], []).append(position)
+            await self.sp.playlist_remove_specific_occurrences_of_items(
+                playlist_id, [{'uri': uri, 'positions': found} for uri, found in by_uri.items()]
+            )
+
+        # IDs em texto: run_bulk_async descarta IDs vazios, e a posição 0 seria um deles
+        report = await run_bulk_async(
+            remove, [str(position) for position in sorted(uris, reverse=True)], PLAYLIST_REMOVE_LIMIT, max_workers=1,
+            is_retryable=is_retryable_error, progress=progress
+        )
+        if report.succeeded:
+            self.store.invalidate(await self.get_user_id(), PLAYLISTS)
+        return report
+
+    async def unfollow_artists(self, artist_ids, progress=None):
+        """Desfazer o follow em uma lista de artistas."""
+        if not artist_ids:
+            raise SpotifyHandlerError("Nenhum ID de artista fornecido")
+        report = await run_bulk_async(
+            self.sp.user_unfollow_artists, artist_ids, ARTISTS_UNFOLLOW_LIMIT,
+            is_retryable=is_retryable_error, progress=progress
+        )
+        if report.succeeded:
+            self.store.delete_followed_artists(await self.get_user_id(), report.succeeded)
+        logger.info(f'{len(report.succeeded)} artistas foram desfavoritados com sucesso.')
+        return report
+
+    async def iter_saved_track_pages(self):
+        """Itera sobre todas as páginas de músicas curtidas do usuário, na ordem da biblioteca."""
+        try:
+            async for items in iter_offset_pages_async(self.sp.current_user_saved_tracks, SAVED_TRACKS_PAGE_SIZE):
+                # Faixas locais ou indisponíveis podem vir sem o objeto 'track'
+                yield [item for item in items if item.get('track')]
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao obter músicas curtidas: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter músicas curtidas: {e}")
+
+    async def saved_track_snapshot(self):
+        """Lê a biblioteca completa de músicas curtidas; retorna (registros Track, total da API).
+
+        O total vem da primeira página e conta também itens sem faixa, que são descartados.
+        """
+        total = None
+
+        async def fetch(limit, offset):
+            nonlocal total
+            page = await self.sp.current_user_saved_tracks(limit=limit, offset=offset)
+            if offset == 0:
+                total = page['total']
+            return page
+
+        try:
+            rows = [
+                track_row(item)
+                async for items in iter_offset_pages_async(fetch, SAVED_TRACKS_PAGE_SIZE)
+                for item in items if item.get('track')
+            ]
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao obter músicas curtidas: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter músicas curtidas: {e}")
+        return rows, total
+
+    async def iter_followed_artist_pages(self):
+        """Itera sobre todas as páginas de artistas seguidos, seguindo o cursor `after`."""
+        after = None
+        try:
+            while True:
+                page = (await self.sp.current_user_followed_artists(limit=FOLLOWED_ARTISTS_PAGE_SIZE, after=after))['artists']
+                after = (page.get('cursors') or {}).get('after') if page['items'] else None
+                yield page['items']
+                if not after:
+                    break
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao obter artistas seguidos: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter artistas seguidos: {e}")
+
+    async def iter_playlist_pages(self):
+        """Itera sobre todas as páginas de playlists do usuário (itens brutos da API)."""
+        try:
+            async for items in iter_offset_pages_async(self.sp.current_user_playlists, PLAYLISTS_PAGE_SIZE):
+                yield [playlist for playlist in items if playlist]
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao obter playlists: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter playlists: {e}")
+
+    async def get_playlist_tracks(self, playlist_id):
+        """Retorna as faixas de uma playlist, com a posição de cada uma."""
+        try:
+            return await self._playlist_tracks(playlist_id)
+        except spotipy.exceptions.SpotifyException as e:
+            logger.error(f"Erro ao obter as faixas da playlist {playlist_id}: {e}")
+            raise SpotifyHandlerError(f"Erro ao obter as faixas da playlist {playlist_id}: {e}")
+
+    async def iter_playlists_with_tracks(self, window=None):
+        """Gera (playlist, faixas) para cada playlist do usuário, na ordem da biblioteca.
+
+        As faixas das próximas playlists (até `window`) já são buscadas como tarefas
+        enquanto a atual é consumida, como as páginas do iter_offset_pages_async.
+        """
+        window = window or Config.EXPORT_PREFETCH_PLAYLISTS
+        pending = deque()
+        try:
+            async for items in self.iter_playlist_pages():
+                for playlist in items:
+                    pending.append((playlist, asyncio.ensure_future(self.get_playlist_tracks(playlist['id']))))
+                    if len(pending) > window:
+                        ready, task = pending.popleft()
+                        yield ready, await task
+            while pending:
+                ready, task = pending.popleft()
+                yield ready, await task
+        finally:
+            # Se o consumidor parar no meio, cancela as playlists adiantadas
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+
+    async def _playlist_tracks(self, playlist_id):
+        # Sem converter a exceção: run_bulk_async decide o retry pelo status HTTP
+        def fetch(limit, offset):
+            return self.sp.playlist_items(
+                playlist_id, fields=PLAYLIST_ITEM_FIELDS, limit=limit, offset=offset, additional_types=('track',)
+            )
+        tracks = []
+        async for items in iter_offset_pages_async(fetch, PLAYLIST_ITEMS_PAGE_SIZE):
+            for item in items:
+                tracks.append(playlist_track_row(item, len(tracks)))
+        return [track for track in tracks if track]
+
+    async def get_playlists_tracks(self, playlist_ids, progress=None):
+        """Lê o conteúdo de várias playlists ao mesmo tempo.
+
+        Retorna ({playlist_id: faixas}, BulkReport); playlists que falharem mesmo após as
+        novas tentativas aparecem só no relatório.
+        """
+        contents = {}
+
+        async def load(chunk):
+            contents[chunk[0]] = await self._playlist_tracks(chunk[0])
+
+        report = await run_bulk_async(load, playlist_ids, 1, is_retryable=is_retryable_error, progress=progress)
+        return contents, report
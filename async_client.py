@@ -0,0 +1,271 @@
+# async_client.py
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from itertools import islice
+import httpx
+import spotipy
+import metrics
+from cache import MISSING
+from config import Config
+from http_cache import get_response_cache, spotify_error
+from ratelimit import (
+    get_token_bucket, retry_after_seconds, backoff_delay, RateLimitExceeded, INTERACTIVE
+)
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+
+class AsyncBridge:
+    """Event loop do processo numa thread própria, para rotas e jobs síncronos usarem corrotinas.
+
+    Todas as chamadas assíncronas do processo compartilham o mesmo httpx.AsyncClient
+    (pool de conexões keep-alive) e o mesmo semáforo, que limita as requisições em voo
+    sem precisar de uma thread por requisição. O loop só sobe no primeiro uso, então
+    cada worker do gunicorn cria o seu depois do fork.
+    """
+
+    def __init__(self, concurrency=None):
+        self.concurrency = concurrency or Config.SPOTIFY_ASYNC_CONCURRENCY
+        self.loop = None
+        self.http = None
+        self.semaphore = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name='spotify-async', daemon=True)
+            self._thread.start()
+            asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+            self.loop = loop
+
+    async def _setup(self):
+        # Criados dentro do loop, aos quais ficam associados
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            timeout=Config.SPOTIFY_REQUEST_TIMEOUT
+        )
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    def run(self, coro, timeout=None):
+        """Executa a corrotina no loop do processo e bloqueia até o resultado (ou exceção)."""
+        if self.loop is None:
+            self._start()
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("AsyncBridge.run não pode ser chamado de dentro do próprio loop.")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, async_iterable):
+        """Consome um iterador assíncrono como um gerador comum, item a item."""
+        iterator = aiter(async_iterable)
+        try:
+            while True:
+                try:
+                    yield self.run(anext(iterator))
+                except StopAsyncIteration:
+                    return
+        finally:
+            # Se o consumidor parar no meio, o gerador assíncrono cancela o que estiver adiantado
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None:
+                self.run(aclose())
+
+
+_bridge = None
+_bridge_lock = threading.Lock()
+
+
+def get_async_bridge():
+    """Retorna a ponte síncrono → assíncrono do processo."""
+    global _bridge
+    if _bridge is None:
+        with _bridge_lock:
+            if _bridge is None:
+                _bridge = AsyncBridge()
+    return _bridge
+
+
+def run_async(coro, timeout=None):
+    """Atalho para get_async_bridge().run(coro)."""
+    return get_async_bridge().run(coro, timeout)
+
+
+class AsyncSpotifyClient:
+    """Cliente assíncrono mínimo da Web API, equivalente ao ScheduledSpotify.
+
+    Passa pelo mesmo token bucket, trata 429/5xx com as mesmas regras e levanta o mesmo
+    SpotifyException do spotipy, para que o tratamento de erros dos handlers (e o
+    is_retryable_error das operações em lote) valha para os dois clientes.
+    """
+
+    def __init__(self, access_token, priority=INTERACTIVE, trace=None, bridge=None, auth_manager=None):
+        self.access_token = access_token
+        # Com auth_manager (session_store.SessionTokenManager), o token é renovado quando expira
+        self.auth_manager = auth_manager
+        self.priority = priority
+        self.cache_owner = None  # ID do usuário, chave das respostas dele no cache de HTTP
+        self.trace = trace
+        self.bridge = bridge or get_async_bridge()
+
+    async def _acquire(self, max_wait):
+        await get_token_bucket().acquire_async(self.priority, max_wait=max_wait)
+
+    async def _token(self):
+        if self.auth_manager is None:
+            return self.access_token
+        token = self.auth_manager.cached_access_token()
+        if token is None:
+            # A renovação lê e grava a sessão no SQLite (e pode chamar o Spotify): fora do loop
+            token = await asyncio.get_running_loop().run_in_executor(None, self.auth_manager.get_access_token)
+        return token
+
+    async def _send(self, method, url, params, payload, cache=None, key=None, entry=None):
+        headers = {'Authorization': f'Bearer {await self._token()}', 'Content-Type': 'application/json'}
+        if cache is not None:
+            headers.update(cache.conditional_headers(entry))
+        async with self.bridge.semaphore:
+            response = await self.bridge.http.request(
+                method, url, params=params, headers=headers,
+                content=json.dumps(payload) if payload is not None else None
+            )
+        with metrics.use_trace(self.trace):
+            metrics.record_response(response)
+        if response.status_code == 304 and entry is not None:
+            return cache.revalidated(key, entry, response.headers)
+        if response.status_code >= 400:
+            raise spotify_error(method, url, params, response)
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        if cache is not None:
+            cache.store(key, response.headers, response.text)
+        return body
+
+    async def request(self, method, path, params=None, payload=None):
+        """Chamada com fila no token bucket e novas tentativas após 429/5xx."""
+        url = path if path.startswith('http') else Config.SPOTIFY_API_URL + path
+        if params:
+            params = {name: value for name, value in params.items() if value is not None}
+        cache = get_response_cache() if method == 'GET' else None
+        key = entry = None
+        if cache is not None:
+            key = cache.key(self.cache_owner, url, params)
+            cache = cache if key is not None else None
+        if cache is not None:
+            entry, body = cache.lookup(key)
+            if body is not MISSING:
+                return body  # Ainda fresco: nem token do bucket, nem rede
+        max_wait = Config.RATE_LIMIT_MAX_WAIT if self.priority == INTERACTIVE else None
+        endpoint = metrics.endpoint_label(method, url)
+        started = time.perf_counter()
+        status = 'error'
+        attempt = 0
+        try:
+            while True:
+                await self._acquire(max_wait)
+                try:
+                    result = await self._send(method, url, params, payload, cache, key, entry)
+                    status = '2xx'
+                    return result
+                except spotipy.exceptions.SpotifyException as e:
+                    status = e.http_status or 0
+                    if attempt >= Config.SPOTIFY_MAX_RETRIES or not (status == 429 or status >= 500):
+                        raise
+                    if status == 429:
+                        delay = retry_after_seconds(e)
+                        if max_wait is not None and delay > max_wait:
+                            raise RateLimitExceeded(delay) from e
+                        logger.warning(f"429 do Spotify em {path}; pausando {delay:.1f}s.")
+                        await asyncio.get_running_loop().run_in_executor(None, get_token_bucket().block_for, delay)
+                    else:
+                        delay = backoff_delay(attempt)
+                        logger.warning(f"Erro {status} do Spotify em {path}; nova tentativa em {delay:.1f}s.")
+                        await asyncio.sleep(delay)
+                    attempt += 1
+        except Exception as e:
+            status = getattr(e, 'http_status', None) or 'error'
+            raise
+        finally:
+            metrics.record_call(endpoint, time.perf_counter() - started, status, attempt, self.trace)
+
+    # Mesmos endpoints (e parâmetros) usados pelo spotipy nos handlers síncronos
+
+    async def me(self):
+        return await self.request('GET', 'me')
+
+    async def current_user_saved_tracks(self, limit=20, offset=0):
+        return await self.request('GET', 'me/tracks', {'limit': limit, 'offset': offset})
+
+    async def current_user_saved_tracks_delete(self, tracks):
+        return await self.request('DELETE', 'me/tracks', {'ids': ','.join(tracks)})
+
+    async def current_user_followed_artists(self, limit=20, after=None):
+        return await self.request('GET', 'me/following', {'type': 'artist', 'limit': limit, 'after': after})
+
+    async def user_unfollow_artists(self, ids):
+        return await self.request('DELETE', 'me/following', {'type': 'artist', 'ids': ','.join(ids)})
+
+    async def current_user_playlists(self, limit=50, offset=0):
+        return await self.request('GET', 'me/playlists', {'limit': limit, 'offset': offset})
+
+    async def playlist_items(self, playlist_id, fields=None, limit=100, offset=0, additional_types=('track',)):
+        return await self.request('GET', f'playlists/{playlist_id}/tracks', {
+            'fields': fields, 'limit': limit, 'offset': offset, 'additional_types': ','.join(additional_types)
+        })
+
+    async def user_playlist_create(self, user, name, public=True, collaborative=False, description=''):
+        return await self.request('POST', f'users/{user}/playlists', payload={
+            'name': name, 'public': public, 'collaborative': collaborative, 'description': description
+        })
+
+    async def user_playlist_add_tracks(self, user, playlist_id, tracks):
+        uris = [track if track.startswith('spotify:') else f'spotify:track:{track}' for track in tracks]
+        return await self.request('POST', f'playlists/{playlist_id}/tracks', payload={'uris': uris})
+
+    async def user_playlist_unfollow(self, user, playlist_id):
+        return await self.request('DELETE', f'playlists/{playlist_id}/followers')
+
+    async def playlist_remove_specific_occurrences_of_items(self, playlist_id, items):
+        return await self.request('DELETE', f'playlists/{playlist_id}/tracks', payload={'tracks': items})
+
+    async def search(self, q, limit=10, type='track'):
+        return await self.request('GET', 'search', {'q': q, 'limit': limit, 'type': type})
+
+    async def artist_top_tracks(self, artist_id, country='US'):
+        return await self.request('GET', f'artists/{artist_id}/top-tracks', {'country': country})
+
+
+async def iter_offset_pages_async(fetch, page_size, window=None):
+    """Itera sobre uma coleção paginada por offset: a primeira página traz o total, e
+    as seguintes são buscadas como tarefas (até `window` adiantadas) e entregues na
+    ordem original.
+
+    O limite de requisições em voo fica com o semáforo do AsyncBridge, não com threads.
+    """
+    window = window or Config.SPOTIFY_ASYNC_CONCURRENCY
+    first_page = await fetch(limit=page_size, offset=0)
+    yield first_page['items']
+
+    offsets = iter(range(page_size, first_page.get('total') or 0, page_size))
+    pending = deque(asyncio.ensure_future(fetch(limit=page_size, offset=offset)) for offset in islice(offsets, window))
+    try:
+        while pending:
+            page = await pending.popleft()
+            next_offset = next(offsets, None)
+            if next_offset is not None:
+                pending.append(asyncio.ensure_future(fetch(limit=page_size, offset=next_offset)))
+            yield page['items']
+    finally:
+        # Se o consumidor parar no meio, cancela as páginas adiantadas
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
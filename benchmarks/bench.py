@@ -0,0 +1,212 @@
+# benchmarks/bench.py
+"""Benchmark de ponta a ponta das rotas Flask contra a API falsa do Spotify.
+
+Sobe o fake_spotify numa thread, aponta o app para ele (bancos SQLite num diretório
+temporário), faz login pelo /callback e mede latência (p50/p90/p99) e chamadas à
+API por requisição de cada cenário. Com --baseline, compara com um resultado
+anterior salvo por --json e termina com código 1 se houver regressão.
+
+    python benchmarks/bench.py --tracks 20000 --artists 2000 --playlists 500 --latency-ms 20
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_spotify import FakeLibrary, FakeSpotify  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Percentil por posição mais próxima (values já ordenados)."""
+    if not values:
+        return 0
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def configure_app(service, workdir, rate_limit):
+    """Define as variáveis do Config antes de importar o app (o Config lê o ambiente na importação)."""
+    os.environ.update({
+        'SPOTIFY_API_URL': service.api_url,
+        'SPOTIFY_ACCOUNTS_URL': service.url,
+        'SPOTIFY_CLIENT_ID': 'bench-client',
+        'SPOTIFY_CLIENT_SECRET': 'bench-secret',
+        'REDIRECT_URI': 'http://localhost/callback',
+        'FLASK_SECRET_KEY': 'bench-secret-key',
+        'LIBRARY_DB_PATH': os.path.join(workdir, 'library.db'),
+        'RATE_LIMIT_DB_PATH': os.path.join(workdir, 'ratelimit.db'),
+        'JOBS_DB_PATH': os.path.join(workdir, 'jobs.db'),
+        'SESSION_DB_PATH': os.path.join(workdir, 'sessions.db'),
+        'RATE_LIMIT_RATE': str(rate_limit),
+        'RATE_LIMIT_BURST': str(max(int(rate_limit), 20)),
+        'JOB_POLL_INTERVAL': '0.05',
+        # Os cenários "cold" medem a primeira carga sem o aquecimento do login
+        'LIBRARY_WARM_UP': 'false',
+    })
+
+
+class Bench:
+    def __init__(self, app, service, iterations):
+        self.app = app
+        self.service = service
+        self.iterations = iterations
+        self.client = app.test_client()
+        self.results = {}
+
+    def login(self):
+        response = self.client.get('/callback?code=bench')
+        if response.status_code != 302 or '/dashboard' not in response.headers.get('Location', ''):
+            raise RuntimeError(f'Login no app falhou: {response.status_code}')
+
+    def measure(self, name, request, iterations=None):
+        """Executa `request()` N vezes; `request` retorna a resposta Flask."""
+        latencies = []
+        calls = throttled = errors = 0
+        for _ in range(iterations or self.iterations):
+            before = self.service.stats()
+            started = time.perf_counter()
+            response = request()
+            latencies.append((time.perf_counter() - started) * 1000)
+            after = self.service.stats()
+            calls += after['total_calls'] - before['total_calls']
+            throttled += after['total_throttled'] - before['total_throttled']
+            errors += response.status_code >= 400
+        latencies.sort()
+        self.results[name] = {
+            'n': len(latencies),
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p90_ms': round(percentile(latencies, 0.90), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2),
+            'api_calls_per_request': round(calls / len(latencies), 2),
+            'throttled': throttled,
+            'errors': errors,
+        }
+
+    def wait_job(self, response):
+        """Acompanha um job em segundo plano até terminar; retorna a última resposta."""
+        job_id = response.get_json()['job_id']
+        while True:
+            status = self.client.get(f'/jobs/{job_id}', headers={'Accept': 'application/json'})
+            if status.get_json()['status'] in ('done', 'failed'):
+                return status
+            time.sleep(0.02)
+
+    def run(self):
+        library = self.service.library
+        self.login()
+
+        # Primeira carga: sincronização completa de cada coleção
+        self.measure('cold liked_tracks', lambda: self.client.get('/liked_tracks'), 1)
+        self.measure('cold liked_artists', lambda: self.client.get('/liked_artists'), 1)
+        self.measure('cold view_playlists', lambda: self.client.get('/view_playlists/1'), 1)
+
+        self.measure('liked_tracks', lambda: self.client.get('/liked_tracks'))
+        self.measure('liked_tracks search', lambda: self.client.get('/liked_tracks?search=amor&sort=name_asc'))
+        self.measure('liked_artists', lambda: self.client.get('/liked_artists/2?sort=name_desc'))
+        self.measure('view_playlists', lambda: self.client.get('/view_playlists/3?sort=tracks_desc'))
+        self.measure('search json', lambda: self.client.get('/search?q=joao&type=tracks'))
+
+        artist_names = ','.join(artist['name'] for artist in library.catalog_artists[:5])
+        self.measure('create_playlist', lambda: self.client.post(
+            '/create_playlist', data={'playlist_name': 'Bench', 'artist_names': artist_names}
+        ))
+
+        def remove_tracks():
+            with library._lock:
+                track_ids = [track_id for _, track_id in library.saved[:50]]
+            return self.client.post('/liked_tracks', data={'track_ids': track_ids})
+
+        def unfollow_artists():
+            with library._lock:
+                artist_ids = library.followed[:10]
+            return self.client.post('/liked_artists', data={'artist_ids': artist_ids})
+
+        def remove_playlists():
+            with library._lock:
+                playlist_ids = list(library.playlists)[:5]
+            response = self.client.post(
+                '/remove_selected_playlists', data={'playlist_ids': playlist_ids},
+                headers={'Accept': 'application/json'}
+            )
+            return self.wait_job(response)
+
+        iterations = min(self.iterations, 10)
+        self.measure('bulk remove_tracks (50)', remove_tracks, iterations)
+        self.measure('bulk unfollow_artists (10)', unfollow_artists, iterations)
+        self.measure('bulk remove_playlists (5, job)', remove_playlists, iterations)
+        return self.results
+
+
+def print_report(results, baseline=None, tolerance=0.25):
+    """Imprime a tabela de resultados; retorna os cenários que regrediram em relação ao baseline."""
+    header = f"{'cenário':<32}{'n':>4}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}{'chamadas':>10}{'429':>6}{'erros':>7}"
+    print(header)
+    print('-' * len(header))
+    regressions = []
+    for name, row in results.items():
+        flag = ''
+        previous = (baseline or {}).get(name)
+        if previous:
+            slower = row['p50_ms'] > previous['p50_ms'] * (1 + tolerance) + 1
+            more_calls = row['api_calls_per_request'] > previous['api_calls_per_request'] * (1 + tolerance)
+            if slower or more_calls:
+                regressions.append(name)
+                flag = '  REGRESSÃO'
+        print(
+            f"{name:<32}{row['n']:>4}{row['p50_ms']:>10.1f}{row['p90_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+            f"{row['max_ms']:>10.1f}{row['api_calls_per_request']:>10.1f}{row['throttled']:>6}{row['errors']:>7}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das rotas do SpotiClean contra a API falsa.')
+    parser.add_argument('--tracks', type=int, default=5000)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--playlists', type=int, default=200)
+    parser.add_argument('--playlist-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=10, help='latência de cada chamada à API falsa')
+    parser.add_argument('--jitter-ms', type=float, default=5)
+    parser.add_argument('--throttle-rate', type=float, default=0, help='fração das chamadas que recebe 429')
+    parser.add_argument('--rate-limit', type=float, default=1000, help='requisições/s do token bucket do app')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', help='salva os resultados neste arquivo')
+    parser.add_argument('--baseline', help='resultados anteriores (--json) para comparar')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='folga antes de apontar regressão')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    library = FakeLibrary(args.tracks, args.artists, args.playlists, args.playlist_size)
+    service = FakeSpotify(library, args.latency_ms, args.jitter_ms, args.throttle_rate, retry_after=1).start()
+    workdir = tempfile.mkdtemp(prefix='spoticlean-bench-')
+    configure_app(service, workdir, args.rate_limit)
+
+    from spotify_manager import app
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    try:
+        results = Bench(app, service, args.iterations).run()
+    finally:
+        service.stop()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    regressions = print_report(results, baseline, args.tolerance)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'args': vars(args), 'results': results}, f, indent=2)
+    if regressions:
+        print(f"\nRegressões: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,534 @@
+# benchmarks/fake_spotify.py
+"""Serviço falso da Web API do Spotify, para benchmarks e testes de ponta a ponta.
+
+Cobre os endpoints usados pelo app (músicas curtidas, artistas seguidos, playlists,
+busca, top tracks, recomendações, /me e token), gera bibliotecas sintéticas de
+tamanho configurável, injeta latência e respostas 429 e aplica os limites reais de
+IDs por chamada. Usa só a biblioteca padrão.
+
+Uso avulso:
+    python benchmarks/fake_spotify.py --tracks 20000 --latency-ms 30 --port 8901
+e aponte o app para ele com SPOTIFY_API_URL=http://127.0.0.1:8901/v1/ e
+SPOTIFY_ACCOUNTS_URL=http://127.0.0.1:8901.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, urlencode
+
+USER_ID = 'benchuser'
+
+# Limites por chamada da Web API
+PAGE_LIMITS = {'saved_tracks': 50, 'following': 50, 'playlists': 50, 'playlist_items': 100, 'search': 50}
+SAVED_TRACKS_IDS_LIMIT = 50
+FOLLOW_IDS_LIMIT = 50
+PLAYLIST_ITEMS_WRITE_LIMIT = 100
+RECOMMENDATIONS_LIMIT = 100
+
+_FIRST_NAMES = ['Beyoncé', 'João', 'Zé', 'Ana', 'Björk', 'Chico', 'Céline', 'Gal', 'Renée', 'Sérgio', 'Miles',
+                'Nina', 'Joni', 'Caetano', 'Marisa', 'Jorge', 'Elis', 'Tom', 'Rita', 'Seu']
+_LAST_NAMES = ['Gilberto', 'Buarque', 'Veloso', 'Costa', 'Jobim', 'Regina', 'Lee', 'Monte', 'Ben', 'Davis',
+               'Simone', 'Mitchell', 'Dion', 'Fleming', 'Mendes', 'Knowles', 'Guðmundsdóttir', 'Jorge', 'Nascimento']
+_WORDS = ['amor', 'noite', 'coração', 'saudade', 'mar', 'sol', 'lua', 'café', 'água', 'canção', 'dança', 'vento',
+          'love', 'night', 'heart', 'fire', 'rain', 'halo', 'dream', 'song']
+_BASE62 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+
+
+def spotify_id(kind, number):
+    """ID determinístico de 22 caracteres em base62, único por tipo."""
+    value = number * 7 + {'track': 1, 'artist': 2, 'playlist': 3, 'album': 4}[kind]
+    chars = []
+    while value:
+        value, digit = divmod(value, 62)
+        chars.append(_BASE62[digit])
+    return ''.join(reversed(chars)).rjust(22, '0')
+
+
+def _fold(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold().strip()
+
+
+class FakeLibrary:
+    """Catálogo e biblioteca sintéticos de um único usuário.
+
+    `duplicate_rate` é a fração das músicas curtidas que reaparece com outro ID
+    (mesmo ISRC), como versões de single e de álbum.
+    """
+
+    def __init__(self, tracks=2000, artists=300, playlists=50, playlist_size=50, duplicate_rate=0.02, seed=0):
+        rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.catalog_artists = []
+        for number in range(max(artists * 3, 50)):
+            name = f'{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}'
+            if number >= len(_FIRST_NAMES) * len(_LAST_NAMES) // 4:
+                name = f'{name} {number}'
+            self.catalog_artists.append({
+                'id': spotify_id('artist', number), 'name': name, 'type': 'artist',
+                'uri': f"spotify:artist:{spotify_id('artist', number)}",
+                'genres': rng.sample(['mpb', 'samba', 'pop', 'jazz', 'rock', 'bossa nova', 'soul'], 2),
+                'images': [{'url': f'https://example.com/artist/{number}.jpg', 'width': 160, 'height': 160}],
+                'popularity': rng.randint(0, 100),
+            })
+        self.artists_by_name = {}
+        for artist in self.catalog_artists:
+            self.artists_by_name.setdefault(_fold(artist['name']), artist)
+
+        now = time.time()
+        self.tracks = {}
+        self.saved = []  # (added_at, track_id), da mais recente para a mais antiga
+        for number in range(tracks):
+            track = self._new_track(rng, number)
+            if number and rng.random() < duplicate_rate:
+                original = self.tracks[self.saved[rng.randrange(len(self.saved))][1]]
+                track.update(
+                    name=original['name'], artists=original['artists'], duration_ms=original['duration_ms'] + 400,
+                    external_ids=dict(original['external_ids'])
+                )
+            self.tracks[track['id']] = track
+            added_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(now - number * 3600))
+            self.saved.append((added_at, track['id']))
+
+        self.followed = [artist['id'] for artist in self.catalog_artists[:artists]]
+
+        saved_ids = [track_id for _, track_id in self.saved]
+        self.playlists = {}
+        for number in range(playlists):
+            playlist_id = spotify_id('playlist', number)
+            items = [rng.choice(saved_ids) for _ in range(playlist_size)] if saved_ids else []
+            self.playlists[playlist_id] = {
+                'id': playlist_id, 'name': f'Playlist {number} {rng.choice(_WORDS)}',
+                'owner': {'id': USER_ID if number % 3 else 'someone', 'display_name': 'Bench' if number % 3 else 'Outro'},
+                'images': [], 'snapshot': 1, 'items': items, 'public': True, 'collaborative': False,
+            }
+
+    def _new_track(self, rng, number):
+        artist = rng.choice(self.catalog_artists)
+        track_id = spotify_id('track', number)
+        album_id = spotify_id('album', number // 10)
+        return {
+            'id': track_id, 'type': 'track', 'uri': f'spotify:track:{track_id}',
+            'name': ' '.join(rng.sample(_WORDS, 3)).capitalize(),
+            'artists': [{'id': artist['id'], 'name': artist['name'], 'uri': artist['uri']}],
+            'album': {
+                'id': album_id, 'name': f'Álbum {number // 10}',
+                'images': [{'url': f'https://example.com/album/{number // 10}.jpg', 'width': 300, 'height': 300}],
+            },
+            'duration_ms': rng.randint(120000, 360000),
+            'explicit': rng.random() < 0.1,
+            'external_ids': {'isrc': f'BR{number:010d}'},
+            'popularity': rng.randint(0, 100),
+        }
+
+    def top_tracks(self, artist_id):
+        """Dez faixas determinísticas por artista (criadas no catálogo na primeira chamada)."""
+        with self._lock:
+            artist = next(a for a in self.catalog_artists if a['id'] == artist_id)
+            rng = random.Random(artist_id)
+            tracks = []
+            for _ in range(10):
+                number = 10_000_000 + rng.randrange(10_000_000)
+                track = self.tracks.get(spotify_id('track', number))
+                if track is None:
+                    track = self._new_track(rng, number)
+                    track['artists'] = [{'id': artist['id'], 'name': artist['name'], 'uri': artist['uri']}]
+                    self.tracks[track['id']] = track
+                tracks.append(track)
+            return tracks
+
+    def playlist_object(self, playlist):
+        return {
+            'id': playlist['id'], 'name': playlist['name'], 'owner': playlist['owner'], 'images': playlist['images'],
+            'public': playlist['public'], 'collaborative': playlist['collaborative'], 'type': 'playlist',
+            'uri': f"spotify:playlist:{playlist['id']}", 'snapshot_id': f"snap{playlist['snapshot']}",
+            'tracks': {'total': len(playlist['items'])},
+        }
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+def _page(items, limit, offset, total=None):
+    return {'items': items, 'total': total, 'limit': limit, 'offset': offset, 'next': None, 'previous': None}
+
+
+def _limit(params, name, default=20):
+    limit = int(params.get('limit', default))
+    if not 1 <= limit <= PAGE_LIMITS[name]:
+        raise ApiError(400, f'Invalid limit: {limit} (max {PAGE_LIMITS[name]})')
+    return limit
+
+
+def _ids(value, kind, maximum):
+    ids = [item.split(':')[-1] for item in (value or '').split(',') if item]
+    if not ids:
+        raise ApiError(400, 'Missing ids')
+    if len(ids) > maximum:
+        raise ApiError(400, f'Too many ids requested: {len(ids)} (max {maximum} {kind}s)')
+    return ids
+
+
+class FakeSpotify:
+    """Servidor HTTP com a API falsa, rodando numa thread.
+
+    `latency_ms` (+ `jitter_ms` aleatório) é somado a toda resposta; `throttle_rate` é
+    a probabilidade de uma chamada receber 429 com `Retry-After: retry_after`.
+    """
+
+    def __init__(self, library=None, latency_ms=0, jitter_ms=0, throttle_rate=0.0, retry_after=1,
+                 host='127.0.0.1', port=0, seed=0):
+        self.library = library or FakeLibrary()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._stats_lock = threading.Lock()
+        self.calls = Counter()
+        self.throttled = Counter()
+        self.not_modified = Counter()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def api_url(self):
+        return f'{self.url}/v1/'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-spotify', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'calls': dict(self.calls), 'throttled': dict(self.throttled),
+                'not_modified': dict(self.not_modified),
+                'total_calls': sum(self.calls.values()), 'total_throttled': sum(self.throttled.values()),
+                'total_not_modified': sum(self.not_modified.values()),
+            }
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.calls.clear()
+            self.throttled.clear()
+            self.not_modified.clear()
+
+    # --- Roteamento ----------------------------------------------------------------
+
+    def _routes(self):
+        return [
+            ('GET', r'/authorize', self.authorize),
+            ('POST', r'/api/token', self.token),
+            ('GET', r'/v1/me', self.me),
+            ('GET', r'/v1/me/tracks', self.saved_tracks),
+            ('DELETE', r'/v1/me/tracks', self.delete_saved_tracks),
+            ('GET', r'/v1/me/following', self.following),
+            ('DELETE', r'/v1/me/following', self.unfollow),
+            ('GET', r'/v1/me/playlists', self.my_playlists),
+            ('POST', r'/v1/users/(?P<user>[^/]+)/playlists', self.create_playlist),
+            ('GET', r'/v1/playlists/(?P<playlist_id>[^/]+)/tracks', self.playlist_items),
+            ('POST', r'/v1/playlists/(?P<playlist_id>[^/]+)/tracks', self.add_playlist_items),
+            ('DELETE', r'/v1/playlists/(?P<playlist_id>[^/]+)/tracks', self.remove_playlist_items),
+            ('DELETE', r'/v1/playlists/(?P<playlist_id>[^/]+)/followers', self.unfollow_playlist),
+            ('GET', r'/v1/search', self.search),
+            ('GET', r'/v1/artists/(?P<artist_id>[^/]+)/top-tracks', self.top_tracks),
+            ('GET', r'/v1/recommendations', self.recommendations),
+        ]
+
+    def _handler_class(self):
+        service = self
+        routes = [(method, re.compile(pattern + '$'), view) for method, pattern, view in self._routes()]
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, como a API real
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self, method):
+                parts = urlsplit(self.path)
+                path = parts.path.rstrip('/') or '/'
+                params = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                length = int(self.headers.get('Content-Length') or 0)
+                raw_body = self.rfile.read(length) if length else b''
+                try:
+                    for route_method, pattern, view in routes:
+                        match = pattern.match(path)
+                        if match and route_method == method:
+                            break
+                    else:
+                        raise ApiError(404, f'Service not found: {method} {path}')
+                    endpoint = f'{method} {pattern.pattern[:-1]}'
+                    status, body, headers = service._call(endpoint, view, self.headers, params, raw_body, match)
+                except ApiError as e:
+                    status, body, headers = e.status, {'error': {'status': e.status, 'message': str(e)}}, e.headers
+                self._respond(status, body, headers)
+
+            def _respond(self, status, body, headers):
+                payload = b'' if body is None else json.dumps(body).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, str(value))
+                if body is not None:
+                    self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._dispatch('GET')
+
+            def do_POST(self):
+                self._dispatch('POST')
+
+            def do_PUT(self):
+                self._dispatch('PUT')
+
+            def do_DELETE(self):
+                self._dispatch('DELETE')
+
+        return Handler
+
+    def _call(self, endpoint, view, headers, params, raw_body, match):
+        with self._stats_lock:
+            self.calls[endpoint] += 1
+            throttle = self._random.random() < self.throttle_rate
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        if throttle:
+            with self._stats_lock:
+                self.throttled[endpoint] += 1
+            raise ApiError(429, 'API rate limit exceeded', {'Retry-After': self.retry_after})
+
+        is_oauth = not endpoint.split(' ', 1)[1].startswith('/v1/')
+        if not is_oauth and not (headers.get('Authorization') or '').startswith('Bearer '):
+            raise ApiError(401, 'No token provided')
+
+        if (headers.get('Content-Type') or '').startswith('application/x-www-form-urlencoded'):
+            body = {key: values[-1] for key, values in parse_qs(raw_body.decode()).items()}
+        else:
+            body = json.loads(raw_body) if raw_body else None
+        result = view(params=params, body=body, **match.groupdict())
+        if isinstance(result, tuple):
+            return result
+        if endpoint.startswith('GET /v1/'):
+            # Como a API real: ETag nas leituras e 304 sem corpo quando o If-None-Match confere
+            etag = '"%s"' % hashlib.sha1(json.dumps(result, sort_keys=True).encode()).hexdigest()
+            cache_headers = {'ETag': etag, 'Cache-Control': 'private, max-age=0'}
+            if headers.get('If-None-Match') == etag:
+                with self._stats_lock:
+                    self.not_modified[endpoint] += 1
+                return 304, None, cache_headers
+            return 200, result, cache_headers
+        return 200, result, {}
+
+    # --- OAuth -----------------------------------------------------------------------
+
+    def authorize(self, params, body):
+        query = urlencode({'code': 'fake-code', **({'state': params['state']} if 'state' in params else {})})
+        return 302, None, {'Location': f"{params.get('redirect_uri', '/')}?{query}"}
+
+    def token(self, params, body):
+        body = body or {}
+        if 'token' in body:  # revogação (ver SpotifyHandler.revoke_token)
+            return {}
+        return {
+            'access_token': f'fake-access-{time.time_ns()}', 'token_type': 'Bearer', 'expires_in': 3600,
+            'refresh_token': body.get('refresh_token', 'fake-refresh'), 'scope': body.get('scope', ''),
+        }
+
+    # --- Usuário e biblioteca --------------------------------------------------------
+
+    def me(self, params, body):
+        return {'id': USER_ID, 'display_name': 'Bench', 'images': [], 'type': 'user', 'uri': f'spotify:user:{USER_ID}'}
+
+    def saved_tracks(self, params, body):
+        limit, offset = _limit(params, 'saved_tracks'), int(params.get('offset', 0))
+        library = self.library
+        with library._lock:
+            window = library.saved[offset:offset + limit]
+            total = len(library.saved)
+            items = [{'added_at': added_at, 'track': library.tracks[track_id]} for added_at, track_id in window]
+        return _page(items, limit, offset, total)
+
+    def delete_saved_tracks(self, params, body):
+        ids = set(_ids(params.get('ids'), 'track', SAVED_TRACKS_IDS_LIMIT))
+        with self.library._lock:
+            self.library.saved = [entry for entry in self.library.saved if entry[1] not in ids]
+        return 200, None, {}
+
+    def following(self, params, body):
+        if params.get('type') != 'artist':
+            raise ApiError(400, 'Only type=artist is supported')
+        limit = _limit(params, 'following')
+        library = self.library
+        with library._lock:
+            followed = library.followed
+            if params.get('after'):
+                # Cursor de um artista que deixou de ser seguido: fim da lista
+                start = followed.index(params['after']) + 1 if params['after'] in followed else len(followed)
+            else:
+                start = 0
+            window = followed[start:start + limit]
+            by_id = {artist['id']: artist for artist in library.catalog_artists}
+            items = [by_id[artist_id] for artist_id in window]
+            after = window[-1] if window and start + limit < len(followed) else None
+            total = len(followed)
+        return {'artists': {'items': items, 'total': total, 'limit': limit, 'cursors': {'after': after}, 'next': None}}
+
+    def unfollow(self, params, body):
+        ids = set(_ids(params.get('ids'), 'artist', FOLLOW_IDS_LIMIT))
+        with self.library._lock:
+            self.library.followed = [artist_id for artist_id in self.library.followed if artist_id not in ids]
+        return 204, None, {}
+
+    # --- Playlists ---------------------------------------------------------------------
+
+    def my_playlists(self, params, body):
+        limit, offset = _limit(params, 'playlists'), int(params.get('offset', 0))
+        with self.library._lock:
+            playlists = list(self.library.playlists.values())
+            items = [self.library.playlist_object(playlist) for playlist in playlists[offset:offset + limit]]
+        return _page(items, limit, offset, len(playlists))
+
+    def _playlist(self, playlist_id):
+        playlist = self.library.playlists.get(playlist_id)
+        if playlist is None:
+            raise ApiError(404, 'Not found.')
+        return playlist
+
+    def create_playlist(self, params, body, user):
+        body = body or {}
+        with self.library._lock:
+            playlist_id = spotify_id('playlist', 1_000_000 + len(self.library.playlists))
+            playlist = {
+                'id': playlist_id, 'name': body.get('name', ''), 'owner': {'id': user, 'display_name': 'Bench'},
+                'images': [], 'snapshot': 1, 'items': [], 'public': body.get('public', True),
+                'collaborative': body.get('collaborative', False),
+            }
+            self.library.playlists[playlist_id] = playlist
+            return 201, self.library.playlist_object(playlist), {}
+
+    def playlist_items(self, params, body, playlist_id):
+        limit, offset = _limit(params, 'playlist_items'), int(params.get('offset', 0))
+        with self.library._lock:
+            playlist = self._playlist(playlist_id)
+            window = playlist['items'][offset:offset + limit]
+            items = [{'added_at': None, 'track': self.library.tracks.get(track_id)} for track_id in window]
+            total = len(playlist['items'])
+        return _page(items, limit, offset, total)
+
+    def add_playlist_items(self, params, body, playlist_id):
+        uris = body if isinstance(body, list) else (body or {}).get('uris', [])
+        if len(uris) > PLAYLIST_ITEMS_WRITE_LIMIT:
+            raise ApiError(400, f'Too many tracks: {len(uris)} (max {PLAYLIST_ITEMS_WRITE_LIMIT})')
+        with self.library._lock:
+            playlist = self._playlist(playlist_id)
+            playlist['items'].extend(uri.split(':')[-1] for uri in uris)
+            playlist['snapshot'] += 1
+            return 201, {'snapshot_id': f"snap{playlist['snapshot']}"}, {}
+
+    def remove_playlist_items(self, params, body, playlist_id):
+        tracks = (body or {}).get('tracks', [])
+        if len(tracks) > PLAYLIST_ITEMS_WRITE_LIMIT:
+            raise ApiError(400, f'Too many tracks: {len(tracks)} (max {PLAYLIST_ITEMS_WRITE_LIMIT})')
+        with self.library._lock:
+            playlist = self._playlist(playlist_id)
+            drop = set()
+            for track in tracks:
+                track_id = track['uri'].split(':')[-1]
+                positions = track.get('positions')
+                if positions is None:
+                    drop.update(i for i, item in enumerate(playlist['items']) if item == track_id)
+                    continue
+                for position in positions:
+                    if position >= len(playlist['items']) or playlist['items'][position] != track_id:
+                        raise ApiError(400, 'Could not remove tracks, please check parameters.')
+                    drop.add(position)
+            playlist['items'] = [item for i, item in enumerate(playlist['items']) if i not in drop]
+            playlist['snapshot'] += 1
+            return {'snapshot_id': f"snap{playlist['snapshot']}"}
+
+    def unfollow_playlist(self, params, body, playlist_id):
+        with self.library._lock:
+            self._playlist(playlist_id)
+            del self.library.playlists[playlist_id]
+        return 200, None, {}
+
+    # --- Catálogo -----------------------------------------------------------------------
+
+    def search(self, params, body):
+        if params.get('type') != 'artist':
+            raise ApiError(400, 'Only type=artist is supported')
+        limit = _limit(params, 'search', default=10)
+        query = re.sub(r'^artist:"?|"$', '', params.get('q', ''))
+        artist = self.library.artists_by_name.get(_fold(query))
+        items = [artist] if artist else []
+        return {'artists': _page(items[:limit], limit, 0, len(items))}
+
+    def top_tracks(self, params, body, artist_id):
+        if not any(artist['id'] == artist_id for artist in self.library.catalog_artists):
+            raise ApiError(404, 'Not found.')
+        return {'tracks': self.library.top_tracks(artist_id)}
+
+    def recommendations(self, params, body):
+        limit = int(params.get('limit', 20))
+        if not 1 <= limit <= RECOMMENDATIONS_LIMIT:
+            raise ApiError(400, f'Invalid limit: {limit}')
+        with self.library._lock:
+            tracks = list(self.library.tracks.values())[:limit]
+        return {'tracks': tracks, 'seeds': []}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serviço falso da Web API do Spotify.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8901)
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--artists', type=int, default=300)
+    parser.add_argument('--playlists', type=int, default=50)
+    parser.add_argument('--playlist-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--throttle-rate', type=float, default=0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    args = parser.parse_args()
+
+    library = FakeLibrary(args.tracks, args.artists, args.playlists, args.playlist_size)
+    service = FakeSpotify(
+        library, args.latency_ms, args.jitter_ms, args.throttle_rate, args.retry_after, args.host, args.port
+    )
+    print(f'API falsa do Spotify em {service.api_url} (OAuth em {service.url})')
+    try:
+        service.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# bulk.py
+import asyncio
+import logging
+from config import Config
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Máximo de IDs aceitos por chamada em cada endpoint de escrita da Web API
+SAVED_TRACKS_DELETE_LIMIT = 50
+ARTISTS_UNFOLLOW_LIMIT = 50
+PLAYLIST_ADD_LIMIT = 100
+PLAYLIST_REMOVE_LIMIT = 100
+
+# Espera base (s) entre rodadas de nova tentativa; dobra a cada rodada
+RETRY_BACKOFF = 0.5
+
+
+class BulkReport:
+    """Resultado por ID de uma operação em lote: None para sucesso, mensagem de erro para falha."""
+
+    def __init__(self):
+        self.results = {}
+
+    @property
+    def succeeded(self):
+        return [item_id for item_id, error in self.results.items() if error is None]
+
+    @property
+    def failed(self):
+        return {item_id: error for item_id, error in self.results.items() if error is not None}
+
+    def to_dict(self):
+        return {'succeeded': self.succeeded, 'failed': self.failed}
+
+    def __repr__(self):
+        return f"BulkReport(succeeded={len(self.succeeded)}, failed={len(self.failed)})"
+
+
+def chunked(ids, size):
+    """Divide uma lista de IDs em blocos de no máximo `size` itens."""
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+async def run_bulk_async(call, ids, chunk_size, max_workers=None, retries=None, is_retryable=None, progress=None):
+    """Executa a corrotina `call(chunk)` para cada bloco de IDs e retorna um BulkReport.
+
+    Os blocos de cada rodada são disparados juntos, até `max_workers` por vez (sem
+    ele, só o semáforo do AsyncBridge limita as requisições em voo). Ao final de cada
+    rodada, apenas os blocos que falharam com erro recuperável são tentados de novo.
+    Use `max_workers=1` quando a ordem das chamadas importa (ex.: adicionar a uma
+    playlist). Se informado, `progress(report, total)` é chamado assim que cada bloco
+    termina, sem esperar o resto da rodada.
+    """
+    retries = Config.SPOTIFY_BULK_RETRIES if retries is None else retries
+    is_retryable = is_retryable or (lambda error: True)
+
+    # Remove IDs repetidos mantendo a ordem
+    ids = list(dict.fromkeys(item_id for item_id in ids if item_id))
+    report = BulkReport()
+    pending = chunked(ids, chunk_size)
+
+    # Sem max_workers, o limite é só o semáforo do AsyncBridge; com 1, os blocos saem em ordem
+    slots = asyncio.Semaphore(max_workers) if max_workers else None
+
+    async def attempt(chunk, last_round):
+        """Executa um bloco; retorna True se ele deve ir para a próxima rodada."""
+        try:
+            if slots is None:
+                await call(chunk)
+            else:
+                async with slots:
+                    await call(chunk)
+            error = None
+        except Exception as e:
+            if not last_round and is_retryable(e):
+                return True
+            error = str(e)
+        for item_id in chunk:
+            report.results[item_id] = error
+        if progress:
+            progress(report, len(ids))
+        return False
+
+    for round_number in range(retries + 1):
+        if not pending:
+            break
+        if round_number:
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** (round_number - 1))
+            logger.info(f"Nova tentativa de {len(pending)} blocos (rodada {round_number}).")
+
+        last_round = round_number == retries
+        retry = await asyncio.gather(*(attempt(chunk, last_round) for chunk in pending))
+        pending = [chunk for chunk, again in zip(pending, retry) if again]
+
+    if report.failed:
+        logger.warning(f"{len(report.failed)} de {len(ids)} IDs falharam na operação em lote.")
+    return report
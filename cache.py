@@ -0,0 +1,294 @@
+# cache.py
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from config import Config
+from metrics import registry
+from search import fold
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Marcador para "chave ausente", já que None é um valor válido (cache negativo)
+MISSING = object()
+# Versão do normalize_artist_name; ao mudar, as chaves já gravadas em disco são refeitas
+ARTIST_KEY_VERSION = 1
+
+
+class TTLCache:
+    """Cache em memória com tamanho limitado, despejo LRU e expiração por TTL.
+
+    Seguro para uso entre threads. Valores None são guardados normalmente, o que permite
+    cache negativo com um TTL próprio. Com `maxbytes`, o total de `sizeof(valor)` das
+    entradas também é limitado (ex.: corpos de resposta de tamanhos muito diferentes).
+    """
+
+    def __init__(self, maxsize, ttl, negative_ttl=None, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._pop(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        size = self.sizeof(value) if self.sizeof else 0
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (value, time.monotonic() + ttl, size)
+            self.bytes += size
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self.bytes > self.maxbytes):
+                _, (_, _, evicted) = self._data.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        stats = {
+            'size': len(self._data), 'maxsize': self.maxsize,
+            'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+        }
+        if self.maxbytes is not None:
+            stats.update(bytes=self.bytes, maxbytes=self.maxbytes)
+        return stats
+
+
+class KeyedLocks:
+    """Um lock por chave (ex.: usuário e coleção), criado sob demanda.
+
+    Os locks só vivem enquanto alguém os segura ou espera por eles, então o dicionário
+    não cresce com o número de usuários.
+    """
+
+    def __init__(self):
+        self._locks = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __call__(self, *key):
+        with self._lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+
+class DiskCache:
+    """Camada opcional em disco (SQLite) para valores serializáveis em JSON, compartilhada entre processos."""
+
+    def __init__(self, path, table, rekey=None, key_version=0):
+        self.path = path
+        self.table = table
+        self.rekey = rekey  # Refaz uma chave gravada por uma versão anterior da normalização
+        self.key_version = key_version
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {self.table} '
+                '(key TEXT PRIMARY KEY, value TEXT, expires_at REAL NOT NULL)'
+            )
+            if self.rekey is not None:
+                self._migrate_keys(conn)
+            self._local.conn = conn
+        return conn
+
+    def _migrate_keys(self, conn):
+        # Entradas gravadas com a normalização antiga são regravadas com a atual, em vez
+        # de ficarem inacessíveis até expirar; um processo por vez, uma vez por versão
+        conn.execute('CREATE TABLE IF NOT EXISTS cache_key_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT version FROM cache_key_versions WHERE name = ?', (self.table,)).fetchone()
+            if row is not None and row[0] >= self.key_version:
+                return
+            rows = conn.execute(f'SELECT key, value, expires_at FROM {self.table}').fetchall()
+            conn.execute(f'DELETE FROM {self.table}')
+            conn.executemany(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                [(self.rekey(key), value, expires_at) for key, value, expires_at in rows]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_key_versions (name, version) VALUES (?, ?)', (self.table, self.key_version)
+            )
+        if rows:
+            logger.info(f"{len(rows)} chaves do cache em disco {self.table} refeitas (versão {self.key_version}).")
+
+    def get(self, key, default=MISSING):
+        row = self._connect().execute(
+            f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), time.time() + ttl)
+            )
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class TieredCache:
+    """Combina o TTLCache em memória com um DiskCache opcional (gravação nas duas camadas)."""
+
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor da chave, chamando `loader()` apenas se nenhuma camada o tiver."""
+        value = self._lookup(key)
+        if value is MISSING:
+            value = loader()
+            self._store(key, value)
+        return value
+
+    async def get_or_load_async(self, key, loader):
+        """Como `get_or_load`, para um `loader` assíncrono (ver async_client).
+
+        Sem a camada em disco tudo fica em memória; com ela, a leitura e a gravação no
+        SQLite (que podem esperar o lock de outro worker) rodam no executor padrão, fora
+        do event loop.
+        """
+        if self.disk is None:
+            value = self._lookup(key)
+            if value is MISSING:
+                value = await loader()
+                self._store(key, value)
+            return value
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+        loop = asyncio.get_running_loop()
+        value = await loop.run_in_executor(None, self._lookup, key)
+        if value is MISSING:
+            value = await loader()
+            await loop.run_in_executor(None, self._store, key, value)
+        return value
+
+    def _lookup(self, key):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not MISSING:
+                self.memory.set(key, value)
+        return value
+
+    def _store(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            ttl = self.memory.negative_ttl if value is None else self.memory.ttl
+            try:
+                self.disk.set(key, value, ttl)
+            except sqlite3.Error as e:
+                # A camada em disco é só uma otimização: falhas não interrompem a requisição
+                logger.warning(f"Erro ao gravar no cache em disco: {e}")
+
+    def stats(self):
+        stats = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
+
+
+def normalize_artist_name(name):
+    """Normaliza o nome do artista para uso como chave, como a busca (search.fold).
+
+    "Beyoncé" e "BEYONCE" viram a mesma chave. Nomes só de pontuação ("!!!") ficariam
+    vazios; para eles a chave considera apenas caixa e espaços.
+    """
+    return fold(name) or ' '.join(name.casefold().split())
+
+
+class ArtistCache:
+    """Cache do processo para nome de artista → ID e top tracks por artista e mercado."""
+
+    def __init__(self):
+        disk_path = Config.ARTIST_CACHE_DB_PATH
+        self.ids = TieredCache(
+            TTLCache(Config.ARTIST_CACHE_SIZE, Config.ARTIST_CACHE_TTL, Config.ARTIST_CACHE_NEGATIVE_TTL),
+            DiskCache(disk_path, 'artist_ids', normalize_artist_name, ARTIST_KEY_VERSION) if disk_path else None
+        )
+        self.top_tracks = TieredCache(
+            TTLCache(Config.ARTIST_CACHE_SIZE, Config.TOP_TRACKS_CACHE_TTL),
+            DiskCache(disk_path, 'artist_top_tracks') if disk_path else None
+        )
+
+    def resolve(self, artist_name, loader):
+        """Retorna o ID do artista (ou None se não existir), consultando `loader` só em caso de miss."""
+        return self.ids.get_or_load(normalize_artist_name(artist_name), loader)
+
+    def top_track_ids(self, artist_id, market, loader):
+        """Retorna os IDs das top tracks do artista no mercado informado."""
+        return self.top_tracks.get_or_load(f'{artist_id}:{market}', loader)
+
+    async def resolve_async(self, artist_name, loader):
+        return await self.ids.get_or_load_async(normalize_artist_name(artist_name), loader)
+
+    async def top_track_ids_async(self, artist_id, market, loader):
+        return await self.top_tracks.get_or_load_async(f'{artist_id}:{market}', loader)
+
+    def stats(self):
+        return {'artist_ids': self.ids.stats(), 'top_tracks': self.top_tracks.stats()}
+
+
+artist_cache = ArtistCache()
+# Perfil (/me) de cada usuário, lido no login e exibido no dashboard
+user_profiles = TTLCache(Config.PLAYLIST_INDEX_CACHE_SIZE, Config.LIBRARY_SNAPSHOT_TTL)
+registry.register_cache('artist_ids', artist_cache.ids.memory)
+registry.register_cache('artist_top_tracks', artist_cache.top_tracks.memory)
+registry.register_cache('user_profiles', user_profiles)
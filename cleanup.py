@@ -0,0 +1,183 @@
+# cleanup.py
+import logging
+import math
+import time
+import numpy as np
+from search import fold
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Regras de limpeza aceitas (parâmetro do formulário/URL -> descrição)
+RULES = {
+    'added_before': 'Curtida antes de',
+    'added_after': 'Curtida depois de',
+    'artist_in': 'Artista em',
+    'duration_lt': 'Duração menor que (s)',
+    'duration_gt': 'Duração maior que (s)',
+    'explicit': 'Conteúdo explícito',
+    'not_in_playlist': 'Fora de todas as playlists',
+}
+# Como as regras se combinam: todas precisam casar, ou qualquer uma basta
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+# Músicas listadas na prévia (as contagens valem para a biblioteca inteira)
+PREVIEW_SIZE = 100
+# Artistas mais afetados mostrados na prévia
+PREVIEW_ARTISTS = 10
+
+
+def _day(value, rule):
+    try:
+        return np.datetime64(value.strip()[:10], 's')
+    except ValueError:
+        raise ValueError(f"Data inválida em {RULES[rule]}: {value!r} (use AAAA-MM-DD).")
+
+
+def _seconds(value, rule):
+    try:
+        seconds = float(value)
+        # inf e nan passam pelo float(), mas não viram milissegundos
+        if not math.isfinite(seconds):
+            raise ValueError
+        return int(seconds * 1000)
+    except (ValueError, OverflowError):
+        raise ValueError(f"Número inválido em {RULES[rule]}: {value!r}.")
+
+
+def parse_rules(args):
+    """Lê as regras de um MultiDict (request.args ou request.form); campos vazios são ignorados.
+
+    Retorna ([(regra, valor)], modo de combinação). Levanta ValueError para valores inválidos.
+    """
+    rules = []
+    for rule in RULES:
+        value = (args.get(rule) or '').strip()
+        if not value:
+            continue
+        if rule in ('added_before', 'added_after'):
+            rules.append((rule, _day(value, rule)))
+        elif rule in ('duration_lt', 'duration_gt'):
+            rules.append((rule, _seconds(value, rule)))
+        elif rule == 'artist_in':
+            names = [name.strip() for name in value.split(',') if name.strip()]
+            if names:
+                rules.append((rule, names))
+        elif value not in ('0', 'false', 'off'):
+            rules.append((rule, True))
+    match = MATCH_ANY if args.get('match') == MATCH_ANY else MATCH_ALL
+    return rules, match
+
+
+class TrackColumns:
+    """Músicas curtidas em colunas NumPy, para avaliar regras sobre a biblioteca inteira.
+
+    Cada regra vira uma máscara booleana calculada de uma vez sobre todas as faixas,
+    sem laço em Python por música. Os artistas ficam como pares achatados
+    (faixa, código do artista), já que uma música pode ter vários.
+    """
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.ids = [track.id for track in tracks]
+        self.positions = {track_id: position for position, track_id in enumerate(self.ids)}
+        # "2024-01-31T12:00:00Z" -> segundos (o NumPy não aceita o sufixo de fuso)
+        self.added_at = np.array([(track.added_at or '1970-01-01')[:19] for track in tracks], dtype='datetime64[s]')
+        self.duration_ms = np.array([track.duration_ms or 0 for track in tracks], dtype=np.int64)
+        self.explicit = np.array([bool(track.explicit) for track in tracks], dtype=bool)
+
+        self.artist_codes = {}  # nome sem acentos (search.fold) -> código
+        self.artist_names = []  # código -> nome exibido
+        artist_track, artist_code = [], []
+        for position, track in enumerate(tracks):
+            for name in track.artists:
+                key = fold(name)
+                code = self.artist_codes.get(key)
+                if code is None:
+                    code = self.artist_codes[key] = len(self.artist_names)
+                    self.artist_names.append(name)
+                artist_track.append(position)
+                artist_code.append(code)
+        self.artist_track = np.array(artist_track, dtype=np.int32)
+        self.artist_code = np.array(artist_code, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def artist_mask(self, names):
+        """Faixas em que qualquer um dos artistas aparece (sem diferenciar acentos/maiúsculas)."""
+        codes = [self.artist_codes[key] for key in map(fold, names) if key in self.artist_codes]
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.artist_track[np.isin(self.artist_code, codes)]] = True
+        return mask
+
+    def id_mask(self, track_ids):
+        """Faixas cujos IDs estão em `track_ids`."""
+        mask = np.zeros(len(self), dtype=bool)
+        mask[[self.positions[track_id] for track_id in track_ids if track_id in self.positions]] = True
+        return mask
+
+    def rule_mask(self, rule, value, playlist_track_ids=None):
+        if rule == 'added_before':
+            return self.added_at < value
+        if rule == 'added_after':
+            return self.added_at >= value + np.timedelta64(1, 'D')
+        if rule == 'artist_in':
+            return self.artist_mask(value)
+        if rule == 'duration_lt':
+            return (self.duration_ms > 0) & (self.duration_ms < value)
+        if rule == 'duration_gt':
+            return self.duration_ms > value
+        if rule == 'explicit':
+            return self.explicit.copy()
+        if rule == 'not_in_playlist':
+            return ~self.id_mask(playlist_track_ids or ())
+        raise ValueError(f"Regra desconhecida: {rule}")
+
+    def top_artists(self, mask, limit=PREVIEW_ARTISTS):
+        """[(artista, músicas selecionadas)] dos artistas com mais faixas na máscara."""
+        counts = np.bincount(self.artist_code[mask[self.artist_track]], minlength=len(self.artist_names))
+        top = np.argsort(counts, kind='stable')[::-1][:limit]
+        return [(self.artist_names[code], int(counts[code])) for code in top if counts[code]]
+
+
+def cleanup_plan(columns, rules, match=MATCH_ALL, playlist_track_ids=None, preview_size=PREVIEW_SIZE):
+    """Avalia as regras sobre todas as músicas curtidas, sem remover nada (dry-run).
+
+    Retorna as contagens (total, removidas, mantidas, por regra), os artistas mais
+    afetados, uma amostra das músicas que sairiam e os IDs de todas elas, prontos para
+    `SpotifyHandler.remove_liked_tracks`. Sem regras, nenhuma música é selecionada.
+    """
+    started = time.perf_counter()
+    total = len(columns)
+    rule_counts = {}
+    if rules:
+        mask = np.ones(total, dtype=bool) if match == MATCH_ALL else np.zeros(total, dtype=bool)
+        for rule, value in rules:
+            rule_mask = columns.rule_mask(rule, value, playlist_track_ids)
+            rule_counts[rule] = int(rule_mask.sum())
+            mask = mask & rule_mask if match == MATCH_ALL else mask | rule_mask
+    else:
+        mask = np.zeros(total, dtype=bool)
+
+    positions = np.flatnonzero(mask)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"Plano de limpeza: {len(positions)} de {total} músicas ({elapsed_ms:.1f}ms).")
+    return {
+        'total': total,
+        'matched': len(positions),
+        'kept': total - len(positions),
+        'match': match,
+        'rules': rule_counts,
+        'artists': columns.top_artists(mask),
+        'tracks': [
+            {
+                'id': track.id, 'name': track.name, 'artist': track.artist,
+                'album_name': track.album_name, 'added_at': track.added_at,
+            }
+            for track in (columns.tracks[position] for position in positions[:preview_size])
+        ],
+        'track_ids': [columns.ids[position] for position in positions],
+        'elapsed_ms': round(elapsed_ms, 2),
+    }
@@ -8,3 +8,49 @@ class Config:
     SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")  # ID do cliente Spotify
     SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")  # Segredo do cliente Spotify
     REDIRECT_URI = os.getenv("REDIRECT_URI")  # URI de redirecionamento
+    SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1/")  # Base da Web API (ex.: serviço falso dos benchmarks)
+    SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")  # Base do OAuth
+    LIBRARY_DB_PATH = os.getenv("LIBRARY_DB_PATH", "spoticlean.db")  # Snapshot local das bibliotecas
+    LIBRARY_SNAPSHOT_TTL = int(os.getenv("LIBRARY_SNAPSHOT_TTL", 600))  # Validade (s) de artistas e playlists
+    SPOTIFY_ASYNC_CONCURRENCY = int(os.getenv("SPOTIFY_ASYNC_CONCURRENCY", 64))  # Requisições em voo do cliente assíncrono por processo
+    SPOTIFY_BULK_RETRIES = int(os.getenv("SPOTIFY_BULK_RETRIES", 2))  # Novas tentativas por bloco em operações em lote
+    ARTIST_CACHE_SIZE = int(os.getenv("ARTIST_CACHE_SIZE", 10000))  # Entradas do cache de artistas em memória
+    ARTIST_CACHE_TTL = int(os.getenv("ARTIST_CACHE_TTL", 86400))  # Validade (s) de nome → ID de artista
+    ARTIST_CACHE_NEGATIVE_TTL = int(os.getenv("ARTIST_CACHE_NEGATIVE_TTL", 3600))  # Validade (s) de nomes não encontrados
+    TOP_TRACKS_CACHE_TTL = int(os.getenv("TOP_TRACKS_CACHE_TTL", 21600))  # Validade (s) das top tracks por artista
+    TOP_TRACKS_MARKET = os.getenv("TOP_TRACKS_MARKET", "US")  # Mercado usado nas top tracks
+    ARTIST_CACHE_DB_PATH = os.getenv("ARTIST_CACHE_DB_PATH")  # Camada em disco opcional do cache de artistas
+    RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "spoticlean_ratelimit.db")  # Token bucket compartilhado entre workers
+    RATE_LIMIT_RATE = float(os.getenv("RATE_LIMIT_RATE", 10))  # Requisições por segundo à API
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", 20))  # Capacidade do token bucket
+    RATE_LIMIT_BACKGROUND_RESERVE = int(os.getenv("RATE_LIMIT_BACKGROUND_RESERVE", 5))  # Tokens reservados a páginas interativas
+    RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", 20))  # Espera máxima (s) de uma requisição interativa
+    SPOTIFY_MAX_RETRIES = int(os.getenv("SPOTIFY_MAX_RETRIES", 4))  # Novas tentativas após 429/5xx
+    SPOTIFY_BACKOFF_BASE = float(os.getenv("SPOTIFY_BACKOFF_BASE", 0.5))  # Espera inicial (s) após 5xx
+    SPOTIFY_BACKOFF_MAX = float(os.getenv("SPOTIFY_BACKOFF_MAX", 8))  # Espera máxima (s) após 5xx
+    HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4))  # Hosts distintos mantidos no pool
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 32))  # Conexões keep-alive por host
+    SPOTIFY_REQUEST_TIMEOUT = float(os.getenv("SPOTIFY_REQUEST_TIMEOUT", 10))  # Timeout (s) das chamadas HTTP
+    HTTP_CACHE_SIZE = int(os.getenv("HTTP_CACHE_SIZE", 1000))  # Respostas GET guardadas em memória (0 desativa o cache)
+    HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", 8 * 1024 * 1024))  # Total de bytes dos corpos guardados em memória
+    HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", 86400))  # Tempo (s) que uma resposta fica guardada para revalidação
+    HTTP_CACHE_DB_PATH = os.getenv("HTTP_CACHE_DB_PATH")  # Camada em disco opcional do cache de respostas
+    SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "spoticlean_sessions.db")  # Sessões (tokens) guardadas no servidor
+    SESSION_TTL = int(os.getenv("SESSION_TTL", 2592000))  # Sessões sem uso por esse tempo (s) expiram
+    SESSION_REFRESH_TIMEOUT = float(os.getenv("SESSION_REFRESH_TIMEOUT", 15))  # Espera máxima (s) por uma renovação feita por outro worker
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "spoticlean_jobs.db")  # Fila de jobs em segundo plano
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))  # Threads de job por processo
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))  # Intervalo (s) de leitura da fila
+    JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 900))  # Jobs cujo worker não dá sinal de vida por esse tempo voltam à fila
+    JOB_TRACK_THRESHOLD = int(os.getenv("JOB_TRACK_THRESHOLD", 200))  # Remoções de músicas acima disso viram job
+    JOB_ARTIST_THRESHOLD = int(os.getenv("JOB_ARTIST_THRESHOLD", 10))  # Playlists com mais artistas que isso viram job
+    SAVED_TRACKS_SYNC_INTERVAL = int(os.getenv("SAVED_TRACKS_SYNC_INTERVAL", 30))  # Intervalo (s) mínimo entre sincronizações das músicas curtidas
+    LIBRARY_WARM_UP = os.getenv("LIBRARY_WARM_UP", "true").lower() == "true"  # Carrega a biblioteca em segundo plano logo após o login
+    STATS_RECENCY_HALF_LIFE = float(os.getenv("STATS_RECENCY_HALF_LIFE", 90))  # Dias para o peso de uma curtida cair pela metade nas estatísticas
+    PLAYLIST_INDEX_CACHE_SIZE = int(os.getenv("PLAYLIST_INDEX_CACHE_SIZE", 1000))  # Usuários com índice de playlists/artistas em memória
+    API_PAGE_SIZE = int(os.getenv("API_PAGE_SIZE", 100))  # Itens por página da API JSON (/api/v1)
+    API_MAX_PAGE_SIZE = int(os.getenv("API_MAX_PAGE_SIZE", 500))  # Máximo aceito em `limit=` na API JSON
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 50))  # Registros por bloco escrito na exportação
+    EXPORT_PREFETCH_PLAYLISTS = int(os.getenv("EXPORT_PREFETCH_PLAYLISTS", 8))  # Playlists com faixas buscadas adiantadas na exportação
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # Bearer token exigido em /metrics (vazio = aberto)
+    METRICS_DEBUG_HEADER = os.getenv("METRICS_DEBUG_HEADER", "false").lower() == "true"  # Envia o resumo de chamadas no X-Spotify-Calls
@@ -0,0 +1,122 @@
+# dedupe.py
+import re
+from search import fold
+
+# Durações dentro da mesma faixa de 2s (ou vizinhas) contam como a mesma gravação
+DURATION_BUCKET_MS = 2000
+
+# Sufixos que mudam o título sem mudar a gravação: "(Remastered 2011)", " - Single Version"...
+_VERSION_WORDS = r'remaster\w*|version|versao|mono|stereo|single|album|deluxe|edition|explicit|clean'
+_VERSION_PARENS = re.compile(rf'\s*[(\[][^)\]]*\b({_VERSION_WORDS})\b[^)\]]*[)\]]', re.IGNORECASE)
+_VERSION_SUFFIX = re.compile(rf'\s+[-–]\s+[^-–]*\b({_VERSION_WORDS})\b.*$', re.IGNORECASE)
+
+SAVED = 'saved'
+
+
+def recording_title(name):
+    """Título sem marcações de versão/remasterização, normalizado para comparação."""
+    name = _VERSION_PARENS.sub('', name or '')
+    name = _VERSION_SUFFIX.sub('', name)
+    return fold(name)
+
+
+def recording_key(track):
+    """Chave (artista principal, título, faixa de duração) de uma faixa, ou None sem dados."""
+    artists = track.get('artists') or [track.get('artist')]
+    title = recording_title(track.get('name'))
+    if not title or not artists or not artists[0] or not track.get('duration_ms'):
+        return None
+    return fold(artists[0]), title, track['duration_ms'] // DURATION_BUCKET_MS
+
+
+class _DisjointSet:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        root = item
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[item] != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_duplicates(saved_tracks, playlists=()):
+    """Agrupa ocorrências da mesma gravação nas músicas curtidas e nas playlists.
+
+    Duas ocorrências são a mesma gravação se tiverem o mesmo ID, o mesmo ISRC ou a mesma
+    chave (artista, título, duração) — com a faixa de duração vizinha também aceita.
+    Usa apenas dicionários de hash e união de conjuntos: tempo e memória lineares.
+
+    `playlists` é uma sequência de dicionários com `id`, `name`, `editable` e `tracks`
+    (faixas com `position`). Retorna os grupos e as remoções sugeridas: curtidas
+    repetidas (mantém a mais antiga) e repetições dentro de cada playlist editável
+    (mantém a primeira posição).
+    """
+    occurrences = [dict(track, source=SAVED) for track in saved_tracks]
+    for playlist in playlists:
+        occurrences.extend(
+            dict(track, source=playlist['id'], playlist_name=playlist['name'], editable=playlist.get('editable', False))
+            for track in playlist['tracks'] if track.get('id')
+        )
+
+    groups = _DisjointSet(len(occurrences))
+    by_id, by_isrc, by_key = {}, {}, {}
+    for number, track in enumerate(occurrences):
+        groups.union(number, by_id.setdefault(track['id'], number))
+        isrc = (track.get('isrc') or '').upper()
+        if isrc:
+            groups.union(number, by_isrc.setdefault(isrc, number))
+        key = recording_key(track)
+        if key is not None:
+            artist, title, bucket = key
+            for neighbour in (bucket - 1, bucket + 1):
+                match = by_key.get((artist, title, neighbour))
+                if match is not None:
+                    groups.union(number, match)
+            groups.union(number, by_key.setdefault(key, number))
+
+    members = {}
+    for number in range(len(occurrences)):
+        members.setdefault(groups.find(number), []).append(occurrences[number])
+
+    result = {'groups': [], 'saved_track_ids': [], 'playlist_items': {}}
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        saved = sorted((t for t in group if t['source'] == SAVED), key=lambda t: t.get('added_at') or '')
+        duplicates = [t['id'] for t in saved[1:]]
+        per_playlist = {}
+        for track in group:
+            if track['source'] != SAVED:
+                per_playlist.setdefault(track['source'], []).append(track)
+        for playlist_id, tracks in per_playlist.items():
+            if len(tracks) < 2 or not tracks[0]['editable']:
+                continue
+            tracks.sort(key=lambda t: t['position'])
+            items = result['playlist_items'].setdefault(playlist_id, [])
+            items.extend({'uri': f"spotify:track:{t['id']}", 'position': t['position']} for t in tracks[1:])
+
+        distinct_ids = {track['id'] for track in group}
+        if duplicates or len(distinct_ids) > 1 or any(len(t) > 1 for t in per_playlist.values()):
+            result['saved_track_ids'].extend(duplicates)
+            result['groups'].append({
+                'name': group[0]['name'],
+                'artist': (group[0].get('artists') or [group[0].get('artist')])[0],
+                'keep': saved[0]['id'] if saved else None,
+                'occurrences': [
+                    {
+                        'source': track['source'], 'playlist_name': track.get('playlist_name'),
+                        'id': track['id'], 'name': track['name'], 'album_name': track.get('album_name'),
+                        'position': track.get('position'), 'added_at': track.get('added_at'),
+                    }
+                    for track in group
+                ],
+            })
+    return result
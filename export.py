@@ -0,0 +1,100 @@
+# export.py
+import csv
+import io
+import json
+from itertools import islice
+from config import Config
+from library_store import track_row, artist_row, playlist_row
+
+# Colunas do CSV de cada coleção (listas viram "a; b")
+COLUMNS = {
+    'tracks': ['id', 'added_at', 'name', 'artists', 'album_name', 'duration_ms', 'explicit', 'isrc'],
+    'artists': ['id', 'name', 'genres'],
+    'playlists': ['id', 'name', 'owner', 'tracks_total', 'snapshot_id'],
+    'playlist_items': [
+        'playlist_id', 'playlist_name', 'position', 'id', 'name', 'artists', 'album_name', 'duration_ms', 'isrc'
+    ],
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def iter_records(handler, collection, with_items=False):
+    """Gera, página a página, os registros de uma coleção da biblioteca.
+
+    Cada página é convertida para o formato compacto do snapshot assim que chega;
+    o payload bruto da API é descartado em seguida.
+    """
+    if collection == 'tracks':
+        for items in handler.iter_saved_track_pages():
+            yield [track_row(item) for item in items]
+    elif collection == 'artists':
+        for items in handler.iter_followed_artist_pages():
+            yield [artist_row(artist) for artist in items]
+    elif collection == 'playlists' and with_items:
+        # As faixas das próximas playlists já vão sendo buscadas enquanto esta é escrita
+        for playlist, tracks in handler.iter_playlists_with_tracks():
+            yield [dict(playlist_row(playlist), tracks=tracks)]
+    elif collection == 'playlists':
+        playlists = (playlist_row(playlist) for items in handler.iter_playlist_pages() for playlist in items)
+        yield from _batched(playlists, Config.EXPORT_BATCH_SIZE)
+    else:
+        raise ValueError(f"Coleção desconhecida: {collection}")
+
+
+def _batched(records, size):
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def _csv_value(value):
+    if isinstance(value, (list, tuple)):
+        return '; '.join(str(item) for item in value)
+    return value
+
+
+def ndjson_chunks(pages):
+    """Uma linha JSON por registro; um bloco de texto por página."""
+    for records in pages:
+        if records:
+            # Registros compactos (e as faixas dentro das playlists) viram objetos JSON
+            yield ''.join(json.dumps(record, ensure_ascii=False, default=dict) + '\n' for record in records)
+
+
+def csv_chunks(pages, collection, with_items=False):
+    """CSV com cabeçalho; com `with_items`, playlists viram uma linha por faixa."""
+    if collection == 'playlists' and with_items:
+        columns = COLUMNS['playlist_items']
+        pages = (
+            [
+                dict(track, playlist_id=playlist['id'], playlist_name=playlist['name'])
+                for playlist in records for track in playlist['tracks']
+            ]
+            for records in pages
+        )
+    else:
+        columns = COLUMNS[collection]
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for records in pages:
+        writer.writerows([_csv_value(record.get(column)) for column in columns] for record in records)
+        if records:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(handler, collection, fmt, with_items=False):
+    """Gerador com o conteúdo exportado, para uma resposta em streaming."""
+    pages = iter_records(handler, collection, with_items)
+    if fmt == 'csv':
+        return csv_chunks(pages, collection, with_items)
+    return ndjson_chunks(pages)
@@ -0,0 +1,161 @@
+# http_cache.py
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+import spotipy
+from cache import TTLCache, DiskCache, MISSING
+from config import Config
+from metrics import registry
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# GETs guardados, relativos à base da API: os que se repetem com a mesma resposta. As
+# páginas de me/tracks e dos itens de playlist ficam de fora: já vão para o snapshot
+# local (e a varredura de playlists pula as que não mudaram pelo snapshot_id).
+CACHEABLE = re.compile(r'(me|me/playlists|artists/[^/]+/top-tracks)')
+# Endpoints de catálogo têm a mesma resposta para qualquer usuário; os demais ficam
+# separados pelo ID do usuário, para que uma resposta nunca seja servida a outro.
+CATALOG_PREFIXES = ('artists/',)
+CATALOG = 'catalog'
+# Custo aproximado (bytes) de cada entrada além do corpo: chave, ETag e estrutura
+ENTRY_OVERHEAD = 200
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+cache_lookups = registry.counter(
+    'spoticlean_http_cache_total',
+    'GETs à Web API por resultado no cache de respostas (fresh, revalidated, miss).', ('result',)
+)
+
+
+def freshness(headers):
+    """Segundos em que a resposta pode ser reutilizada sem revalidar (Cache-Control), ou None para no-store."""
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cache_control:
+        return None
+    if 'no-cache' in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    return int(match.group(1)) if match else 0
+
+
+def spotify_error(method, url, params, response):
+    """Converte uma resposta de erro no SpotifyException que o spotipy levantaria."""
+    try:
+        error = response.json().get('error', {})
+        msg, reason = error.get('message'), error.get('reason')
+    except (ValueError, AttributeError):
+        msg, reason = response.text or None, None
+    logger.error(f"Erro HTTP em {method} {url} com {params}: {response.status_code} - {msg}")
+    return spotipy.exceptions.SpotifyException(
+        response.status_code, -1, f"{response.url}:\n {msg}", reason=reason, headers=response.headers
+    )
+
+
+class ResponseCache:
+    """Cache de respostas GET da Web API com revalidação por ETag.
+
+    Guarda o corpo da resposta (texto JSON), o ETag e até quando a cópia está fresca
+    (max-age do Cache-Control). Dentro da validade, a resposta sai do cache sem tocar
+    na rede; depois dela, a requisição vai com If-None-Match e um 304 reaproveita a
+    cópia guardada. Respostas do próprio usuário são sempre revalidadas (as remoções
+    feitas pelo app precisam aparecer na hora); só as de catálogo respeitam o max-age.
+
+    Só os endpoints de CACHEABLE entram. A memória é limitada pelo total de bytes dos
+    corpos (HTTP_CACHE_MAX_BYTES), além do número de entradas, com uma camada em disco
+    opcional (compartilhada entre processos). Cada leitura decodifica o corpo de novo,
+    então quem recebe pode alterá-lo à vontade.
+    """
+
+    def __init__(self, maxsize=None, ttl=None, disk_path=None, maxbytes=None):
+        self.ttl = ttl or Config.HTTP_CACHE_TTL
+        self.memory = TTLCache(
+            maxsize or Config.HTTP_CACHE_SIZE, self.ttl, maxbytes=maxbytes or Config.HTTP_CACHE_MAX_BYTES,
+            sizeof=lambda entry: len(entry['body']) + ENTRY_OVERHEAD
+        )
+        self.disk = DiskCache(disk_path, 'http_responses') if disk_path else None
+
+    @staticmethod
+    def key(user_id, url, params=None):
+        """Chave da resposta: dono (ID do usuário ou catálogo) e URL completa, com parâmetros ordenados.
+
+        Retorna None se o endpoint não é guardado, ou se é do usuário e o ID dele ainda
+        não é conhecido (ex.: a própria chamada a /me que o descobre).
+        """
+        path = urlsplit(url).path
+        api_path = urlsplit(Config.SPOTIFY_API_URL).path
+        if not path.startswith(api_path) or not CACHEABLE.fullmatch(path[len(api_path):]):
+            return None
+        if path[len(api_path):].startswith(CATALOG_PREFIXES):
+            owner = CATALOG
+        elif user_id:
+            owner = f'user:{user_id}'
+        else:
+            return None
+        query = urlencode(sorted((k, v) for k, v in (params or {}).items() if v is not None))
+        return f'{owner} {url}?{query}'
+
+    def lookup(self, key):
+        """Retorna (entrada guardada ou None, corpo se ainda estiver fresco ou MISSING)."""
+        entry = self.memory.get(key)
+        if entry is MISSING and self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not MISSING:
+                self.memory.set(key, entry)
+        if entry is MISSING:
+            return None, MISSING
+        if entry['expires_at'] > time.time():
+            cache_lookups.inc(result='fresh')
+            return entry, json.loads(entry['body'])
+        return entry, MISSING
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Cabeçalho If-None-Match para revalidar uma entrada vencida (se ela tiver ETag)."""
+        return {'If-None-Match': entry['etag']} if entry is not None and entry.get('etag') else {}
+
+    def _set(self, key, etag, headers, body):
+        max_age = freshness(headers) if key.startswith(CATALOG) else 0
+        entry = {'etag': etag, 'expires_at': time.time() + (max_age or 0), 'body': body}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, entry, self.ttl)
+            except sqlite3.Error as e:
+                # A camada em disco é só uma otimização: falhas não interrompem a requisição
+                logger.warning(f"Erro ao gravar resposta no cache em disco: {e}")
+
+    def store(self, key, headers, body):
+        """Guarda o texto de uma resposta 200 reaproveitável (com ETag, ou de catálogo com max-age)."""
+        cache_lookups.inc(result='miss')
+        etag = headers.get('ETag')
+        max_age = freshness(headers)
+        if max_age is None or not (etag or (max_age and key.startswith(CATALOG))):
+            return
+        self._set(key, etag, headers, body)
+
+    def revalidated(self, key, entry, headers):
+        """Registra um 304 e devolve o corpo guardado, que volta a valer pelo novo max-age."""
+        cache_lookups.inc(result='revalidated')
+        self._set(key, headers.get('ETag') or entry['etag'], headers, entry['body'])
+        return json.loads(entry['body'])
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Retorna o cache de respostas do processo, ou None se desativado (HTTP_CACHE_SIZE=0)."""
+    global _cache
+    if _cache is None and Config.HTTP_CACHE_SIZE > 0:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(disk_path=Config.HTTP_CACHE_DB_PATH)
+                registry.register_cache('http_responses', _cache.memory)
+    return _cache
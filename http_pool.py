@@ -0,0 +1,37 @@
+# http_pool.py
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from metrics import record_response
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def build_session():
+    """Cria uma requests.Session com pool de conexões keep-alive e sem retries automáticos.
+
+    Os retries ficam a cargo do ScheduledSpotify, que respeita o Retry-After.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=Config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        max_retries=0
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    # Status e bytes de cada resposta (Web API e OAuth) vão para as métricas do processo
+    session.hooks['response'].append(record_response)
+    return session
+
+
+def get_http_session():
+    """Retorna a Session compartilhada pelo processo (api.spotify.com e accounts.spotify.com)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+    return _session
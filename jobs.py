@@ -0,0 +1,287 @@
+# jobs.py
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import metrics
+from api import SpotifyHandler
+from config import Config
+from ratelimit import BACKGROUND
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    session_id TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at);
+"""
+
+
+def _remove_playlists(handler, params, progress):
+    return handler.remove_playlists(params['playlist_ids'], progress=progress).to_dict()
+
+
+def _remove_tracks(handler, params, progress):
+    return handler.remove_liked_tracks(track_ids=params['track_ids'], progress=progress).to_dict()
+
+
+def _unfollow_artists(handler, params, progress):
+    return handler.unfollow_artists(params['artist_ids'], progress=progress).to_dict()
+
+
+def _create_playlist(handler, params, progress):
+    report = handler.create_playlist(params['playlist_name'], params['artist_names'], progress=progress)
+    return report.to_dict()
+
+
+def _find_duplicates(handler, params, progress):
+    return handler.find_library_duplicates(progress=progress)
+
+
+def _remove_duplicates(handler, params, progress):
+    report = handler.remove_duplicates(params['track_ids'], params['playlist_items'], progress=progress)
+    return report.to_dict()
+
+
+def _scan_playlists(handler, params, progress):
+    return handler.get_playlist_overlap(params['threshold'], params['min_playlists'], progress=progress)
+
+
+def _warm_up(handler, params, progress):
+    return handler.warm_up(progress=progress).to_dict()
+
+
+# Tipos de job aceitos: função(handler, params, progress) -> resultado serializável em JSON
+JOB_TYPES = {
+    'remove_playlists': _remove_playlists,
+    'remove_tracks': _remove_tracks,
+    'unfollow_artists': _unfollow_artists,
+    'create_playlist': _create_playlist,
+    'find_duplicates': _find_duplicates,
+    'remove_duplicates': _remove_duplicates,
+    'scan_playlists': _scan_playlists,
+    'warm_up': _warm_up,
+}
+
+
+class JobQueue:
+    """Fila de jobs em SQLite, consumida por um pool de threads em cada processo.
+
+    Como a fila fica em disco, qualquer worker do gunicorn pode executar um job
+    enfileirado por outro; o progresso fica visível para todos.
+    """
+
+    def __init__(self, path=None, workers=None):
+        self.path = path or Config.JOBS_DB_PATH
+        self.workers = workers or Config.JOB_WORKERS
+        self.worker_id = f'{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        # Bancos criados quando os jobs guardavam o token (com o refresh token) em texto puro
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'session_id' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN session_id TEXT')
+        if 'heartbeat_at' not in columns:
+            conn.execute('ALTER TABLE jobs ADD COLUMN heartbeat_at REAL')
+            conn.execute('UPDATE jobs SET heartbeat_at = updated_at WHERE status = ?', (RUNNING,))
+        if 'token_info' in columns:
+            conn.execute('UPDATE jobs SET token_info = NULL WHERE token_info IS NOT NULL')
+            conn.execute('UPDATE jobs SET status = ?, error = ? WHERE status = ? AND session_id IS NULL', (
+                FAILED, 'Job criado antes das sessões no servidor; enfileire de novo.', QUEUED
+            ))
+
+    def start(self):
+        """Inicia as threads de worker deste processo (uma única vez)."""
+        with self._start_lock:
+            if self._started:
+                return
+            for number in range(self.workers):
+                threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True).start()
+            threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True).start()
+            self._started = True
+
+    def enqueue(self, kind, user_id, session_id, params, unique=False):
+        """Enfileira um job e retorna seu ID imediatamente.
+
+        O job guarda só o ID da sessão no servidor: o token é lido (e renovado) por ela
+        quando o job roda. Com `unique=True`, se o usuário já tiver um job desse tipo na
+        fila ou em execução (ex.: aquecimento disparado por duas abas), retorna o ID dele
+        em vez de criar outro. A verificação e a inserção ficam na mesma transação,
+        valendo entre processos.
+        """
+        if kind not in JOB_TYPES:
+            raise ValueError(f"Tipo de job desconhecido: {kind}")
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            existing = conn.execute(
+                'SELECT id FROM jobs WHERE user_id = ? AND kind = ? AND status IN (?, ?) LIMIT 1',
+                (user_id, kind, QUEUED, RUNNING)
+            ).fetchone() if unique else None
+            if existing is None:
+                conn.execute(
+                    'INSERT INTO jobs (id, user_id, kind, status, params, session_id, created_at, updated_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, user_id, kind, QUEUED, json.dumps(params), session_id, now, now)
+                )
+        finally:
+            conn.execute('COMMIT')
+        if existing is not None:
+            logger.info(f"Job {kind} de {user_id} já em andamento: {existing['id']}.")
+            return existing['id']
+        self.start()
+        self._wakeup.set()
+        logger.info(f"Job {kind} {job_id} enfileirado para {user_id}.")
+        return job_id
+
+    def get(self, job_id, user_id):
+        """Retorna o estado público do job (ou None se não existir / for de outro usuário)."""
+        row = self._connect().execute(
+            'SELECT id, kind, status, done, total, result, error, created_at, updated_at '
+            'FROM jobs WHERE id = ? AND user_id = ?', (job_id, user_id)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row['id'], 'kind': row['kind'], 'status': row['status'],
+            'progress': {'done': row['done'], 'total': row['total']},
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'], 'updated_at': row['updated_at'],
+        }
+
+    def _claim(self):
+        """Marca o job mais antigo da fila como em execução por este worker."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Só voltam para a fila os jobs cujo worker parou de dar sinal de vida (processo
+            # morto). Um job longo sem progresso continua com o dono enquanto ele bater o
+            # heartbeat, para que uma remoção não rode duas vezes ao mesmo tempo.
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?',
+                (QUEUED, RUNNING, time.time() - Config.JOB_STALE_SECONDS)
+            )
+            row = conn.execute(
+                'SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1', (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    'UPDATE jobs SET status = ?, worker = ?, heartbeat_at = ?, updated_at = ? WHERE id = ?',
+                    (RUNNING, self.worker_id, now, now, row['id'])
+                )
+            return row
+        finally:
+            conn.execute('COMMIT')
+
+    def _update(self, job_id, **fields):
+        # Só o worker dono grava: um job devolvido à fila não é sobrescrito pelo dono antigo
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f'{name} = ?' for name in fields)
+        self._connect().execute(
+            f'UPDATE jobs SET {columns} WHERE id = ? AND worker = ?', (*fields.values(), job_id, self.worker_id)
+        )
+
+    def _heartbeat(self):
+        """Marca periodicamente como vivos os jobs em execução neste processo."""
+        while True:
+            time.sleep(Config.JOB_STALE_SECONDS / 3)
+            try:
+                self._connect().execute(
+                    'UPDATE jobs SET heartbeat_at = ? WHERE status = ? AND worker = ?',
+                    (time.time(), RUNNING, self.worker_id)
+                )
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao registrar o heartbeat dos jobs: {e}")
+
+    def _work(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                logger.error(f"Erro ao ler a fila de jobs: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(Config.JOB_POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        job_id = job['id']
+
+        def progress(report, total):
+            # Resultados parciais: quem já foi processado e quem falhou até agora
+            self._update(job_id, done=len(report.results), total=total, result=json.dumps(report.to_dict()))
+
+        # As chamadas do job ficam num trace próprio, com a rota "job:<tipo>"
+        trace = metrics.start_trace(f"job:{job['kind']}")
+        status = FAILED
+        try:
+            handler = SpotifyHandler.from_session(job['session_id'], job['user_id'], priority=BACKGROUND)
+            result = JOB_TYPES[job['kind']](handler, json.loads(job['params']), progress)
+            self._update(job_id, status=DONE, result=json.dumps(result))
+            status = DONE
+            logger.info(f"Job {job['kind']} {job_id} concluído: {trace.summary()}")
+        except Exception as e:
+            logger.error(f"Erro no job {job['kind']} {job_id}: {e}")
+            self._update(job_id, status=FAILED, error=str(e))
+        finally:
+            metrics.job_duration.observe(time.perf_counter() - trace.started, kind=job['kind'], status=status)
+            metrics.finish_trace(trace)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Retorna a fila de jobs do processo."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
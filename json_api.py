@@ -0,0 +1,143 @@
+# json_api.py
+import base64
+import binascii
+import gzip
+import hashlib
+import json
+from flask import Response, request
+from config import Config
+from records import Track, Artist, Playlist
+
+try:
+    import brotli  # Opcional: sem ele, só gzip
+except ImportError:
+    brotli = None
+
+# Campos aceitos em `fields=` e os devolvidos quando o parâmetro é omitido, por coleção
+FIELDS = {
+    'tracks': (Track.__slots__ + ('artist',), ('id', 'name', 'artist', 'album_name', 'image', 'added_at')),
+    'artists': (Artist.__slots__, ('id', 'name', 'image')),
+    'playlists': (Playlist.__slots__, ('id', 'name', 'owner', 'image', 'tracks_total')),
+}
+
+# Respostas menores que isso vão sem compressão (o ganho não paga o custo)
+COMPRESS_MIN_SIZE = 1024
+
+
+class ApiError(ValueError):
+    """Parâmetro inválido na API JSON (vira 400)."""
+
+
+def encode_cursor(version, offset, last_id):
+    """Cursor opaco da próxima página: versão da biblioteca, posição e último item entregue."""
+    raw = json.dumps([version, offset, last_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        version, offset, last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return int(version), int(offset), last_id
+    except (binascii.Error, ValueError, TypeError):
+        raise ApiError('Cursor inválido.')
+
+
+def cursor_offset(items, cursor, version):
+    """Posição em `items` onde a próxima página começa.
+
+    Na mesma versão o deslocamento do cursor vale direto. Se a biblioteca mudou entre
+    as páginas (remoções, novas curtidas), a página continua logo depois do último item
+    entregue, para não pular nem repetir itens; sem ele, volta ao deslocamento.
+    """
+    if not cursor:
+        return 0
+    cursor_version, offset, last_id = decode_cursor(cursor)
+    if cursor_version != version and last_id is not None:
+        for position, item in enumerate(items):
+            if item['id'] == last_id:
+                return position + 1
+    return min(offset, len(items))
+
+
+def parse_fields(collection, value):
+    """Campos pedidos em `fields=` (separados por vírgula), validados contra a coleção."""
+    allowed, default = FIELDS[collection]
+    if not value:
+        return default
+    fields = tuple(field.strip() for field in value.split(',') if field.strip())
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ApiError(f"Campos inválidos para {collection}: {', '.join(unknown) or value}.")
+    return fields
+
+
+def page(items, cursor, limit, fields, version):
+    """Uma página de itens projetados nos campos pedidos, com o cursor da próxima."""
+    start = cursor_offset(items, cursor, version)
+    chunk = items[start:start + limit]
+    end = start + len(chunk)
+    return {
+        'items': [{field: getattr(item, field) for field in fields} for item in chunk],
+        'next_cursor': encode_cursor(version, end, chunk[-1]['id']) if chunk and end < len(items) else None,
+        'total': len(items),
+        'version': version,
+    }
+
+
+def page_limit(value):
+    try:
+        limit = int(value) if value else Config.API_PAGE_SIZE
+    except ValueError:
+        raise ApiError(f"Limite inválido: {value!r}.")
+    return min(max(limit, 1), Config.API_MAX_PAGE_SIZE)
+
+
+def library_etag(user_id, collection, version):
+    """ETag de uma resposta da API: usuário, coleção, versão do snapshot e a query inteira.
+
+    A versão muda a cada sincronização ou remoção, então a mesma URL só volta 304
+    enquanto a biblioteca não tiver mudado.
+    """
+    query = sorted(request.args.items(multi=True))
+    return hashlib.sha1(json.dumps([user_id, collection, version, query]).encode()).hexdigest()[:20]
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _headers(etag):
+    headers = {'Vary': 'Accept-Encoding', 'Cache-Control': 'private, no-cache'}
+    if etag:
+        # Fraco: o mesmo conteúdo pode sair com codificações diferentes
+        headers['ETag'] = f'W/"{etag}"'
+    return headers
+
+
+def not_modified(etag):
+    """Resposta 304 se o If-None-Match da requisição casar com o ETag; senão None.
+
+    Chamado antes de montar a página, para que a revalidação não custe a serialização.
+    """
+    if request.if_none_match.contains_weak(etag):
+        return Response(status=304, headers=_headers(etag))
+    return None
+
+
+def json_response(payload, etag=None, status=200):
+    """Resposta JSON compacta, comprimida (br/gzip) conforme o Accept-Encoding, com ETag."""
+    headers = _headers(etag)
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode()
+    encoding = _negotiate_encoding() if len(body) >= COMPRESS_MIN_SIZE else None
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=6)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, status=status, mimetype='application/json', headers=headers)
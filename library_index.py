@@ -0,0 +1,189 @@
+# library_index.py
+import threading
+from cache import TTLCache, KeyedLocks
+from cleanup import TrackColumns
+from config import Config
+from metrics import registry
+from search import SearchIndex
+from stats import LibraryStats
+
+# Ordenações globais disponíveis: chave de ordenação e se é decrescente
+PLAYLIST_SORTS = {
+    'name_asc': (lambda p: p['name'].casefold(), False),
+    'name_desc': (lambda p: p['name'].casefold(), True),
+    'tracks_desc': (lambda p: p['tracks_total'] or 0, True),
+    'tracks_asc': (lambda p: p['tracks_total'] or 0, False),
+    'owner_asc': (lambda p: ((p['owner'] or '').casefold(), p['name'].casefold()), False),
+}
+ARTIST_SORTS = {
+    'name_asc': (lambda a: a['name'].casefold(), False),
+    'name_desc': (lambda a: a['name'].casefold(), True),
+}
+TRACK_SORTS = {
+    'added_desc': (lambda t: t['added_at'] or '', True),
+    'name_asc': (lambda t: t['name'].casefold(), False),
+    'name_desc': (lambda t: t['name'].casefold(), True),
+}
+DEFAULT_SORT = 'name_asc'
+
+
+class SortedIndex:
+    """Itens de uma coleção do usuário em memória, com ordenações calculadas uma vez.
+
+    `version` é a versão do snapshot (library_store) usada para montar o índice.
+    Subclasses definem `sorts`, o dicionário de ordenações aceitas, e `search_fields`,
+    os campos indexados para busca (índice criado na primeira busca).
+    """
+
+    sorts = {}
+    default_sort = DEFAULT_SORT
+    search_fields = {'name': lambda item: item['name']}
+
+    def __init__(self, items, version):
+        self.items = items
+        self.version = version
+        self._sorted = {}
+        self._search = None
+        self._lock = threading.Lock()
+
+    @property
+    def search_index(self):
+        if self._search is None:
+            with self._lock:
+                if self._search is None:
+                    self._search = SearchIndex(self.search_fields, self.items)
+        return self._search
+
+    def update(self, added, removed_ids, version):
+        """Aplica ao índice as mudanças do snapshot, sem reconstruir a busca."""
+        removed_ids = set(removed_ids)
+        with self._lock:
+            self.items = [item for item in self.items if item['id'] not in removed_ids] + list(added)
+            self._sorted = {}
+            self.version = version
+            if self._search is not None:
+                for item_id in removed_ids:
+                    self._search.remove(item_id)
+                for item in added:
+                    self._search.add(item)
+
+    def sorted(self, sort):
+        sort = sort if sort in self.sorts else self.default_sort
+        ordered = self._sorted.get(sort)
+        if ordered is None:
+            items = self.items
+            key, reverse = self.sorts[sort]
+            ordered = sorted(items, key=key, reverse=reverse)
+            with self._lock:
+                # Não guarda uma ordenação feita sobre itens que mudaram no meio do caminho
+                if self.items is items:
+                    self._sorted[sort] = ordered
+        return ordered
+
+    def filter(self, sort, query=None, **field_queries):
+        """Itens na ordenação pedida, filtrados pela busca (sem acentos, por substring)."""
+        items = self.sorted(sort)
+        hits = self.search_index.search(query, **field_queries)
+        if hits is None:
+            return items
+        return [item for item in items if item['id'] in hits]
+
+    def ranked(self, query, limit=None, **field_queries):
+        """Retorna (itens mais relevantes para a busca, total de resultados)."""
+        hits = self.search_index.search(query, **field_queries)
+        if hits is None:
+            items = self.sorted(self.default_sort)
+        else:
+            items = [item for item in self.sorted(self.default_sort) if item['id'] in hits]
+            items.sort(key=lambda item: hits[item['id']], reverse=True)
+        return items[:limit], len(items)
+
+    def page(self, sort, page, per_page, query=None, **field_queries):
+        """Retorna (itens da página, total de páginas) após filtrar e ordenar globalmente."""
+        items = self.filter(sort, query, **field_queries)
+        total_pages = (len(items) // per_page) + (len(items) % per_page > 0)
+        offset = (page - 1) * per_page
+        return items[offset:offset + per_page], total_pages
+
+
+class PlaylistIndex(SortedIndex):
+    """Todas as playlists de um usuário."""
+
+    sorts = PLAYLIST_SORTS
+
+    @property
+    def playlists(self):
+        return self.items
+
+
+class ArtistIndex(SortedIndex):
+    """Todos os artistas seguidos por um usuário."""
+
+    sorts = ARTIST_SORTS
+
+    @property
+    def artists(self):
+        return self.items
+
+
+class TrackIndex(SortedIndex):
+    """Todas as músicas curtidas de um usuário, buscáveis por título, artista e álbum."""
+
+    sorts = TRACK_SORTS
+    default_sort = 'added_desc'
+    search_fields = {
+        'name': lambda track: track['name'],
+        'artist': lambda track: track['artists'],
+        'album': lambda track: track['album_name'],
+    }
+    _columns = None
+    _stats = None
+
+    @property
+    def tracks(self):
+        return self.items
+
+    @property
+    def ids(self):
+        return {track['id'] for track in self.items}
+
+    @property
+    def columns(self):
+        """Colunas NumPy das músicas (regras de limpeza), recriadas quando os itens mudam."""
+        items = self.items
+        columns = self._columns
+        if columns is None or columns.tracks is not items:
+            columns = TrackColumns(items)
+            with self._lock:
+                if self.items is items:
+                    self._columns = columns
+        return columns
+
+    @property
+    def stats(self):
+        """Estatísticas (stats.LibraryStats) das músicas, criadas no primeiro uso."""
+        if self._stats is None:
+            with self._lock:
+                if self._stats is None:
+                    self._stats = LibraryStats(self.items)
+        return self._stats
+
+    def update(self, added, removed_ids, version):
+        super().update(added, removed_ids, version)
+        # As estatísticas recebem só a diferença, como a busca
+        if self._stats is not None:
+            self._stats.update(added, removed_ids)
+
+
+# Índices por usuário, compartilhados entre as requisições do processo
+playlist_indexes = TTLCache(Config.PLAYLIST_INDEX_CACHE_SIZE, Config.LIBRARY_SNAPSHOT_TTL)
+artist_indexes = TTLCache(Config.PLAYLIST_INDEX_CACHE_SIZE, Config.LIBRARY_SNAPSHOT_TTL)
+track_indexes = TTLCache(Config.PLAYLIST_INDEX_CACHE_SIZE, Config.LIBRARY_SNAPSHOT_TTL)
+# Última varredura do conteúdo das playlists de cada usuário (playlist_scan.PlaylistOverlapIndex)
+playlist_scans = TTLCache(Config.PLAYLIST_INDEX_CACHE_SIZE, Config.LIBRARY_SNAPSHOT_TTL)
+# Carga de cada coleção de um usuário, uma por vez: quem chega durante a carga espera por ela
+library_locks = KeyedLocks()
+registry.register_cache('playlist_indexes', playlist_indexes)
+registry.register_cache('artist_indexes', artist_indexes)
+registry.register_cache('track_indexes', track_indexes)
+registry.register_cache('playlist_scans', playlist_scans)
@@ -0,0 +1,605 @@
+# library_store.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from config import Config
+from cache import normalize_artist_name, ARTIST_KEY_VERSION
+from records import Track, PlaylistTrack, Artist, Playlist, shared, shared_tuple
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACK_IMAGE = 'https://via.placeholder.com/50?text=Sem+Capa'
+DEFAULT_ARTIST_IMAGE = 'https://via.placeholder.com/50?text=Sem+Foto'
+
+# Coleções sincronizadas por usuário (chave da tabela sync_state)
+SAVED_TRACKS = 'saved_tracks'
+FOLLOWED_ARTISTS = 'followed_artists'
+PLAYLISTS = 'playlists'
+# Conteúdo das playlists (tabela playlist_items), validado pelo snapshot_id de cada uma
+PLAYLIST_ITEMS = 'playlist_items'
+
+# Máximo de parâmetros por consulta com IN (...)
+SQL_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saved_tracks (
+    user_id TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    added_at TEXT NOT NULL,
+    name TEXT NOT NULL,
+    artist_ids TEXT NOT NULL,
+    artist_names TEXT NOT NULL,
+    album_id TEXT,
+    album_name TEXT,
+    image TEXT,
+    duration_ms INTEGER,
+    explicit INTEGER,
+    isrc TEXT,
+    PRIMARY KEY (user_id, track_id)
+);
+CREATE INDEX IF NOT EXISTS idx_saved_tracks_added_at ON saved_tracks (user_id, added_at);
+
+-- Índice artista → músicas curtidas, mantido junto com saved_tracks
+CREATE TABLE IF NOT EXISTS saved_track_artists (
+    user_id TEXT NOT NULL,
+    track_id TEXT NOT NULL,
+    artist_id TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    PRIMARY KEY (user_id, track_id, artist_id)
+);
+CREATE INDEX IF NOT EXISTS idx_saved_track_artists_id ON saved_track_artists (user_id, artist_id);
+CREATE INDEX IF NOT EXISTS idx_saved_track_artists_name ON saved_track_artists (user_id, name_key);
+
+CREATE TABLE IF NOT EXISTS followed_artists (
+    user_id TEXT NOT NULL,
+    artist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    image TEXT,
+    genres TEXT,
+    PRIMARY KEY (user_id, artist_id)
+);
+
+-- Carga em andamento dos artistas seguidos: páginas já lidas e o cursor para continuar
+CREATE TABLE IF NOT EXISTS followed_artists_staging (
+    user_id TEXT NOT NULL,
+    artist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    image TEXT,
+    genres TEXT,
+    PRIMARY KEY (user_id, artist_id)
+);
+CREATE TABLE IF NOT EXISTS artist_cursor_checkpoints (
+    user_id TEXT PRIMARY KEY,
+    after TEXT,
+    position INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS playlists (
+    user_id TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    owner TEXT,
+    owner_id TEXT,
+    image TEXT,
+    tracks_total INTEGER,
+    snapshot_id TEXT,
+    PRIMARY KEY (user_id, playlist_id)
+);
+
+-- Conteúdo lido de cada playlist, válido enquanto o snapshot_id não mudar
+CREATE TABLE IF NOT EXISTS playlist_items (
+    user_id TEXT NOT NULL,
+    playlist_id TEXT NOT NULL,
+    snapshot_id TEXT,
+    tracks TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (user_id, playlist_id)
+);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    user_id TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    total INTEGER,
+    version INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, collection)
+);
+"""
+
+
+def _first_image(images, default):
+    return shared(images[0]['url']) if images else default
+
+
+def track_row(item):
+    """Converte um item de /me/tracks no registro compacto armazenado no snapshot."""
+    track = item['track']
+    album = track.get('album') or {}
+    artists = track.get('artists', [])
+    return Track(
+        id=track['id'],
+        added_at=item['added_at'],
+        name=track['name'],
+        artist_ids=shared_tuple(artist['id'] for artist in artists),
+        artists=shared_tuple(artist['name'] for artist in artists),
+        album_id=shared(album.get('id')),
+        album_name=shared(album.get('name')),
+        image=_first_image(album.get('images'), DEFAULT_TRACK_IMAGE),
+        duration_ms=track.get('duration_ms'),
+        explicit=bool(track.get('explicit')),
+        isrc=(track.get('external_ids') or {}).get('isrc'),
+    )
+
+
+def artist_row(artist):
+    """Converte um artista seguido no registro compacto armazenado no snapshot."""
+    return Artist(
+        id=artist['id'],
+        name=shared(artist['name']),
+        image=_first_image(artist.get('images'), DEFAULT_ARTIST_IMAGE),
+        genres=shared_tuple(artist.get('genres')),
+    )
+
+
+def playlist_track_row(item, position):
+    """Converte um item de /playlists/{id}/tracks (com a posição na playlist); None para episódios e faixas locais."""
+    track = item.get('track')
+    if not track or track.get('type', 'track') != 'track' or not track.get('id'):
+        return None
+    return PlaylistTrack(
+        id=shared(track['id']),
+        position=position,
+        name=shared(track['name']),
+        artists=shared_tuple(artist['name'] for artist in track.get('artists', [])),
+        album_name=shared((track.get('album') or {}).get('name')),
+        duration_ms=track.get('duration_ms'),
+        isrc=shared((track.get('external_ids') or {}).get('isrc')),
+    )
+
+
+def playlist_row(playlist):
+    """Converte uma playlist no registro compacto armazenado no snapshot."""
+    owner = playlist.get('owner') or {}
+    return Playlist(
+        id=playlist['id'],
+        name=playlist['name'],
+        owner=shared(owner.get('display_name')),
+        owner_id=shared(owner.get('id')),
+        image=_first_image(playlist.get('images'), DEFAULT_TRACK_IMAGE),
+        tracks_total=(playlist.get('tracks') or {}).get('total', 0),
+        snapshot_id=playlist.get('snapshot_id'),
+    )
+
+
+class LibraryStore:
+    """Snapshot local (SQLite) da biblioteca de cada usuário, indexado pelo ID do Spotify."""
+
+    def __init__(self, path=None):
+        self.path = path or Config.LIBRARY_DB_PATH
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self):
+        # sqlite3 não compartilha conexões entre threads: uma conexão por thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._migrate(conn)
+                    self._backfill_artist_index(conn)
+                    self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def _migrate(conn):
+        # Bancos criados antes do contador de versão por coleção
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(sync_state)')}
+        if 'version' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE sync_state ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+        # Bancos criados antes do dono (ID) das playlists: força a recarga do snapshot
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(playlists)')}
+        if 'owner_id' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE playlists ADD COLUMN owner_id TEXT')
+                conn.execute('DELETE FROM sync_state WHERE collection = ?', (PLAYLISTS,))
+        # Chaves de nome gravadas por uma versão anterior do normalize_artist_name (PRAGMA
+        # user_version): o índice é apagado aqui e reconstruído pelo _backfill_artist_index
+        if conn.execute('PRAGMA user_version').fetchone()[0] < ARTIST_KEY_VERSION:
+            with conn:
+                conn.execute('DELETE FROM saved_track_artists')
+                conn.execute(f'PRAGMA user_version = {ARTIST_KEY_VERSION}')
+
+    @classmethod
+    def _backfill_artist_index(cls, conn):
+        # Snapshots criados antes do índice de artistas: reconstrói a partir de saved_tracks
+        if conn.execute('SELECT 1 FROM saved_track_artists LIMIT 1').fetchone():
+            return
+        rows = conn.execute('SELECT user_id, track_id, artist_ids, artist_names FROM saved_tracks').fetchall()
+        if rows:
+            with conn:
+                for row in rows:
+                    cls._index_track_artists(
+                        conn, row['user_id'], row['track_id'],
+                        json.loads(row['artist_ids']), json.loads(row['artist_names'])
+                    )
+            logger.info(f"Índice de artistas reconstruído para {len(rows)} músicas curtidas.")
+
+    # --- Estado de sincronização -------------------------------------------------
+
+    def get_sync_state(self, user_id, collection):
+        """Retorna (synced_at, total, version) da coleção, ou None se nunca foi sincronizada.
+
+        `version` aumenta a cada mudança no snapshot (sincronização, remoção ou
+        invalidação), permitindo que caches em memória de outros processos detectem
+        que estão desatualizados.
+        """
+        row = self._connect().execute(
+            'SELECT synced_at, total, version FROM sync_state WHERE user_id = ? AND collection = ?',
+            (user_id, collection)
+        ).fetchone()
+        return (row['synced_at'], row['total'], row['version']) if row else None
+
+    def is_fresh(self, user_id, collection, ttl):
+        """Indica se a coleção foi sincronizada há menos de `ttl` segundos."""
+        state = self.get_sync_state(user_id, collection)
+        return state is not None and time.time() - state[0] < ttl
+
+    def invalidate(self, user_id, collection):
+        """Força a próxima leitura da coleção a buscar novamente na API."""
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE sync_state SET synced_at = 0, version = version + 1 WHERE user_id = ? AND collection = ?',
+                (user_id, collection)
+            )
+
+    @staticmethod
+    def _mark_synced(conn, user_id, collection, total):
+        conn.execute(
+            'INSERT INTO sync_state (user_id, collection, synced_at, total) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (user_id, collection) DO UPDATE SET '
+            'synced_at = excluded.synced_at, total = excluded.total, version = version + 1',
+            (user_id, collection, time.time(), total)
+        )
+
+    @staticmethod
+    def _adjust_total(conn, user_id, collection, removed):
+        if removed:
+            conn.execute(
+                'UPDATE sync_state SET total = MAX(total - ?, 0), version = version + 1 '
+                'WHERE user_id = ? AND collection = ?',
+                (removed, user_id, collection)
+            )
+
+    # --- Músicas curtidas ----------------------------------------------------------
+
+    @staticmethod
+    def _index_track_artists(conn, user_id, track_id, artist_ids, artist_names):
+        conn.executemany(
+            'INSERT OR REPLACE INTO saved_track_artists (user_id, track_id, artist_id, name_key) VALUES (?, ?, ?, ?)',
+            [
+                (user_id, track_id, artist_id, normalize_artist_name(name))
+                for artist_id, name in zip(artist_ids, artist_names) if artist_id
+            ]
+        )
+
+    @classmethod
+    def _insert_tracks(cls, conn, user_id, rows):
+        for row in rows:
+            cls._index_track_artists(conn, user_id, row['id'], row['artist_ids'], row['artists'])
+        conn.executemany(
+            'INSERT OR REPLACE INTO saved_tracks (user_id, track_id, added_at, name, artist_ids, artist_names, '
+            'album_id, album_name, image, duration_ms, explicit, isrc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [
+                (user_id, row['id'], row['added_at'], row['name'], json.dumps(row['artist_ids']),
+                 json.dumps(row['artists']), row['album_id'], row['album_name'], row['image'],
+                 row['duration_ms'], int(row['explicit']), row['isrc'])
+                for row in rows
+            ]
+        )
+
+    def replace_saved_tracks(self, user_id, rows, total):
+        """Substitui todo o snapshot de músicas curtidas (carga completa)."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM saved_tracks WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM saved_track_artists WHERE user_id = ?', (user_id,))
+            self._insert_tracks(conn, user_id, rows)
+            self._mark_synced(conn, user_id, SAVED_TRACKS, total)
+
+    def add_saved_tracks(self, user_id, rows, total):
+        """Acrescenta as músicas curtidas desde a última sincronização."""
+        with self._connect() as conn:
+            self._insert_tracks(conn, user_id, rows)
+            self._mark_synced(conn, user_id, SAVED_TRACKS, total)
+
+    def delete_saved_tracks(self, user_id, track_ids):
+        """Aplica ao snapshot as remoções feitas pelo próprio app."""
+        params = [(user_id, track_id) for track_id in track_ids]
+        with self._connect() as conn:
+            removed = conn.executemany(
+                'DELETE FROM saved_tracks WHERE user_id = ? AND track_id = ?', params
+            ).rowcount
+            conn.executemany('DELETE FROM saved_track_artists WHERE user_id = ? AND track_id = ?', params)
+            self._adjust_total(conn, user_id, SAVED_TRACKS, removed)
+
+    def latest_saved_tracks(self, user_id):
+        """Retorna (added_at, IDs) das músicas curtidas mais recentes do snapshot.
+
+        Várias músicas podem ter o mesmo added_at (ex.: um álbum salvo de uma vez), por
+        isso vêm todos os IDs desse instante.
+        """
+        rows = self._connect().execute(
+            'SELECT added_at, track_id FROM saved_tracks WHERE user_id = ? AND added_at = '
+            '(SELECT MAX(added_at) FROM saved_tracks WHERE user_id = ?)',
+            (user_id, user_id)
+        ).fetchall()
+        return (rows[0]['added_at'], {row['track_id'] for row in rows}) if rows else None
+
+    def saved_track_ids_by_artist(self, user_id, artist_id):
+        """IDs das músicas curtidas em que o artista (por ID) aparece."""
+        rows = self._connect().execute(
+            'SELECT track_id FROM saved_track_artists WHERE user_id = ? AND artist_id = ?', (user_id, artist_id)
+        )
+        return [row['track_id'] for row in rows]
+
+    def saved_artists_by_name(self, user_id, artist_name):
+        """Artistas da biblioteca cujo nome normalizado é igual ao informado.
+
+        Retorna um dict por ID de artista (`id`, `name` e `track_count`), do que tem mais
+        músicas curtidas para o que tem menos. Nomes diferentes podem cair na mesma chave
+        ("AC/DC" e "AC DC") e bandas homônimas têm o mesmo nome: cabe a quem chama decidir
+        o que fazer quando houver mais de um.
+        """
+        rows = self._connect().execute(
+            'SELECT a.artist_id, t.artist_ids, t.artist_names FROM saved_track_artists a '
+            'JOIN saved_tracks t ON t.user_id = a.user_id AND t.track_id = a.track_id '
+            'WHERE a.user_id = ? AND a.name_key = ?',
+            (user_id, normalize_artist_name(artist_name))
+        )
+        artists = {}
+        for row in rows:
+            artist = artists.get(row['artist_id'])
+            if artist is None:
+                artist_ids = json.loads(row['artist_ids'])
+                name = json.loads(row['artist_names'])[artist_ids.index(row['artist_id'])]
+                artist = artists[row['artist_id']] = {'id': row['artist_id'], 'name': name, 'track_count': 0}
+            artist['track_count'] += 1
+        return sorted(artists.values(), key=lambda artist: (-artist['track_count'], artist['name'], artist['id']))
+
+    def saved_track_ids(self, user_id):
+        """Conjunto dos IDs das músicas curtidas do snapshot."""
+        rows = self._connect().execute('SELECT track_id FROM saved_tracks WHERE user_id = ?', (user_id,))
+        return {row['track_id'] for row in rows}
+
+    def saved_tracks(self, user_id, track_ids=None):
+        """Lista as músicas curtidas do snapshot, da mais recente para a mais antiga.
+
+        Com `track_ids`, retorna apenas essas músicas (usado para atualizar índices em memória).
+        """
+        conn = self._connect()
+        artists = {}  # Tuplas de artistas compartilhadas entre as faixas desta leitura
+        if track_ids is None:
+            rows = conn.execute('SELECT * FROM saved_tracks WHERE user_id = ? ORDER BY added_at DESC', (user_id,))
+            return [self._track_from_row(row, artists) for row in rows]
+
+        track_ids = list(track_ids)
+        tracks = []
+        for start in range(0, len(track_ids), SQL_CHUNK_SIZE):
+            chunk = track_ids[start:start + SQL_CHUNK_SIZE]
+            rows = conn.execute(
+                f'SELECT * FROM saved_tracks WHERE user_id = ? AND track_id IN ({", ".join("?" * len(chunk))})',
+                (user_id, *chunk)
+            )
+            tracks.extend(self._track_from_row(row, artists) for row in rows)
+        tracks.sort(key=lambda track: track['added_at'] or '', reverse=True)
+        return tracks
+
+    @staticmethod
+    def _track_from_row(row, artists):
+        # O SQLite devolve strings novas a cada linha: artistas, álbuns e capas são internados,
+        # e as faixas do mesmo(s) artista(s) dividem as tuplas guardadas em `artists`
+        key = (row['artist_names'], row['artist_ids'])
+        if key not in artists:
+            artists[key] = (shared_tuple(json.loads(key[0])), shared_tuple(json.loads(key[1])))
+        names, ids = artists[key]
+        return Track(
+            id=row['track_id'],
+            added_at=row['added_at'],
+            name=row['name'],
+            artists=names,
+            artist_ids=ids,
+            album_id=shared(row['album_id']),
+            album_name=shared(row['album_name']),
+            image=shared(row['image']),
+            duration_ms=row['duration_ms'],
+            explicit=bool(row['explicit']),
+            isrc=row['isrc'],
+        )
+
+    # --- Artistas seguidos ---------------------------------------------------------
+
+    def artist_checkpoint(self, user_id, max_age):
+        """Retorna (after, position) de uma carga de artistas interrompida há menos de `max_age` s."""
+        row = self._connect().execute(
+            'SELECT after, position, updated_at FROM artist_cursor_checkpoints WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if row is None or time.time() - row['updated_at'] > max_age:
+            return None
+        return row['after'], row['position']
+
+    def start_artist_refresh(self, user_id):
+        """Começa uma carga nova dos artistas seguidos, descartando páginas antigas."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM followed_artists_staging WHERE user_id = ?', (user_id,))
+            conn.execute(
+                'INSERT OR REPLACE INTO artist_cursor_checkpoints (user_id, after, position, updated_at) '
+                'VALUES (?, NULL, 0, ?)', (user_id, time.time())
+            )
+
+    def append_artist_page(self, user_id, rows, after):
+        """Grava uma página de artistas e o cursor da próxima, na mesma transação.
+
+        Quando `after` é None a cadeia terminou: as páginas acumuladas substituem o
+        snapshot de artistas seguidos e o checkpoint é apagado.
+        """
+        with self._connect() as conn:
+            position = conn.execute(
+                'SELECT position FROM artist_cursor_checkpoints WHERE user_id = ?', (user_id,)
+            ).fetchone()['position']
+            conn.executemany(
+                'INSERT OR REPLACE INTO followed_artists_staging (user_id, artist_id, position, name, image, genres) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (user_id, row['id'], position + offset, row['name'], row['image'], json.dumps(row['genres']))
+                    for offset, row in enumerate(rows)
+                ]
+            )
+            position += len(rows)
+            if after:
+                conn.execute(
+                    'UPDATE artist_cursor_checkpoints SET after = ?, position = ?, updated_at = ? WHERE user_id = ?',
+                    (after, position, time.time(), user_id)
+                )
+                return
+
+            conn.execute('DELETE FROM followed_artists WHERE user_id = ?', (user_id,))
+            conn.execute(
+                'INSERT INTO followed_artists (user_id, artist_id, position, name, image, genres) '
+                'SELECT user_id, artist_id, position, name, image, genres FROM followed_artists_staging '
+                'WHERE user_id = ?', (user_id,)
+            )
+            conn.execute('DELETE FROM followed_artists_staging WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM artist_cursor_checkpoints WHERE user_id = ?', (user_id,))
+            self._mark_synced(conn, user_id, FOLLOWED_ARTISTS, position)
+
+    def delete_followed_artists(self, user_id, artist_ids):
+        """Aplica ao snapshot os unfollows feitos pelo próprio app."""
+        with self._connect() as conn:
+            removed = conn.executemany(
+                'DELETE FROM followed_artists WHERE user_id = ? AND artist_id = ?',
+                [(user_id, artist_id) for artist_id in artist_ids]
+            ).rowcount
+            self._adjust_total(conn, user_id, FOLLOWED_ARTISTS, removed)
+
+    def followed_artists(self, user_id):
+        """Lista os artistas seguidos do snapshot, na ordem da API."""
+        rows = self._connect().execute(
+            'SELECT * FROM followed_artists WHERE user_id = ? ORDER BY position', (user_id,)
+        )
+        return [
+            Artist(
+                id=row['artist_id'], name=shared(row['name']), image=shared(row['image']),
+                genres=shared_tuple(json.loads(row['genres']))
+            )
+            for row in rows
+        ]
+
+    # --- Playlists -----------------------------------------------------------------
+
+    def replace_playlists(self, user_id, rows):
+        """Substitui o snapshot de playlists."""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM playlists WHERE user_id = ?', (user_id,))
+            conn.executemany(
+                'INSERT OR REPLACE INTO playlists (user_id, playlist_id, position, name, owner, owner_id, image, '
+                'tracks_total, snapshot_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (user_id, row['id'], position, row['name'], row['owner'], row['owner_id'], row['image'],
+                     row['tracks_total'], row['snapshot_id'])
+                    for position, row in enumerate(rows)
+                ]
+            )
+            self._mark_synced(conn, user_id, PLAYLISTS, len(rows))
+
+    def delete_playlists(self, user_id, playlist_ids):
+        """Aplica ao snapshot as playlists removidas pelo próprio app."""
+        params = [(user_id, playlist_id) for playlist_id in playlist_ids]
+        with self._connect() as conn:
+            removed = conn.executemany('DELETE FROM playlists WHERE user_id = ? AND playlist_id = ?', params).rowcount
+            conn.executemany('DELETE FROM playlist_items WHERE user_id = ? AND playlist_id = ?', params)
+            self._adjust_total(conn, user_id, PLAYLISTS, removed)
+
+    def playlists(self, user_id):
+        """Lista as playlists do snapshot, na ordem da API."""
+        rows = self._connect().execute(
+            'SELECT * FROM playlists WHERE user_id = ? ORDER BY position', (user_id,)
+        )
+        return [
+            Playlist(
+                id=row['playlist_id'], name=row['name'], owner=shared(row['owner']), owner_id=shared(row['owner_id']),
+                image=shared(row['image']), tracks_total=row['tracks_total'], snapshot_id=row['snapshot_id'],
+            )
+            for row in rows
+        ]
+
+    def playlist_contents(self, user_id):
+        """Conteúdo das playlists já lidas: {playlist_id: (snapshot_id, [PlaylistTrack])}."""
+        rows = self._connect().execute(
+            'SELECT playlist_id, snapshot_id, tracks FROM playlist_items WHERE user_id = ?', (user_id,)
+        )
+        return {
+            row['playlist_id']: (row['snapshot_id'], [
+                PlaylistTrack(
+                    id=shared(track_id), position=position, name=shared(name), artists=shared_tuple(artists),
+                    album_name=shared(album_name), duration_ms=duration_ms, isrc=shared(isrc),
+                )
+                for track_id, position, name, artists, album_name, duration_ms, isrc in json.loads(row['tracks'])
+            ])
+            for row in rows
+        }
+
+    def save_playlist_contents(self, user_id, contents, playlist_ids):
+        """Grava o conteúdo das playlists lidas agora e esquece as que saíram da biblioteca.
+
+        `contents` é {playlist_id: (snapshot_id, faixas)}; `playlist_ids` são todas as
+        playlists atuais do usuário.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO playlist_items (user_id, playlist_id, snapshot_id, tracks, scanned_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [
+                    (user_id, playlist_id, snapshot_id, json.dumps([
+                        [track['id'], track['position'], track['name'], track['artists'], track['album_name'],
+                         track['duration_ms'], track['isrc']]
+                        for track in tracks
+                    ]), now)
+                    for playlist_id, (snapshot_id, tracks) in contents.items()
+                ]
+            )
+            keep = set(playlist_ids)
+            gone = [
+                (user_id, row['playlist_id'])
+                for row in conn.execute('SELECT playlist_id FROM playlist_items WHERE user_id = ?', (user_id,))
+                if row['playlist_id'] not in keep
+            ]
+            conn.executemany('DELETE FROM playlist_items WHERE user_id = ? AND playlist_id = ?', gone)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_library_store():
+    """Retorna o snapshot compartilhado pelo processo."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LibraryStore()
+    return _store
@@ -0,0 +1,308 @@
+# metrics.py
+import contextvars
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from config import Config
+
+# Limites (s) dos histogramas de duração
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Limites do histograma de chamadas ao Spotify por requisição
+CALL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# IDs do Spotify (base62, 22 caracteres) viram "{id}" nos rótulos de endpoint
+_SPOTIFY_ID = re.compile(r'^[0-9A-Za-z]{22}$')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    """Contador monotônico com rótulos, no formato de exposição do Prometheus."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in sorted(values):
+            yield self.name, tuple(zip(self.labelnames, key)), value
+
+
+class Histogram(Counter):
+    """Histograma com limites fixos (buckets cumulativos, _sum e _count)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Contagem por bucket (o último é o +Inf), soma e total
+                counts = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts[0][position] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        for key, (counts, total, count) in sorted(values):
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket', labels + (('le', _format_number(bound)),), cumulative
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    """Métricas do processo. Com vários workers do gunicorn, cada um expõe as suas."""
+
+    def __init__(self):
+        self.metrics = []
+        self.caches = {}
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def register_cache(self, name, cache):
+        """Expõe os contadores de um TTLCache (acertos, erros, despejos e tamanho)."""
+        self.caches[name] = cache
+
+    def _cache_metrics(self):
+        stats = [(cache_name, cache.stats()) for cache_name, cache in sorted(self.caches.items())]
+        for suffix, kind, documentation in (
+            ('hits_total', 'counter', 'Leituras encontradas no cache.'),
+            ('misses_total', 'counter', 'Leituras ausentes ou expiradas no cache.'),
+            ('evictions_total', 'counter', 'Entradas despejadas por falta de espaço.'),
+            ('size', 'gauge', 'Entradas guardadas no cache.'),
+            ('bytes', 'gauge', 'Bytes guardados (só caches limitados por tamanho).'),
+        ):
+            name = f'spoticlean_cache_{suffix}'
+            field = suffix.replace('_total', '')
+            yield name, kind, documentation, [
+                (name, (('cache', cache_name),), values[field]) for cache_name, values in stats if field in values
+            ]
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)."""
+        lines = []
+        families = [(m.name, m.kind, m.documentation, m.samples()) for m in self.metrics]
+        families.extend(self._cache_metrics())
+        for name, kind, documentation, samples in families:
+            lines.append(f'# HELP {name} {documentation}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(
+                f'{sample_name}{_format_labels(labels)} {_format_number(value)}'
+                for sample_name, labels, value in samples
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    'spoticlean_http_request_duration_seconds', 'Duração das rotas Flask.', ('route', 'method', 'status')
+)
+spotify_call_duration = registry.histogram(
+    'spoticlean_spotify_call_duration_seconds',
+    'Duração de cada chamada à Web API, incluindo espera no token bucket e novas tentativas.',
+    ('route', 'endpoint', 'status', 'retries')
+)
+spotify_responses = registry.counter(
+    'spoticlean_spotify_responses_total', 'Respostas HTTP recebidas do Spotify (cada tentativa).',
+    ('route', 'endpoint', 'status')
+)
+spotify_received_bytes = registry.counter(
+    'spoticlean_spotify_received_bytes_total', 'Bytes de corpo recebidos do Spotify.', ('route', 'endpoint')
+)
+spotify_calls_per_request = registry.histogram(
+    'spoticlean_spotify_calls_per_request', 'Chamadas ao Spotify feitas por requisição ou job.', ('route',),
+    buckets=CALL_COUNT_BUCKETS
+)
+job_duration = registry.histogram(
+    'spoticlean_job_duration_seconds', 'Duração dos jobs em segundo plano.', ('kind', 'status')
+)
+
+
+def endpoint_label(method, url):
+    """Rótulo de baixa cardinalidade para uma URL do Spotify: "GET playlists/{id}/tracks"."""
+    parts = urlsplit(url)
+    path = parts.path
+    prefix = ''
+    api = urlsplit(Config.SPOTIFY_API_URL)
+    if not parts.netloc:
+        pass  # Caminho relativo ao prefixo da Web API, como o spotipy monta
+    elif parts.netloc == api.netloc and path.startswith(api.path):
+        path = path[len(api.path):]
+    else:
+        prefix = 'accounts:'
+    segments = []
+    for segment in path.strip('/').split('/'):
+        if _SPOTIFY_ID.match(segment) or (segments and segments[-1] == 'users'):
+            segment = '{id}'
+        segments.append(segment)
+    return f"{method} {prefix}{'/'.join(segments)}"
+
+
+class CallTrace:
+    """Chamadas ao Spotify feitas durante uma requisição Flask (ou um job), por endpoint.
+
+    Clientes criados durante a requisição guardam o trace e registram nele mesmo a
+    partir das threads dos pools de paginação e de operações em lote.
+    """
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.calls = {}  # endpoint -> [chamadas, segundos, novas tentativas]
+        self.responses = 0
+        self.throttled = 0
+        self.received_bytes = 0
+        self._lock = threading.Lock()
+
+    def add_call(self, endpoint, seconds, retries):
+        with self._lock:
+            entry = self.calls.setdefault(endpoint, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += retries
+
+    def add_response(self, status, received_bytes):
+        with self._lock:
+            self.responses += 1
+            self.throttled += status == 429
+            self.received_bytes += received_bytes
+
+    @property
+    def total_calls(self):
+        return sum(entry[0] for entry in self.calls.values())
+
+    def summary(self):
+        """Resumo de uma linha: totais e as chamadas por endpoint, das mais lentas para as mais rápidas."""
+        with self._lock:
+            calls = sorted(self.calls.items(), key=lambda item: item[1][1], reverse=True)
+            spotify_seconds = sum(entry[1] for _, entry in calls)
+            parts = [
+                f"{endpoint} x{count} {seconds * 1000:.0f}ms" + (f" ({retries} retries)" if retries else '')
+                for endpoint, (count, seconds, retries) in calls
+            ]
+            header = (
+                f"{sum(entry[0] for _, entry in calls)} chamadas, {spotify_seconds * 1000:.0f}ms no Spotify, "
+                f"{self.received_bytes / 1024:.0f}KB, {self.throttled} x 429"
+            )
+        return '; '.join([header] + parts)
+
+
+_current_trace = contextvars.ContextVar('spotify_call_trace', default=None)
+
+
+def current_trace():
+    """Trace da requisição ou job em andamento neste contexto (ou None)."""
+    return _current_trace.get()
+
+
+def start_trace(route):
+    """Abre um trace para a requisição atual; `finish_trace` o encerra."""
+    trace = CallTrace(route)
+    _current_trace.set(trace)
+    return trace
+
+
+def finish_trace(trace):
+    """Registra as chamadas por requisição e desassocia o trace do contexto."""
+    if trace is not None:
+        spotify_calls_per_request.observe(trace.total_calls, route=trace.route)
+    _current_trace.set(None)
+
+
+@contextmanager
+def use_trace(trace):
+    """Associa `trace` ao contexto atual (ex.: dentro de uma thread do pool) durante o bloco."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_call(endpoint, seconds, status, retries, trace=None):
+    """Registra uma chamada lógica à Web API (depois de todas as tentativas)."""
+    trace = trace or current_trace()
+    route = trace.route if trace else 'none'
+    spotify_call_duration.observe(seconds, route=route, endpoint=endpoint, status=status, retries=retries)
+    if trace is not None:
+        trace.add_call(endpoint, seconds, retries)
+
+
+@contextmanager
+def timed_call(endpoint):
+    """Mede uma chamada ao Spotify que não passa pelo ScheduledSpotify (ex.: troca de token OAuth)."""
+    started = time.perf_counter()
+    status = '2xx'
+    try:
+        yield
+    except Exception as e:
+        status = getattr(e, 'http_status', None) or 'error'
+        raise
+    finally:
+        record_call(endpoint, time.perf_counter() - started, status, 0)
+
+
+def record_response(response, *args, **kwargs):
+    """Hook de resposta da requests.Session compartilhada (e do cliente httpx): status e bytes de cada tentativa."""
+    trace = current_trace()
+    route = trace.route if trace else 'none'
+    endpoint = endpoint_label(response.request.method, str(response.url))
+    received_bytes = len(response.content or b'')
+    spotify_responses.inc(route=route, endpoint=endpoint, status=response.status_code)
+    spotify_received_bytes.inc(received_bytes, route=route, endpoint=endpoint)
+    if trace is not None:
+        trace.add_response(response.status_code, received_bytes)
+    return response
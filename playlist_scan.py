@@ -0,0 +1,104 @@
+# playlist_scan.py
+import logging
+import time
+from collections import Counter
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Fração mínima de uma playlist presente em outra para considerá-la "contida"
+CONTAINED_THRESHOLD = 0.9
+# Mínimo de playlists em que uma faixa precisa aparecer para ser listada
+SHARED_MIN_PLAYLISTS = 2
+# Itens devolvidos em cada consulta (os totais continuam completos)
+RESULT_LIMIT = 200
+
+
+def changed_playlists(playlists, known):
+    """IDs das playlists que precisam ser lidas de novo.
+
+    `known` é {playlist_id: (snapshot_id, faixas)} da última varredura. Uma playlist é
+    relida se for nova ou se o snapshot_id mudou; sem snapshot_id, é sempre relida.
+    """
+    return [
+        playlist['id'] for playlist in playlists
+        if playlist['id'] not in known or not playlist['snapshot_id']
+        or known[playlist['id']][0] != playlist['snapshot_id']
+    ]
+
+
+class PlaylistOverlapIndex:
+    """Índice invertido faixa → playlists, montado a partir do conteúdo de todas elas.
+
+    `contents` é {playlist_id: (snapshot_id, [PlaylistTrack])}. As comparações usam o
+    conjunto de IDs distintos de cada playlist: uma faixa repetida dentro da mesma
+    playlist conta uma vez (repetições são assunto do dedupe).
+    """
+
+    def __init__(self, contents, version, failed=()):
+        started = time.perf_counter()
+        self.contents = contents
+        self.version = version  # Versão do snapshot de playlists na varredura
+        self.failed = frozenset(failed)  # Playlists que não puderam ser lidas (conteúdo anterior ou ausente)
+        self.track_ids = {
+            playlist_id: frozenset(track.id for track in tracks) for playlist_id, (_, tracks) in contents.items()
+        }
+        self.all_track_ids = frozenset().union(*self.track_ids.values())
+        self.playlists_by_track = {}
+        self.tracks = {}  # ID da faixa -> um registro dela (nome e artistas exibidos)
+        for playlist_id, (_, tracks) in contents.items():
+            for track in tracks:
+                self.tracks.setdefault(track.id, track)
+                self.playlists_by_track.setdefault(track.id, set()).add(playlist_id)
+        logger.info(
+            f"Índice de {len(self.tracks)} faixas em {len(contents)} playlists montado "
+            f"({(time.perf_counter() - started) * 1000:.1f}ms)."
+        )
+
+    def contained(self, threshold=CONTAINED_THRESHOLD, limit=RESULT_LIMIT):
+        """Playlists com pelo menos `threshold` das faixas também em outra playlist.
+
+        Para cada playlist, as faixas em comum com as demais são contadas pelo índice
+        invertido, sem comparar todos os pares. Playlists idênticas aparecem uma vez só.
+        Retorna (total de pares, pares mais contidos primeiro).
+        """
+        pairs = []
+        for playlist_id, track_ids in self.track_ids.items():
+            if not track_ids:
+                continue
+            shared = Counter()
+            for track_id in track_ids:
+                shared.update(self.playlists_by_track[track_id])
+            del shared[playlist_id]
+            for other_id, count in shared.items():
+                ratio = count / len(track_ids)
+                if ratio < threshold:
+                    continue
+                identical = count == len(track_ids) == len(self.track_ids[other_id])
+                if identical and other_id < playlist_id:
+                    continue
+                pairs.append({
+                    'id': playlist_id, 'container_id': other_id, 'shared': count, 'tracks': len(track_ids),
+                    'container_tracks': len(self.track_ids[other_id]), 'ratio': round(ratio, 4),
+                    'identical': identical,
+                })
+        pairs.sort(key=lambda pair: (-pair['ratio'], -pair['shared'], pair['id'], pair['container_id']))
+        return len(pairs), pairs[:limit]
+
+    def shared_tracks(self, min_playlists=SHARED_MIN_PLAYLISTS, limit=RESULT_LIMIT):
+        """Faixas presentes em `min_playlists` playlists ou mais, das mais repetidas para as menos.
+
+        Retorna (total de faixas, faixas com os IDs das playlists em que aparecem).
+        """
+        matches = [
+            (track_id, playlist_ids) for track_id, playlist_ids in self.playlists_by_track.items()
+            if len(playlist_ids) >= min_playlists
+        ]
+        matches.sort(key=lambda match: (-len(match[1]), self.tracks[match[0]].name or ''))
+        return len(matches), [
+            {
+                'id': track_id, 'name': self.tracks[track_id].name, 'artists': list(self.tracks[track_id].artists),
+                'playlists': sorted(playlist_ids),
+            }
+            for track_id, playlist_ids in matches[:limit]
+        ]
@@ -0,0 +1,249 @@
+# ratelimit.py
+import asyncio
+import logging
+import random
+import sqlite3
+import threading
+import time
+import spotipy
+import metrics
+from cache import MISSING
+from config import Config
+from http_cache import get_response_cache, spotify_error
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Prioridades: páginas abertas pelo usuário passam na frente de jobs em segundo plano
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS token_bucket (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    blocked_until REAL NOT NULL DEFAULT 0
+);
+"""
+
+
+class RateLimitExceeded(spotipy.exceptions.SpotifyException):
+    """O Spotify pediu uma pausa maior do que uma requisição interativa pode esperar."""
+
+    def __init__(self, wait):
+        super().__init__(429, -1, f"Limite de requisições do Spotify atingido; tente novamente em {wait:.0f}s.")
+
+
+class TokenBucket:
+    """Token bucket compartilhado por todas as threads e workers que usam o mesmo arquivo SQLite.
+
+    Reabastece `rate` tokens por segundo até `capacity`. Chamadas em segundo plano só
+    consomem tokens acima de `reserve`, deixando essa margem para as interativas.
+    Um 429 bloqueia o bucket inteiro até o fim do Retry-After.
+    """
+
+    def __init__(self, path, rate, capacity, reserve=0, name='spotify'):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = min(reserve, capacity - 1)
+        self.name = name
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            conn.execute(
+                'INSERT OR IGNORE INTO token_bucket (name, tokens, updated_at) VALUES (?, ?, ?)',
+                (self.name, self.capacity, time.time())
+            )
+            self._local.conn = conn
+        return conn
+
+    def _try_acquire(self, priority):
+        """Tenta consumir um token; retorna 0 em caso de sucesso ou quantos segundos esperar."""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, updated_at, blocked_until = conn.execute(
+                'SELECT tokens, updated_at, blocked_until FROM token_bucket WHERE name = ?', (self.name,)
+            ).fetchone()
+            now = time.time()
+            if blocked_until > now:
+                return blocked_until - now
+
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate)
+            threshold = 1 + (self.reserve if priority == BACKGROUND else 0)
+            if tokens >= threshold:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (threshold - tokens) / self.rate
+            conn.execute(
+                'UPDATE token_bucket SET tokens = ?, updated_at = ? WHERE name = ?', (tokens, now, self.name)
+            )
+            return wait
+        finally:
+            conn.execute('COMMIT')
+
+    def acquire(self, priority=INTERACTIVE, max_wait=None):
+        """Bloqueia até obter um token. Levanta RateLimitExceeded se a espera passar de `max_wait`."""
+        waited = 0
+        while True:
+            wait = self._try_acquire(priority)
+            if not wait:
+                return waited
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitExceeded(wait)
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, priority=INTERACTIVE, max_wait=None):
+        """Como `acquire`, mas sem bloquear o event loop.
+
+        A transação no SQLite (que pode esperar o lock de outro worker) roda no executor
+        padrão e a espera é um asyncio.sleep. Nenhum lock é mantido durante a espera:
+        cada corrotina tenta de novo por conta própria, então uma chamada interativa usa
+        a reserva na hora, mesmo com chamadas de segundo plano esperando.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        while True:
+            wait = await loop.run_in_executor(None, self._try_acquire, priority)
+            waited = time.monotonic() - started
+            if not wait:
+                return waited
+            if max_wait is not None and waited + wait > max_wait:
+                raise RateLimitExceeded(wait)
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds):
+        """Pausa o bucket para todos os processos (usado ao receber 429 com Retry-After)."""
+        conn = self._connect()
+        conn.execute(
+            'UPDATE token_bucket SET blocked_until = MAX(blocked_until, ?), tokens = 0 WHERE name = ?',
+            (time.time() + seconds, self.name)
+        )
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def get_token_bucket():
+    """Retorna o token bucket do processo, configurado a partir do Config."""
+    global _bucket
+    if _bucket is None:
+        with _bucket_lock:
+            if _bucket is None:
+                _bucket = TokenBucket(
+                    Config.RATE_LIMIT_DB_PATH, Config.RATE_LIMIT_RATE,
+                    Config.RATE_LIMIT_BURST, Config.RATE_LIMIT_BACKGROUND_RESERVE
+                )
+    return _bucket
+
+
+def retry_after_seconds(error):
+    """Lê o Retry-After de um SpotifyException (em segundos), com 1s como padrão."""
+    headers = getattr(error, 'headers', None) or {}
+    try:
+        return max(float(headers.get('Retry-After', 1)), 0)
+    except (TypeError, ValueError):
+        return 1
+
+
+def backoff_delay(attempt):
+    """Espera exponencial com jitter para erros 5xx."""
+    return min(Config.SPOTIFY_BACKOFF_BASE * 2 ** attempt, Config.SPOTIFY_BACKOFF_MAX) * random.uniform(0.5, 1.5)
+
+
+class ScheduledSpotify(spotipy.Spotify):
+    """Cliente spotipy que passa cada chamada pelo token bucket e trata 429/5xx.
+
+    Deve receber uma requests.Session (ver http_pool): assim o spotipy não monta o
+    Retry do urllib3, que esconderia o Retry-After dentro de um erro genérico.
+    """
+
+    def __init__(self, *args, priority=INTERACTIVE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.priority = priority
+        # Dono das respostas do usuário no cache de HTTP (ID no Spotify), definido pelo handler
+        self.cache_owner = None
+        # Trace da requisição (ou job) que criou o cliente; as threads dos pools registram nele
+        self.trace = metrics.current_trace()
+
+    def __del__(self):
+        # O spotipy fecha a Session ao descartar o cliente; aqui ela é compartilhada pelo
+        # processo e precisa continuar aberta para reaproveitar as conexões.
+        pass
+
+    def _conditional_get(self, url, params, cache, key, entry):
+        """GET com If-None-Match: um 304 devolve o corpo guardado, um 200 atualiza o cache."""
+        headers = dict(self._auth_headers(), **cache.conditional_headers(entry))
+        response = self._session.get(
+            url, headers=headers, params=params, proxies=self.proxies, timeout=self.requests_timeout
+        )
+        if response.status_code == 304 and entry is not None:
+            return cache.revalidated(key, entry, response.headers)
+        if response.status_code >= 400:
+            raise spotify_error('GET', url, params, response)
+        try:
+            body = response.json()
+        except ValueError:
+            return None
+        cache.store(key, response.headers, response.text)
+        return body
+
+    def _internal_call(self, method, url, payload, params):
+        cache = get_response_cache() if method == 'GET' else None
+        if cache is not None:
+            url = url if url.startswith('http') else self.prefix + url
+            key = cache.key(self.cache_owner, url, params)
+            cache = cache if key is not None else None
+        if cache is not None:
+            entry, body = cache.lookup(key)
+            if body is not MISSING:
+                return body  # Ainda fresco: nem token do bucket, nem rede
+        bucket = get_token_bucket()
+        # Requisições interativas não podem prender o worker por muito tempo
+        max_wait = Config.RATE_LIMIT_MAX_WAIT if self.priority == INTERACTIVE else None
+        endpoint = metrics.endpoint_label(method, url)
+        started = time.perf_counter()
+        status = 'error'
+        attempt = 0
+        try:
+            with metrics.use_trace(self.trace):
+                while True:
+                    bucket.acquire(self.priority, max_wait=max_wait)
+                    try:
+                        if cache is not None:
+                            result = self._conditional_get(url, params, cache, key, entry)
+                        else:
+                            result = super()._internal_call(method, url, payload, params)
+                        status = '2xx'
+                        return result
+                    except spotipy.exceptions.SpotifyException as e:
+                        status = e.http_status or 0
+                        if attempt >= Config.SPOTIFY_MAX_RETRIES or not (status == 429 or status >= 500):
+                            raise
+                        if status == 429:
+                            delay = retry_after_seconds(e)
+                            if max_wait is not None and delay > max_wait:
+                                raise RateLimitExceeded(delay) from e
+                            logger.warning(f"429 do Spotify em {url}; pausando {delay:.1f}s.")
+                            bucket.block_for(delay)
+                        else:
+                            delay = backoff_delay(attempt)
+                            logger.warning(f"Erro {status} do Spotify em {url}; nova tentativa em {delay:.1f}s.")
+                            time.sleep(delay)
+                        attempt += 1
+        except Exception as e:
+            status = getattr(e, 'http_status', None) or 'error'
+            raise
+        finally:
+            # Uma observação por chamada lógica, com o tempo de fila e de todas as tentativas
+            metrics.record_call(endpoint, time.perf_counter() - started, status, attempt, self.trace)
@@ -0,0 +1,78 @@
+# records.py
+import sys
+from collections.abc import Mapping
+
+
+def shared(text):
+    """Interna textos que se repetem entre registros (artistas, álbuns, URLs de capa, gêneros).
+
+    Numa biblioteca grande o mesmo artista ou a mesma capa aparece em centenas de
+    faixas: todas passam a apontar para uma única cópia da string.
+    """
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+def shared_tuple(texts):
+    return tuple(shared(text) for text in texts or ())
+
+
+class Record(Mapping):
+    """Registro compacto (com __slots__) para os itens da biblioteca mantidos em memória.
+
+    Guarda só os campos exibidos e usados nas buscas, no lugar do JSON completo da API
+    (mercados, álbum inteiro, todas as resoluções de imagem). Continua acessível como
+    dicionário (`track['name']`, `track.get('isrc')`, `dict(track)`), o que mantém
+    templates, exportação e detecção de duplicadas funcionando sem mudanças.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def __getitem__(self, name):
+        if name not in self.__slots__:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class Track(Record):
+    """Música curtida."""
+
+    __slots__ = (
+        'id', 'added_at', 'name', 'artists', 'artist_ids', 'album_id', 'album_name', 'image',
+        'duration_ms', 'explicit', 'isrc',
+    )
+
+    @property
+    def artist(self):
+        """Artista principal, exibido na lista de músicas."""
+        return self.artists[0] if self.artists else ''
+
+
+class PlaylistTrack(Record):
+    """Faixa de uma playlist, com a posição em que aparece."""
+
+    __slots__ = ('id', 'position', 'name', 'artists', 'album_name', 'duration_ms', 'isrc')
+
+
+class Artist(Record):
+    """Artista seguido."""
+
+    __slots__ = ('id', 'name', 'image', 'genres')
+
+
+class Playlist(Record):
+    """Playlist do usuário."""
+
+    __slots__ = ('id', 'name', 'owner', 'owner_id', 'image', 'tracks_total', 'snapshot_id')
@@ -0,0 +1,167 @@
+# search.py
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+# Pontuação de um termo da busca contra um termo indexado
+EXACT = 3
+PREFIX = 2
+SUBSTRING = 1
+
+_NON_WORD = re.compile(r'[\W_]+')
+
+
+def fold(text):
+    """Normaliza um texto para busca: sem acentos, casefold e só letras/dígitos separados por espaço.
+
+    "Beyoncé" e "BEYONCE" viram "beyonce"; "João" vira "joao".
+    """
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def tokenize(text):
+    return fold(text).split()
+
+
+def trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+class SearchIndex:
+    """Índice invertido em memória para busca por substring, sem acentos.
+
+    `fields` mapeia o nome de cada campo para uma função que extrai do documento um
+    texto ou uma lista de textos. Termos com 3+ letras da busca são resolvidos pelo
+    índice de trigramas; termos curtos casam por prefixo. Documentos podem ser
+    adicionados e removidos individualmente, sem reconstruir o índice.
+
+    Os termos de cada documento não ficam guardados: na remoção eles são extraídos de
+    novo do próprio documento, que já está em memória nos índices da biblioteca.
+    """
+
+    def __init__(self, fields, docs=(), key=lambda doc: doc['id']):
+        self.fields = fields
+        self.key = key
+        self._docs = {}  # id -> documento indexado
+        self._postings = {field: defaultdict(set) for field in fields}  # campo -> termo -> ids
+        self._term_refs = defaultdict(int)  # termo -> quantas (campo, documento) o usam
+        self._trigrams = defaultdict(set)  # trigrama -> termos
+        self._prefixes = defaultdict(set)  # prefixo de 1 ou 2 letras -> termos
+        self._lock = threading.RLock()
+        for doc in docs:
+            self.add(doc)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _terms(self, doc):
+        """Retorna {campo: termos} de um documento."""
+        doc_terms = {}
+        for field, extract in self.fields.items():
+            texts = extract(doc)
+            if isinstance(texts, str) or texts is None:
+                texts = [texts]
+            doc_terms[field] = {term for text in texts for term in tokenize(text)}
+        return doc_terms
+
+    def add(self, doc):
+        """Indexa (ou reindexa) um documento."""
+        doc_id = self.key(doc)
+        with self._lock:
+            if doc_id in self._docs:
+                self.remove(doc_id)
+            for field, terms in self._terms(doc).items():
+                for term in terms:
+                    self._postings[field][term].add(doc_id)
+                    self._ref_term(term)
+            self._docs[doc_id] = doc
+
+    def remove(self, doc_id):
+        """Remove um documento do índice (IDs desconhecidos são ignorados)."""
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return
+            for field, terms in self._terms(doc).items():
+                postings = self._postings[field]
+                for term in terms:
+                    postings[term].discard(doc_id)
+                    if not postings[term]:
+                        del postings[term]
+                    self._unref_term(term)
+
+    def _ref_term(self, term):
+        if self._term_refs[term] == 0:
+            for gram in trigrams(term):
+                self._trigrams[gram].add(term)
+            for size in (1, 2):
+                self._prefixes[term[:size]].add(term)
+        self._term_refs[term] += 1
+
+    def _unref_term(self, term):
+        self._term_refs[term] -= 1
+        if self._term_refs[term]:
+            return
+        del self._term_refs[term]
+        for gram in trigrams(term):
+            self._discard(self._trigrams, gram, term)
+        for size in (1, 2):
+            self._discard(self._prefixes, term[:size], term)
+
+    @staticmethod
+    def _discard(index, key, term):
+        terms = index.get(key)
+        if terms is not None:
+            terms.discard(term)
+            if not terms:
+                del index[key]
+
+    def _matching_terms(self, token):
+        """Retorna {termo indexado: pontuação} para um termo da busca."""
+        if len(token) < 3:
+            candidates = self._prefixes.get(token, ())
+        else:
+            grams = sorted((self._trigrams.get(gram, set()) for gram in trigrams(token)), key=len)
+            candidates = set.intersection(*grams) if grams[0] else ()
+        matches = {}
+        for term in candidates:
+            if term == token:
+                matches[term] = EXACT
+            elif term.startswith(token):
+                matches[term] = PREFIX
+            elif token in term:
+                matches[term] = SUBSTRING
+        return matches
+
+    def search(self, query=None, **field_queries):
+        """Busca documentos que contêm todos os termos da consulta.
+
+        `query` procura em todos os campos; `field_queries` (ex.: artist='joao')
+        restringem termos a um campo. Retorna {id: pontuação}, ou None quando não há
+        nenhum termo para buscar (ou seja, nada a filtrar).
+        """
+        clauses = [(None, query)] + list(field_queries.items())
+        tokens = [(field, token) for field, text in clauses for token in tokenize(text)]
+        if not tokens:
+            return None
+
+        results = None
+        with self._lock:
+            for field, token in tokens:
+                fields = self.fields if field is None else [field]
+                scores = {}
+                for term, score in self._matching_terms(token).items():
+                    for name in fields:
+                        for doc_id in self._postings[name].get(term, ()):
+                            if scores.get(doc_id, 0) < score:
+                                scores[doc_id] = score
+                if results is None:
+                    results = scores
+                else:
+                    results = {doc_id: total + scores[doc_id] for doc_id, total in results.items() if doc_id in scores}
+                if not results:
+                    return {}
+        return results
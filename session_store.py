@@ -0,0 +1,241 @@
+# session_store.py
+import json
+import logging
+import secrets
+import sqlite3
+import threading
+import time
+from flask import session, has_request_context
+from spotipy.cache_handler import CacheHandler
+from cache import KeyedLocks
+from config import Config
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Chave do cookie de sessão do Flask que guarda o ID opaco da sessão no servidor
+SESSION_KEY = 'sid'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    token_info TEXT NOT NULL,
+    refreshing_until REAL NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+"""
+
+# Intervalo (s) entre consultas de quem espera a renovação feita por outro processo
+REFRESH_POLL_INTERVAL = 0.05
+
+# Renovações em andamento neste processo: as outras threads da mesma sessão esperam
+refresh_locks = KeyedLocks()
+
+
+class SessionStore:
+    """Tokens do Spotify guardados no servidor (SQLite), compartilhados entre os workers.
+
+    O cookie assinado do Flask leva só o ID opaco da sessão (SESSION_KEY), em vez do
+    token inteiro. Sessões sem uso por SESSION_TTL segundos expiram.
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self.path = path or Config.SESSION_DB_PATH
+        self.ttl = ttl or Config.SESSION_TTL
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def create(self, token_info):
+        """Cria uma sessão para o token e retorna seu ID (aleatório, imprevisível)."""
+        session_id = secrets.token_urlsafe(32)
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO sessions (id, token_info, created_at, updated_at) VALUES (?, ?, ?, ?)',
+            (session_id, json.dumps(token_info), now, now)
+        )
+        # Aproveita o login para descartar as sessões abandonadas
+        conn.execute('DELETE FROM sessions WHERE updated_at < ?', (now - self.ttl,))
+        return session_id
+
+    def get(self, session_id):
+        """Retorna o token da sessão, ou None se ela não existir ou tiver expirado."""
+        if not session_id:
+            return None
+        row = self._connect().execute(
+            'SELECT token_info FROM sessions WHERE id = ? AND updated_at >= ?',
+            (session_id, time.time() - self.ttl)
+        ).fetchone()
+        return json.loads(row['token_info']) if row else None
+
+    def save(self, session_id, token_info):
+        """Grava um token novo na sessão e libera a renovação em andamento, se houver."""
+        self._connect().execute(
+            'UPDATE sessions SET token_info = ?, refreshing_until = 0, updated_at = ? WHERE id = ?',
+            (json.dumps(token_info), time.time(), session_id)
+        )
+
+    def delete(self, session_id):
+        if session_id:
+            self._connect().execute('DELETE FROM sessions WHERE id = ?', (session_id,))
+
+    def fresh_token(self, session_id, is_expired, refresh):
+        """Retorna o token da sessão, renovando-o com `refresh(token_info)` se `is_expired`.
+
+        A renovação é única por sessão: requisições simultâneas do mesmo processo esperam
+        no lock, e as de outros processos esperam o "aluguel" gravado na sessão
+        (`refreshing_until`). Todas recebem o token renovado por uma só chamada ao Spotify.
+        Se quem renova falhar ou morrer, o aluguel expira e outra requisição tenta.
+        """
+        token_info = self.get(session_id)
+        if token_info is None or not is_expired(token_info):
+            return token_info
+        with refresh_locks(session_id):
+            while True:
+                token_info, leased = self._lease_refresh(session_id, is_expired)
+                if leased is None:
+                    return token_info
+                if leased:
+                    break
+                time.sleep(REFRESH_POLL_INTERVAL)
+
+            try:
+                token_info = refresh(token_info)
+            except Exception:
+                self._connect().execute('UPDATE sessions SET refreshing_until = 0 WHERE id = ?', (session_id,))
+                raise
+            self.save(session_id, token_info)
+            return token_info
+
+    def _lease_refresh(self, session_id, is_expired):
+        """Tenta pegar a renovação da sessão.
+
+        Retorna (token, None) se o token já está válido (outro processo renovou) ou a
+        sessão não existe, (token, True) se esta requisição deve renovar e
+        (token, False) se outro processo está renovando agora.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT token_info, refreshing_until FROM sessions WHERE id = ?', (session_id,)
+            ).fetchone()
+            if row is None:
+                return None, None
+            token_info = json.loads(row['token_info'])
+            if not is_expired(token_info):
+                return token_info, None
+            now = time.time()
+            if row['refreshing_until'] > now:
+                return token_info, False
+            conn.execute(
+                'UPDATE sessions SET refreshing_until = ? WHERE id = ?',
+                (now + Config.SESSION_REFRESH_TIMEOUT, session_id)
+            )
+            return token_info, True
+        finally:
+            conn.execute('COMMIT')
+
+
+class SessionExpired(Exception):
+    """A sessão no servidor não existe mais (logout, revogação ou expiração)."""
+
+
+class SessionTokenManager:
+    """Token de uma sessão do servidor para código fora de requisições (jobs em segundo plano).
+
+    Mantém o token em memória e, quando ele está para expirar, pega o renovado pela
+    sessão (SessionStore.fresh_token), com a mesma renovação única das requisições do
+    usuário. Serve de `auth_manager` do spotipy e do cliente assíncrono, então um job
+    que espera na fila ou roda por mais de uma hora continua com um token válido.
+    """
+
+    def __init__(self, session_id, is_expired, refresh):
+        self.session_id = session_id
+        self.is_expired = is_expired
+        self.refresh = refresh
+        self.token_info = None
+        self._lock = threading.Lock()
+
+    def cached_access_token(self):
+        """Token em memória se ainda estiver válido; senão None (sem tocar no SQLite)."""
+        token_info = self.token_info
+        if token_info is None or self.is_expired(token_info):
+            return None
+        return token_info['access_token']
+
+    def get_token_info(self):
+        with self._lock:
+            if self.token_info is None or self.is_expired(self.token_info):
+                token_info = get_session_store().fresh_token(self.session_id, self.is_expired, self.refresh)
+                if token_info is None:
+                    raise SessionExpired("A sessão do usuário foi encerrada; faça login novamente.")
+                self.token_info = token_info
+            return self.token_info
+
+    def get_access_token(self, as_dict=False):
+        token_info = self.get_token_info()
+        return token_info if as_dict else token_info['access_token']
+
+
+class ServerSessionCacheHandler(CacheHandler):
+    """Cache de tokens do spotipy apoiado na sessão do servidor da requisição atual.
+
+    Substitui o FlaskSessionCacheHandler, que gravava o token no cookie. Fora de uma
+    requisição (ex.: jobs) ou sem sessão iniciada, não lê nem grava nada.
+    """
+
+    def get_cached_token(self):
+        return get_session_store().get(current_session_id())
+
+    def save_token_to_cache(self, token_info):
+        session_id = current_session_id()
+        if session_id:
+            get_session_store().save(session_id, token_info)
+
+
+def current_session_id():
+    """ID da sessão no servidor guardado no cookie da requisição atual (ou None)."""
+    return session.get(SESSION_KEY) if has_request_context() else None
+
+
+def start_session(token_info):
+    """Abre uma sessão no servidor para o token obtido no login.
+
+    Sempre gera um ID novo (o anterior, se houver, é descartado), para que um ID de
+    sessão conhecido antes do login não passe a valer depois dele.
+    """
+    store = get_session_store()
+    store.delete(session.get(SESSION_KEY))
+    session[SESSION_KEY] = store.create(token_info)
+
+
+def end_session():
+    """Apaga a sessão no servidor e limpa o cookie do navegador."""
+    get_session_store().delete(session.get(SESSION_KEY))
+    session.clear()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Retorna o SessionStore do processo."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SessionStore()
+    return _store
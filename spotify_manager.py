@@ -1,6 +1,18 @@
 # spotify_manager.py
-from flask import Flask, render_template, redirect, request, session, url_for, flash, jsonify
-from api import SpotifyHandler, SpotifyHandlerError
+from flask import (
+    Flask, Response, render_template, redirect, request, session, url_for, flash, jsonify, stream_with_context, g
+)
+import metrics
+from api import SpotifyHandler, SpotifyHandlerError, AmbiguousArtistError
+from cache import artist_cache
+from jobs import get_job_queue
+from export import export_chunks, COLUMNS, FORMATS
+from cleanup import parse_rules, RULES, MATCH_ALL
+from session_store import SESSION_KEY
+from json_api import (
+    ApiError, FIELDS, encode_cursor, parse_fields, page_limit, page as api_page, library_etag, not_modified,
+    json_response
+)
 import logging
 from config import Config  # Importe o Config
 import time
@@ -23,33 +35,99 @@ app.config.from_object(Config)  # Carrega as configurações do Config
 # Definir a chave secreta para sessões Flask
 app.secret_key = Config.SECRET_KEY
 
+@app.before_request
+def start_request_metrics():
+    # Tudo o que os clientes do Spotify criados nesta requisição chamarem cai neste trace
+    g.spotify_trace = metrics.start_trace(request.endpoint or 'not_found')
+
+@app.after_request
+def record_request_metrics(response):
+    trace = g.get('spotify_trace')
+    if trace is not None:
+        g.response_status = response.status_code
+        metrics.http_request_duration.observe(
+            time.perf_counter() - trace.started,
+            route=trace.route, method=request.method, status=response.status_code
+        )
+        if Config.METRICS_DEBUG_HEADER:
+            response.headers['X-Spotify-Calls'] = trace.summary()
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Com stream_with_context, roda só depois do último bloco: inclui as chamadas do streaming
+    trace = g.pop('spotify_trace', None)
+    if trace is None:
+        return
+    if trace.calls:
+        logger.info(
+            f"{request.method} {request.path} {g.get('response_status', 500)} "
+            f"{(time.perf_counter() - trace.started) * 1000:.0f}ms — {trace.summary()}"
+        )
+    metrics.finish_trace(trace)
+
+@app.context_processor
+def inject_session_key():
+    # Os templates testam a sessão pela mesma chave usada no login
+    return {'session_key': SESSION_KEY}
+
 def get_spotify_handler():
-    """Função auxiliar para obter o handler do Spotify."""
-    token_info = session.get('spotify_token_info')
-    if not token_info:
+    """Função auxiliar para obter o handler do Spotify (None se não houver sessão válida)."""
+    if not session.get(SESSION_KEY):
         return None
     sp_handler = SpotifyHandler()
-    sp_handler.get_access_token()  # Método usa session internamente
+    # Lê o token da sessão no servidor, renovando-o se expirou
+    if sp_handler.get_access_token() is None:
+        return None
     return sp_handler
 
 def refresh_token_if_needed(sp_handler):
     """Verifica se o token está expirado e renova se necessário."""
-    token_info = session.get('spotify_token_info')
-    if token_info and sp_handler.sp_oauth.is_token_expired(token_info):
-        try:
-            token_info = sp_handler.get_access_token()  # Atualiza o token
-            session['spotify_token_info'] = token_info
-            logger.info("Token renovado com sucesso.")
-        except SpotifyHandlerError as e:
-            logger.error(f"Erro ao renovar o token: {e}")
-            flash('Erro ao renovar o token do Spotify.', 'error')
-            return redirect(url_for('login'))
-    return token_info
+    try:
+        return sp_handler.get_access_token()  # Renovação única por sessão (session_store)
+    except SpotifyHandlerError as e:
+        logger.error(f"Erro ao renovar o token: {e}")
+        flash('Erro ao renovar o token do Spotify.', 'error')
+        return redirect(url_for('login'))
+
+def wants_json():
+    """Indica se o cliente (fetch/XHR) espera JSON em vez de um redirecionamento."""
+    return (request.accept_mimetypes.best == 'application/json'
+            or request.headers.get('X-Requested-With') == 'XMLHttpRequest')
+
+def enqueue_job(sp_handler, kind, params, endpoint, message):
+    """Enfileira um job em segundo plano e responde na hora com o seu ID.
+
+    Para requisições via fetch, retorna JSON (202); para formulários, redireciona para
+    `endpoint` com `?job=<id>`, que a página acompanha por polling.
+    """
+    job_id = get_job_queue().enqueue(kind, sp_handler.get_user_id(), session[SESSION_KEY], params)
+    # Último job de cada tipo, para páginas que exibem o resultado depois (ex.: duplicadas)
+    session['last_jobs'] = dict(session.get('last_jobs', {}), **{kind: job_id})
+    if wants_json():
+        return jsonify({'job_id': job_id, 'status_url': url_for('job_status', job_id=job_id)}), 202
+    flash(message, 'info')
+    return redirect(url_for(endpoint, job=job_id))
+
+def next_page_cursor(index, items, page, per_page, total_pages):
+    """Cursor da API JSON para continuar (rolagem infinita) depois de uma página renderizada."""
+    if page >= total_pages or not items:
+        return None
+    return encode_cursor(index.version, (page - 1) * per_page + len(items), items[-1]['id'])
+
+def flash_bulk_report(report, success_message):
+    """Exibe o resultado de uma operação em lote, avisando quando parte dos itens falhou."""
+    if report.failed and not report.succeeded:
+        flash(f'Nenhum dos {len(report.failed)} itens pôde ser processado. Tente novamente.', 'error')
+    elif report.failed:
+        flash(f'{len(report.succeeded)} itens processados, mas {len(report.failed)} falharam. Tente novamente.', 'warning')
+    else:
+        flash(success_message, 'success')
 
 @app.route('/')
 def home():
     # Verifica se o usuário já tem uma sessão ativa (está logado)
-    if 'spotify_token_info' in session:
+    if SESSION_KEY in session:
         return redirect(url_for('dashboard'))
     
     # Se não estiver logado, mostra a tela de login/boas-vindas
@@ -69,19 +147,33 @@ def callback():
     try:
         code = request.args.get('code')
         sp_handler = SpotifyHandler()
-        token_info = sp_handler.get_access_token(code=code)
-        session['spotify_token_info'] = token_info
+        sp_handler.get_access_token(code=code)  # Abre a sessão no servidor; o cookie leva só o ID
+        # O token novo pode ser de outra conta: o ID guardado na sessão não vale mais
+        session.pop('spotify_user_id', None)
+        if Config.LIBRARY_WARM_UP:
+            start_warm_up(sp_handler)
         return redirect(url_for('dashboard'))
     except Exception as e:
         logger.error(f"Erro ao obter o token: {e}")
         flash('Erro ao obter o token do Spotify.', 'error')
         return redirect(url_for('home'))
 
+def start_warm_up(sp_handler):
+    """Carrega a biblioteca do usuário em segundo plano logo após o login.
+
+    Um job por usuário de cada vez: outra aba (ou um novo login) reaproveita o que já
+    está em andamento. Uma falha aqui não impede o login; as páginas carregam sob demanda.
+    """
+    try:
+        job_id = get_job_queue().enqueue('warm_up', sp_handler.get_user_id(), session[SESSION_KEY], {}, unique=True)
+        session['last_jobs'] = dict(session.get('last_jobs', {}), warm_up=job_id)
+    except Exception as e:
+        logger.warning(f"Não foi possível iniciar o aquecimento da biblioteca: {e}")
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        token_info = session.get('spotify_token_info')
-        if not token_info:
+        if not session.get(SESSION_KEY):
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -98,15 +190,35 @@ def dashboard():
     refresh_token_if_needed(sp_handler)
 
     try:
-        user = sp_handler.sp.current_user()
+        user = sp_handler.get_user_profile()
         user_name = user.get('display_name', 'Usuário')
         user_image = user['images'][0]['url'] if user.get('images') else 'https://example.com/default-image.png'
-        return render_template('dashboard.html', user_name=user_name, user_image=user_image)
+        # Estado do aquecimento da biblioteca iniciado no login (None se não houver)
+        warm_up_id = session.get('last_jobs', {}).get('warm_up')
+        warm_up = get_job_queue().get(warm_up_id, sp_handler.get_user_id()) if warm_up_id else None
+        return render_template('dashboard.html', user_name=user_name, user_image=user_image, warm_up=warm_up)
     except Exception as e:
         logger.error(f"Erro ao recuperar informações do usuário: {e}")
         flash('Erro ao recuperar informações do usuário.', 'error')
         return redirect(url_for('login'))
 
+@app.route('/stats')
+@login_required
+def library_stats():
+    """Estatísticas da biblioteca em JSON, carregadas pelo dashboard depois da página.
+
+    Com `overlap=1`, lê o conteúdo das playlists para calcular quantas músicas curtidas
+    estão nelas (demorado na primeira vez; depois fica em cache).
+    """
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return jsonify({'error': 'Sessão inválida.'}), 401
+    try:
+        return jsonify(sp_handler.get_library_stats(overlap=request.args.get('overlap') == '1'))
+    except SpotifyHandlerError as e:
+        logger.error(f"Erro ao calcular as estatísticas da biblioteca: {e}")
+        return jsonify({'error': 'Erro ao calcular as estatísticas da biblioteca.'}), 502
+
 @app.route('/voltar')
 def voltar():
     return redirect(url_for('dashboard'))
@@ -123,8 +235,14 @@ def create_playlist():
             return redirect(url_for('login'))
 
         try:
-            sp_handler.create_playlist(playlist_name, artist_names)
-            flash(f'Playlist "{playlist_name}" criada com sucesso!', 'success')
+            # Muitos artistas: cria a playlist em segundo plano para não estourar o timeout do worker
+            if len(artist_names) > Config.JOB_ARTIST_THRESHOLD:
+                return enqueue_job(
+                    sp_handler, 'create_playlist', {'playlist_name': playlist_name, 'artist_names': artist_names},
+                    'create_playlist', f'Criando a playlist "{playlist_name}" em segundo plano...'
+                )
+            report = sp_handler.create_playlist(playlist_name, artist_names)
+            flash_bulk_report(report, f'Playlist "{playlist_name}" criada com sucesso!')
             return redirect(url_for('create_playlist'))  # Redireciona para a mesma página
         except SpotifyHandlerError as e:
             flash(str(e), 'error')
@@ -143,22 +261,16 @@ def view_playlists(page=1):
         # Obtendo os parâmetros de ordenação da URL
         sort = request.args.get('sort', 'name_asc')  # Padrão: ordem alfabética crescente
         limit = 10
-        offset = (page - 1) * limit
-
-        # Obtém as playlists do usuário
-        playlists = sp_handler.sp.current_user_playlists(limit=limit, offset=offset)
 
-        # Ordena as playlists com base na opção selecionada
-        if sort == 'name_asc':
-            playlists['items'].sort(key=lambda x: x['name'].lower())
-        elif sort == 'name_desc':
-            playlists['items'].sort(key=lambda x: x['name'].lower(), reverse=True)
-
-        total_playlists = sp_handler.sp.current_user_playlists(limit=1)['total']
-        total_pages = (total_playlists // limit) + (total_playlists % limit > 0)
+        # Índice em memória de todas as playlists: filtro, ordenação global e paginação
+        index = sp_handler.get_playlist_index()
+        playlists, total_pages = index.page(sort, page, limit, request.args.get('playlist', '').strip())
 
         # Passa o parâmetro `sort` para o template
-        return render_template('view_playlists.html', playlists=playlists['items'], page=page, total_pages=total_pages, sort=sort)
+        return render_template(
+            'view_playlists.html', playlists=playlists, page=page, total_pages=total_pages, sort=sort,
+            next_cursor=next_page_cursor(index, playlists, page, limit, total_pages)
+        )
     except Exception as e:
         logger.error(f"Erro ao recuperar playlists do usuário: {e}")
         flash('Erro ao recuperar playlists.', 'error')
@@ -178,11 +290,11 @@ def remove_selected_playlists():
             flash('Nenhuma playlist selecionada para remoção.', 'warning')
             return redirect(url_for('view_playlists'))
 
-        # Remover cada playlist selecionada
-        for playlist_id in playlist_ids:
-            sp_handler.remove_playlist(playlist_id)
-
-        flash(f'{len(playlist_ids)} playlists removidas com sucesso.', 'success')
+        # A remoção roda em segundo plano; a página acompanha o progresso pelo ID do job
+        return enqueue_job(
+            sp_handler, 'remove_playlists', {'playlist_ids': playlist_ids}, 'view_playlists',
+            f'Removendo {len(playlist_ids)} playlists em segundo plano...'
+        )
     except Exception as e:
         app.logger.error(f'Erro ao remover playlists selecionadas: {e}')
         flash('Erro ao tentar remover playlists.', 'danger')
@@ -204,29 +316,6 @@ def remove_playlist_route(playlist_id):
 
     return redirect(url_for('view_playlists'))
 
-@app.route('/update_tracks')
-def update_tracks():
-    sp_handler = get_spotify_handler()
-    if not sp_handler:
-        return redirect(url_for('login'))
-
-    try:
-        limit = 20
-        liked_tracks = sp_handler.sp.current_user_saved_tracks(limit=limit)
-        return jsonify({
-            'tracks': [
-                {
-                    'id': track['track']['id'],
-                    'name': track['track']['name'],
-                    'artist': track['track']['artists'][0]['name']
-                }
-                for track in liked_tracks['items']
-            ]
-        })
-    except Exception as e:
-        logger.error(f"Erro ao recuperar a lista de músicas: {e}")
-        return jsonify({'tracks': []}), 500
-
 @app.route('/remove_tracks_by_artist', methods=['POST'])
 def remove_tracks_by_artist():
     sp_handler = get_spotify_handler()
@@ -234,10 +323,17 @@ def remove_tracks_by_artist():
         return redirect(url_for('login'))
 
     artist_name = request.form.get('artist_name')
+    # Vem da página de escolha quando o nome corresponde a mais de um artista
+    artist_id = request.form.get('artist_id')
 
     try:
-        sp_handler.remove_liked_tracks(artist_list=[artist_name])
-        flash(f'Músicas do artista "{artist_name}" removidas com sucesso!', 'success')
+        if artist_id:
+            report = sp_handler.remove_liked_tracks(artist_ids=[artist_id])
+        else:
+            report = sp_handler.remove_liked_tracks(artist_list=[artist_name])
+        flash_bulk_report(report, f'Músicas do artista "{artist_name}" removidas com sucesso!')
+    except AmbiguousArtistError as e:
+        return render_template('choose_artist.html', artist_name=e.artist_name, candidates=e.candidates)
     except Exception as e:
         logger.error(f"Erro ao remover músicas do artista: {e}")
         flash('Erro ao remover músicas do artista.', 'error')
@@ -252,55 +348,35 @@ def liked_tracks(page):
         return redirect(url_for('login'))
 
     limit = 200
-    offset = (page - 1) * limit
 
     try:
         # Lidar com a remoção de músicas se o método for POST
         if request.method == 'POST':
             track_ids = request.form.getlist('track_ids')
+            if len(track_ids) > Config.JOB_TRACK_THRESHOLD:
+                return enqueue_job(
+                    sp_handler, 'remove_tracks', {'track_ids': track_ids}, 'liked_tracks',
+                    f'Removendo {len(track_ids)} músicas em segundo plano...'
+                )
             if track_ids:
-                sp_handler.remove_liked_tracks(track_ids=track_ids)
-                flash('Músicas removidas com sucesso!', 'success')
+                report = sp_handler.remove_liked_tracks(track_ids=track_ids)
+                flash_bulk_report(report, 'Músicas removidas com sucesso!')
             else:
                 flash('Nenhuma música selecionada para remoção.', 'warning')
             return redirect(url_for('liked_tracks', page=page))
 
-        # Recuperar todas as músicas curtidas
-        liked_tracks = sp_handler.sp.current_user_saved_tracks(limit=50)
-        tracks = [
-            {
-                'id': track['track']['id'],
-                'name': track['track']['name'],
-                'artist': track['track']['artists'][0]['name'],
-                'image': track['track']['album']['images'][0]['url'] if track['track']['album']['images'] else 'https://via.placeholder.com/50?text=Sem+Capa'
-            } for track in liked_tracks['items']
-        ]
-
-        # Obter artista e busca da query string
-        artist_query = request.args.get('artist')
-        search_query = request.args.get('search')
-        sort_query = request.args.get('sort')
-
-        # Filtrar as faixas conforme o nome do artista, se fornecido
-        if artist_query:
-            tracks = [track for track in tracks if artist_query.lower() in track['artist'].lower()]
-
-        # Filtrar as faixas conforme a consulta de busca, se fornecida
-        if search_query:
-            tracks = [track for track in tracks if search_query.lower() in track['name'].lower()]
-
-        # Ordenar as faixas conforme a consulta de ordenação
-        if sort_query == 'name_asc':
-            tracks.sort(key=lambda x: x['name'])
-        elif sort_query == 'name_desc':
-            tracks.sort(key=lambda x: x['name'], reverse=True)
-
-        # Paginar resultados
-        total_tracks = len(tracks)
-        total_pages = (total_tracks // limit) + (total_tracks % limit > 0)
+        # Índice de todas as músicas curtidas: busca sem acentos por título e artista
+        index = sp_handler.get_track_index()
+        tracks, total_pages = index.page(
+            request.args.get('sort'), page, limit,
+            name=request.args.get('search'), artist=request.args.get('artist')
+        )
 
         # Retornar a template com as faixas
-        return render_template('liked_tracks.html', tracks=tracks[offset:offset + limit], page=page, total_pages=total_pages)
+        return render_template(
+            'liked_tracks.html', tracks=tracks, page=page, total_pages=total_pages,
+            next_cursor=next_page_cursor(index, tracks, page, limit, total_pages)
+        )
     except Exception as e:
         logger.error(f"Erro ao recuperar faixas curtidas: {e}")
         flash('Erro ao recuperar faixas.', 'error')
@@ -322,8 +398,8 @@ def liked_artists_view(page):
             if selected_artist_ids:
                 try:
                     # Chamada correta para remover artistas
-                    sp_handler.unfollow_artists(selected_artist_ids)  # Use o método da classe
-                    flash('Artistas removidos com sucesso!', 'success')
+                    report = sp_handler.unfollow_artists(selected_artist_ids)  # Use o método da classe
+                    flash_bulk_report(report, 'Artistas removidos com sucesso!')
                 except SpotifyHandlerError as e:
                     logger.error(f"Erro ao remover artistas: {e}")
                     flash('Erro ao remover artistas.', 'error')
@@ -331,31 +407,15 @@ def liked_artists_view(page):
                 flash('Nenhum artista selecionado para remoção.', 'warning')
             return redirect(url_for('liked_artists_view', page=page))
 
-        # Obter artistas curtidos da API do Spotify
-        liked_artists_data = sp_handler.sp.current_user_followed_artists(limit=limit)
-        liked_artists = liked_artists_data['artists']['items']
-
-        # Calcular o total de artistas
-        total_artists_count = liked_artists_data['artists']['total']
-        total_pages = (total_artists_count // limit) + (total_artists_count % limit > 0)
-
-        # Filtrar artistas com base na busca
+        # Índice com todos os artistas seguidos: filtro e ordenação valem para a lista inteira
+        index = sp_handler.get_artist_index()
         artist_search = request.args.get('artist', '').strip()
-        if artist_search:
-            liked_artists = [
-                artist for artist in liked_artists
-                if artist_search.lower() in artist['name'].lower()  # Filtrar pelos nomes dos artistas
-            ]
-
-        # Lógica de ordenação
-        sort_option = request.args.get('sort')
-        if sort_option:
-            if sort_option == 'name_asc':
-                liked_artists.sort(key=lambda artist: artist['name'])  # Ordenar por nome A-Z
-            elif sort_option == 'name_desc':
-                liked_artists.sort(key=lambda artist: artist['name'], reverse=True)  # Z-A
-
-        return render_template('liked_artists.html', artists=liked_artists, page=page, total_pages=total_pages)
+        artists, total_pages = index.page(request.args.get('sort'), page, limit, artist_search)
+
+        return render_template(
+            'liked_artists.html', artists=artists, page=page, total_pages=total_pages,
+            next_cursor=next_page_cursor(index, artists, page, limit, total_pages)
+        )
 
     except SpotifyHandlerError as e:
         logger.error(f"Erro ao recuperar artistas curtidos: {e}")
@@ -367,6 +427,282 @@ def liked_artists_view(page):
         flash('Erro inesperado ao recuperar artistas curtidos.', 'error')
         return redirect(url_for('dashboard'))
 
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Progresso, resultados parciais e erros de um job em segundo plano."""
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return jsonify({'error': 'Sessão inválida.'}), 401
+
+    job = get_job_queue().get(job_id, sp_handler.get_user_id())
+    if job is None:
+        return jsonify({'error': 'Job não encontrado.'}), 404
+    return jsonify(job)
+
+@app.route('/duplicates', methods=['GET', 'POST'])
+@login_required
+def duplicates():
+    """Mostra a última busca por duplicadas e aplica as remoções selecionadas."""
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+
+    if request.method == 'POST':
+        track_ids = request.form.getlist('track_ids')
+        # Cada ocorrência em playlist chega como "playlist_id|posição|uri"
+        playlist_items = {}
+        for value in request.form.getlist('playlist_items'):
+            playlist_id, position, uri = value.split('|', 2)
+            playlist_items.setdefault(playlist_id, []).append({'uri': uri, 'position': int(position)})
+        if not track_ids and not playlist_items:
+            flash('Nenhuma duplicada selecionada para remoção.', 'warning')
+            return redirect(url_for('duplicates'))
+        return enqueue_job(
+            sp_handler, 'remove_duplicates', {'track_ids': track_ids, 'playlist_items': playlist_items},
+            'duplicates', 'Removendo duplicadas em segundo plano...'
+        )
+
+    job_id = session.get('last_jobs', {}).get('find_duplicates')
+    job = get_job_queue().get(job_id, sp_handler.get_user_id()) if job_id else None
+    return render_template('duplicates.html', job=job)
+
+@app.route('/duplicates/scan', methods=['POST'])
+@login_required
+def scan_duplicates():
+    """Enfileira a busca por duplicadas nas músicas curtidas e playlists."""
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+    return enqueue_job(
+        sp_handler, 'find_duplicates', {}, 'duplicates', 'Procurando duplicadas na sua biblioteca...'
+    )
+
+@app.route('/playlists/overlap')
+@login_required
+def playlist_overlap():
+    """Mostra a última varredura das playlists: as contidas em outra e as faixas repetidas entre elas."""
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+
+    job_id = session.get('last_jobs', {}).get('scan_playlists')
+    job = get_job_queue().get(job_id, sp_handler.get_user_id()) if job_id else None
+    return render_template('playlist_overlap.html', job=job)
+
+@app.route('/playlists/overlap/scan', methods=['POST'])
+@login_required
+def scan_playlists():
+    """Enfileira a varredura do conteúdo das playlists (só as alteradas são relidas)."""
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+    # Percentual da playlist que precisa estar em outra, entre 50% e 100%
+    threshold = min(max(request.form.get('threshold', 90, type=int), 50), 100) / 100
+    min_playlists = max(request.form.get('min_playlists', 2, type=int), 2)
+    return enqueue_job(
+        sp_handler, 'scan_playlists', {'threshold': threshold, 'min_playlists': min_playlists},
+        'playlist_overlap', 'Lendo o conteúdo das suas playlists...'
+    )
+
+@app.route('/cleanup', methods=['GET', 'POST'])
+@login_required
+def cleanup():
+    """Limpeza das músicas curtidas por regras.
+
+    GET com regras mostra a prévia (dry-run): quantas músicas sairiam, por regra e por
+    artista, e uma amostra delas; com fetch, a prévia volta em JSON. POST reavalia as
+    regras sobre o snapshot sincronizado e remove as músicas em lote.
+    """
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+
+    source = request.form if request.method == 'POST' else request.args
+    try:
+        rules, match = parse_rules(source)
+    except ValueError as e:
+        if wants_json():
+            return jsonify({'error': str(e)}), 400
+        flash(str(e), 'error')
+        return render_template('cleanup.html', plan=None, rules=RULES, match=MATCH_ALL)
+
+    if request.method == 'POST':
+        form = {key: value for key, value in request.form.items() if key != 'expected'}
+        if not rules:
+            flash('Nenhuma regra de limpeza definida.', 'warning')
+            return redirect(url_for('cleanup'))
+        try:
+            plan = sp_handler.plan_cleanup(rules, match, sync=True)
+        except SpotifyHandlerError as e:
+            logger.error(f"Erro ao planejar a limpeza: {e}")
+            flash('Erro ao avaliar as regras de limpeza.', 'error')
+            return redirect(url_for('cleanup', **form))
+
+        # A biblioteca pode ter mudado desde a prévia: só remove o que o usuário viu
+        expected = request.form.get('expected', type=int)
+        if expected is not None and expected != plan['matched']:
+            flash(f"A biblioteca mudou desde a prévia: agora {plan['matched']} músicas atendem às regras. "
+                  "Confira antes de remover.", 'warning')
+            return redirect(url_for('cleanup', **form))
+
+        track_ids = plan['track_ids']
+        if not track_ids:
+            flash('Nenhuma música atende às regras.', 'warning')
+            return redirect(url_for('cleanup', **form))
+        if len(track_ids) > Config.JOB_TRACK_THRESHOLD:
+            return enqueue_job(
+                sp_handler, 'remove_tracks', {'track_ids': track_ids}, 'cleanup',
+                f'Removendo {len(track_ids)} músicas em segundo plano...'
+            )
+        try:
+            report = sp_handler.remove_liked_tracks(track_ids=track_ids)
+            flash_bulk_report(report, f'{len(track_ids)} músicas removidas com sucesso!')
+        except SpotifyHandlerError as e:
+            logger.error(f"Erro ao aplicar a limpeza: {e}")
+            flash('Erro ao remover as músicas.', 'error')
+        return redirect(url_for('cleanup'))
+
+    plan = None
+    if rules:
+        try:
+            plan = sp_handler.plan_cleanup(rules, match)
+        except SpotifyHandlerError as e:
+            logger.error(f"Erro ao planejar a limpeza: {e}")
+            if wants_json():
+                return jsonify({'error': 'Erro ao avaliar as regras de limpeza.'}), 502
+            flash('Erro ao avaliar as regras de limpeza.', 'error')
+
+    if wants_json():
+        # A prévia não leva a lista completa de IDs: a remoção reavalia as regras
+        return jsonify({key: value for key, value in (plan or {}).items() if key != 'track_ids'})
+    return render_template('cleanup.html', plan=plan, rules=RULES, match=match)
+
+# Filtros por campo aceitos na API JSON, além de `q` (todos os campos)
+API_FIELD_FILTERS = {'tracks': ('name', 'artist', 'album'), 'artists': (), 'playlists': ()}
+
+@app.route('/api/v1/<collection>')
+@login_required
+def library_api(collection):
+    """API JSON da biblioteca (tracks, artists ou playlists), paginada por cursor.
+
+    Parâmetros: `cursor` (da resposta anterior), `limit`, `fields` (projeção, separados
+    por vírgula), `sort`, `q` e, para músicas, `name`, `artist` e `album`. As respostas
+    saem comprimidas (br/gzip) e com ETag derivado da versão do snapshot: enquanto a
+    biblioteca não muda, a mesma URL responde 304.
+    """
+    if collection not in FIELDS:
+        return jsonify({'error': f'Coleção desconhecida: {collection}'}), 404
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return jsonify({'error': 'Sessão inválida.'}), 401
+
+    cursor = request.args.get('cursor')
+    try:
+        fields = parse_fields(collection, request.args.get('fields'))
+        limit = page_limit(request.args.get('limit'))
+        # Só a primeira página sincroniza as músicas curtidas; as seguintes leem o snapshot
+        if collection == 'tracks':
+            index = sp_handler.get_track_index(sync=not cursor)
+        elif collection == 'artists':
+            index = sp_handler.get_artist_index()
+        else:
+            index = sp_handler.get_playlist_index()
+
+        etag = library_etag(sp_handler.get_user_id(), collection, index.version)
+        cached = not_modified(etag)
+        if cached is not None:
+            return cached
+        filters = {field: request.args.get(field) for field in API_FIELD_FILTERS[collection]}
+        items = index.filter(request.args.get('sort'), request.args.get('q'), **filters)
+        return json_response(api_page(items, cursor, limit, fields, index.version), etag)
+    except ApiError as e:
+        return jsonify({'error': str(e)}), 400
+    except SpotifyHandlerError as e:
+        logger.error(f"Erro na API da biblioteca ({collection}): {e}")
+        return jsonify({'error': 'Erro ao ler a biblioteca.'}), 502
+
+# Campos devolvidos pela busca JSON, por tipo de coleção
+SEARCH_RESULT_FIELDS = {
+    'tracks': ('id', 'name', 'artists', 'album_name', 'image'),
+    'artists': ('id', 'name', 'image'),
+    'playlists': ('id', 'name', 'owner', 'image'),
+}
+
+@app.route('/search')
+@login_required
+def search():
+    """Busca na biblioteca do usuário enquanto ele digita (sem acentos, por substring).
+
+    Parâmetros: `q` (busca em todos os campos), `artist` (só para músicas),
+    `type` (tracks, artists ou playlists) e `limit`.
+    """
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return jsonify({'error': 'Sessão inválida.'}), 401
+
+    kind = request.args.get('type', 'tracks')
+    if kind not in SEARCH_RESULT_FIELDS:
+        return jsonify({'error': f'Tipo de busca inválido: {kind}'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    query = request.args.get('q', '')
+
+    try:
+        if kind == 'tracks':
+            index = sp_handler.get_track_index(sync=False)
+            items, total = index.ranked(query, limit, artist=request.args.get('artist'))
+        elif kind == 'artists':
+            items, total = sp_handler.get_artist_index().ranked(query, limit)
+        else:
+            items, total = sp_handler.get_playlist_index().ranked(query, limit)
+    except SpotifyHandlerError as e:
+        logger.error(f"Erro na busca: {e}")
+        return jsonify({'error': 'Erro ao buscar na biblioteca.'}), 502
+
+    fields = SEARCH_RESULT_FIELDS[kind]
+    return jsonify({
+        'query': query, 'type': kind, 'total': total,
+        'results': [{field: item.get(field) for field in fields} for item in items],
+    })
+
+@app.route('/export/<collection>')
+@login_required
+def export_library(collection):
+    """Exporta músicas curtidas, artistas seguidos ou playlists em NDJSON ou CSV.
+
+    A resposta é gerada em streaming, página a página: a memória fica constante e os
+    primeiros bytes saem antes de a biblioteca inteira ser lida. Com `items=1`, as
+    playlists saem com suas faixas.
+    """
+    sp_handler = get_spotify_handler()
+    if not sp_handler:
+        return redirect(url_for('login'))
+
+    fmt = request.args.get('format', 'ndjson')
+    if collection not in COLUMNS or collection == 'playlist_items' or fmt not in FORMATS:
+        return jsonify({'error': 'Coleção ou formato de exportação inválido.'}), 400
+    with_items = collection == 'playlists' and request.args.get('items') == '1'
+
+    filename = f"spoticlean-{collection}-{time.strftime('%Y%m%d')}.{fmt}"
+    return Response(
+        stream_with_context(export_chunks(sp_handler, collection, fmt, with_items)),
+        mimetype=FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+@app.route('/cache_stats')
+@login_required
+def cache_stats():
+    """Contadores de acerto/erro dos caches do processo, para dimensionamento."""
+    return jsonify({'artists': artist_cache.stats()})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métricas do processo no formato do Prometheus (rotas, chamadas ao Spotify, caches e jobs)."""
+    if Config.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {Config.METRICS_TOKEN}':
+        return Response('Não autorizado.\n', status=401, mimetype='text/plain')
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/logout', methods=['POST'])
 def logout():
     spotify_handler = SpotifyHandler()
@@ -377,5 +713,8 @@ def logout():
     flash('Você foi desconectado com sucesso!', 'success')
     return redirect(url_for('home'))
 
+# Cada processo (ex.: worker do gunicorn) consome a fila de jobs compartilhada
+get_job_queue().start()
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=8080, debug=True)
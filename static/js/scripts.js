@@ -1,213 +1,319 @@
+// Acompanha um job em segundo plano (remoções em lote, criação de playlists grandes)
+function pollJob(jobId, onUpdate, interval = 1500) {
+    return fetch(`/jobs/${jobId}`, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(job => {
+            onUpdate(job);
+            if (job.status === 'queued' || job.status === 'running') {
+                setTimeout(() => pollJob(jobId, onUpdate, interval), interval);
+            }
+            return job;
+        });
+}
+
 document.addEventListener('DOMContentLoaded', function () {
-    loadTracks(); // Carregar a lista de todas as músicas ao iniciar
-    loadLikedTracks(); // Carregar faixas curtidas quando a página é carregada
-
-    // Função para atualizar a lista de artistas
-    function updateArtistNames() {
-        const artistItems = document.querySelectorAll('.artist-item');
-        const artistNames = Array.from(artistItems).map(item => item.textContent.replace('Excluir', '').trim());
-        document.getElementById('artist_names').value = artistNames.join(',');
-
-        // Exibe a lista se houver artistas
-        const artistList = document.getElementById('artist-list');
-        artistList.classList.toggle('d-none', artistItems.length === 0);
+    const jobStatus = document.getElementById('job-status');
+    if (!jobStatus) {
+        return;
     }
 
-    // Adiciona novo artista
-    document.getElementById('add-artist-btn').addEventListener('click', function () {
-        const artistInput = document.getElementById('artist_name');
-        const artistName = artistInput.value.trim(); // Captura o valor do input de artista
-
-        if (artistName) {
-            const artistList = document.getElementById('artist-list');
-
-            const artistItem = document.createElement('div');
-            artistItem.classList.add('artist-item', 'mb-2', 'text-white');
-            artistItem.textContent = artistName;
-
-            // Botão para remover o artista da lista
-            const deleteButton = document.createElement('button');
-            deleteButton.textContent = 'Excluir';
-            deleteButton.classList.add('btn', 'btn-danger', 'btn-sm', 'ms-2');
-            deleteButton.addEventListener('click', function () {
-                artistList.removeChild(artistItem); // Remove o artista
-                updateArtistNames(); // Atualiza a lista oculta
-            });
-
-            artistItem.appendChild(deleteButton);
-            artistList.appendChild(artistItem); // Adiciona o artista à lista
+    pollJob(jobStatus.dataset.jobId, function (job) {
+        const done = job.progress ? job.progress.done : 0;
+        const total = job.progress ? job.progress.total : 0;
+        const failed = job.result && job.result.failed ? Object.keys(job.result.failed).length : 0;
 
-            updateArtistNames(); // Atualiza a lista de artistas
-            artistInput.value = ''; // Limpa o campo de entrada
+        if (job.error && !job.status) {
+            jobStatus.className = 'alert alert-danger';
+            jobStatus.textContent = job.error;
+        } else if (job.status === 'done') {
+            jobStatus.className = failed ? 'alert alert-warning' : 'alert alert-success';
+            jobStatus.textContent = failed
+                ? `Concluído: ${done - failed} itens processados, ${failed} falharam.`
+                : `Concluído: ${done} itens processados.`;
+            // Recarrega a página sem o parâmetro do job para mostrar a lista atualizada
+            setTimeout(() => { window.location.href = window.location.pathname; }, 1500);
+        } else if (job.status === 'failed') {
+            jobStatus.className = 'alert alert-danger';
+            jobStatus.textContent = `Erro: ${job.error}`;
         } else {
-            alert('Por favor, digite um nome de artista.');
+            jobStatus.textContent = total ? `Processando... ${done} de ${total}` : 'Na fila...';
         }
+    }).catch(error => {
+        console.error('Erro ao consultar o job:', error);
     });
+});
 
-    // Função para carregar a lista de todas as músicas
-    function loadTracks() {
-        fetch('/update_tracks')
-            .then(response => response.json())
-            .then(data => {
-                const trackList = document.getElementById('track-list'); // Lista de todas as músicas
-                trackList.innerHTML = ''; // Limpa a lista antes de adicionar
-
-                data.tracks.forEach(track => {
-                    const trackItem = document.createElement('div');
-                    trackItem.className = 'form-check';
-                    trackItem.innerHTML = `
-                        <input type="checkbox" class="form-check-input" id="track-${track.id}" data-track-id="${track.id}">
-                        <label class="form-check-label" for="track-${track.id}">${track.name} - ${track.artist}</label>
-                    `;
-                    trackList.appendChild(trackItem);
-                });
+// Prévia da limpeza por regras, atualizada enquanto o usuário ajusta as regras
+document.addEventListener('DOMContentLoaded', function () {
+    const form = document.getElementById('cleanup-form');
+    if (!form) {
+        return;
+    }
+
+    const preview = document.getElementById('cleanup-preview');
+    const applyForm = document.getElementById('cleanup-apply');
+    let timer = null;
+    let controller = null;
+
+    function escapeHtml(text) {
+        const element = document.createElement('span');
+        element.textContent = text == null ? '' : String(text);
+        return element.innerHTML;
+    }
+
+    function renderPreview(plan, params) {
+        if (!plan.total && plan.total !== 0) {
+            preview.classList.add('d-none');
+            return;
+        }
+        preview.classList.remove('d-none');
+        document.getElementById('cleanup-summary').textContent =
+            `${plan.matched} de ${plan.total} músicas seriam removidas (${plan.kept} ficam).`;
+        document.getElementById('cleanup-rule-counts').innerHTML = Object.entries(plan.rules)
+            .map(([rule, count]) => {
+                const label = form.querySelector(`label[for="${rule}"]`);
+                return `<li>${escapeHtml(label ? label.textContent : rule)}: ${count} músicas</li>`;
             })
-            .catch(error => {
-                console.error('Erro ao carregar a lista de músicas:', error);
-                alert('Erro ao carregar a lista de músicas.');
-            });
+            .join('');
+        document.getElementById('cleanup-artists').textContent = plan.artists.length
+            ? 'Mais afetados: ' + plan.artists.map(([name, count]) => `${name} (${count})`).join(', ')
+            : '';
+        document.getElementById('cleanup-tracks').innerHTML = plan.tracks
+            .map(track => `
+                <div class="list-group-item bg-transparent text-white border-secondary p-2 mb-2">
+                    <strong>${escapeHtml(track.name)}</strong>
+                    <small class="text-muted">${escapeHtml(track.artist)} · curtida em ${escapeHtml((track.added_at || '').slice(0, 10))}</small>
+                </div>`)
+            .join('');
+
+        // O formulário de remoção leva as mesmas regras e a contagem que o usuário viu
+        applyForm.querySelectorAll('input[type="hidden"]').forEach(input => {
+            input.value = input.name === 'expected' ? plan.matched : (params.get(input.name) || '');
+        });
     }
 
-    // Função para carregar as faixas curtidas
-    function loadLikedTracks() {
-        fetch('/liked_tracks')
-            .then(response => response.json())
-            .then(tracks => {
-                const likedTrackList = document.getElementById('liked-track-list'); // Lista de faixas curtidas
-                likedTrackList.innerHTML = ''; // Limpa a lista antes de adicionar as faixas
-
-                tracks.forEach(track => {
-                    const trackItem = document.createElement('div');
-                    trackItem.className = 'track-item d-flex justify-content-between align-items-center mb-2';
-                    trackItem.innerHTML = `
-                        <input type="checkbox" class="track-checkbox" data-track-id="${track.id}">
-                        <span>${track.name} - ${track.artist}</span>
-                        <button class="btn btn-danger btn-sm" data-track-id="${track.id}">Remover</button>
-                    `;
-                    likedTrackList.appendChild(trackItem);
-                });
-
-                // Adiciona funcionalidade ao botão "Remover"
-                const removeButtons = document.querySelectorAll('.btn-danger');
-                removeButtons.forEach(button => {
-                    button.addEventListener('click', function () {
-                        const trackId = this.getAttribute('data-track-id');
-                        removeTrack(trackId);
-                    });
-                });
+    function updatePreview() {
+        const params = new URLSearchParams(new FormData(form));
+        if (controller) {
+            controller.abort(); // Descarta a prévia anterior, se ainda estiver em andamento
+        }
+        controller = new AbortController();
+        fetch(`${form.action}?${params}`, { headers: { 'Accept': 'application/json' }, signal: controller.signal })
+            .then(response => response.json().then(plan => ({ ok: response.ok, plan })))
+            .then(({ ok, plan }) => {
+                if (!ok) {
+                    document.getElementById('cleanup-summary').textContent = plan.error || 'Erro ao avaliar as regras.';
+                    preview.classList.remove('d-none');
+                    return;
+                }
+                renderPreview(plan, params);
+                history.replaceState(null, '', `${form.action}?${params}`);
             })
             .catch(error => {
-                console.error('Erro ao carregar as faixas curtidas:', error);
-                alert('Erro ao carregar as faixas curtidas.');
+                if (error.name !== 'AbortError') {
+                    console.error('Erro ao atualizar a prévia da limpeza:', error);
+                }
             });
     }
 
-    // Desmarca todos os checkboxes
-    document.getElementById('deselect-all').addEventListener('click', function () {
-        const checkboxes = document.querySelectorAll('#track-list input[type="checkbox"]');
-        checkboxes.forEach(checkbox => {
-            checkbox.checked = false; // Desmarca todos
-        });
+    form.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(updatePreview, 250);
+    });
+    form.addEventListener('submit', function (event) {
+        event.preventDefault();
+        updatePreview();
     });
+});
+
+// Rolagem infinita nas listas da biblioteca: as próximas páginas vêm da API JSON (/api/v1)
+document.addEventListener('DOMContentLoaded', function () {
+    const list = document.querySelector('.scrollable-list[data-api-url]');
+    if (!list || !list.dataset.nextCursor || !('IntersectionObserver' in window)) {
+        return; // Sem próxima página (ou navegador antigo): fica a paginação normal
+    }
+
+    function escapeHtml(text) {
+        const element = document.createElement('span');
+        element.textContent = text == null ? '' : String(text);
+        return element.innerHTML;
+    }
+
+    // Mesma marcação dos templates, por coleção
+    const renderers = {
+        tracks: track => `
+            <div class="track-item list-group-item bg-transparent text-white border-secondary d-flex justify-content-between align-items-center p-2 mb-2">
+                <div class="d-flex align-items-center">
+                    <img src="${escapeHtml(track.image)}" alt="Capa de ${escapeHtml(track.name)}" class="rounded shadow-sm mr-3" style="width: 50px; height: 50px; object-fit: cover; border: 1px solid var(--color-bg-base);">
+                    <span class="text-start">
+                        <strong>${escapeHtml(track.name)}</strong> <br>
+                        <small class="text-muted">${escapeHtml(track.artist)}</small>
+                    </span>
+                </div>
+                <input type="checkbox" name="track_ids" value="${escapeHtml(track.id)}" aria-label="Selecionar ${escapeHtml(track.name)}" style="transform: scale(1.3);">
+            </div>`,
+        artists: artist => `
+            <div class="artist-item list-group-item bg-transparent text-white border-secondary d-flex justify-content-between align-items-center p-2 mb-2">
+                <div class="d-flex align-items-center">
+                    <img src="${escapeHtml(artist.image)}" alt="Foto de ${escapeHtml(artist.name)}" class="rounded-circle mr-3 shadow-sm" style="width: 50px; height: 50px; object-fit: cover; border: 2px solid var(--color-bg-base);">
+                    <span class="text-start font-weight-bold">${escapeHtml(artist.name)}</span>
+                </div>
+                <input type="checkbox" name="artist_ids" value="${escapeHtml(artist.id)}" style="transform: scale(1.3);">
+            </div>`,
+        playlists: playlist => `
+            <div class="playlist-item list-group-item bg-transparent text-white border-secondary d-flex justify-content-between align-items-center p-2 mb-2">
+                <div class="d-flex align-items-center">
+                    <img src="${escapeHtml(playlist.image)}" alt="Capa da Playlist ${escapeHtml(playlist.name)}" class="rounded shadow-sm mr-3" style="width: 50px; height: 50px; object-fit: cover; border: 1px solid var(--color-bg-base);">
+                    <span class="text-start">
+                        <strong>${escapeHtml(playlist.name)}</strong> <br>
+                        <small class="text-muted">${playlist.tracks_total} músicas${playlist.owner ? ' · ' + escapeHtml(playlist.owner) : ''}</small>
+                    </span>
+                </div>
+                <input type="checkbox" name="playlist_ids" value="${escapeHtml(playlist.id)}" aria-label="Selecionar ${escapeHtml(playlist.name)}" style="transform: scale(1.3);">
+            </div>`,
+    };
+    const render = renderers[list.dataset.collection];
+    let cursor = list.dataset.nextCursor;
+    let loading = false;
 
-    // Adiciona funcionalidade ao botão de "Remover"
-    document.getElementById('remove-selected-btn').addEventListener('click', function () {
-        const checkboxes = document.querySelectorAll('#track-list input[type="checkbox"]:checked');
-        const trackIds = Array.from(checkboxes).map(checkbox => checkbox.dataset.trackId);
+    const pagination = document.querySelector('.pagination');
+    if (pagination) {
+        pagination.classList.add('d-none');
+    }
+    const sentinel = document.createElement('div');
+    sentinel.className = 'text-center text-muted small py-2';
+    sentinel.textContent = 'Carregando...';
+    list.appendChild(sentinel);
 
-        if (trackIds.length === 0) {
-            alert('Nenhuma música selecionada.');
+    const observer = new IntersectionObserver(entries => {
+        if (!entries[0].isIntersecting || loading || !cursor) {
             return;
         }
-
-        if (confirm(`Tem certeza que deseja remover ${trackIds.length} músicas?`)) {
-            fetch('/liked_tracks', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/x-www-form-urlencoded'
-                },
-                body: new URLSearchParams({
-                    'track_ids': trackIds.join(',')
-                })
+        loading = true;
+        const url = new URL(list.dataset.apiUrl, window.location.origin);
+        url.searchParams.set('cursor', cursor);
+        fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
             })
-                .then(response => {
-                    if (response.ok) {
-                        loadTracks(); // Recarrega a lista de músicas
-                    } else {
-                        alert('Erro ao remover músicas selecionadas.');
-                    }
-                })
-                .catch(error => {
-                    console.error('Erro ao remover músicas selecionadas:', error);
-                    alert('Erro ao remover músicas selecionadas.');
-                });
+            .then(data => {
+                sentinel.insertAdjacentHTML('beforebegin', data.items.map(render).join(''));
+                cursor = data.next_cursor;
+                if (!cursor) {
+                    observer.disconnect();
+                    sentinel.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Erro ao carregar mais itens:', error);
+                observer.disconnect();
+                sentinel.remove();
+                if (pagination) {
+                    pagination.classList.remove('d-none'); // Volta para a paginação por página
+                }
+            })
+            .finally(() => { loading = false; });
+    }, { root: list, rootMargin: '200px' });
+    observer.observe(sentinel);
+});
+
+// Estado do carregamento da biblioteca iniciado no login, exibido no dashboard
+document.addEventListener('DOMContentLoaded', function () {
+    const libraryStatus = document.getElementById('library-status');
+    if (!libraryStatus || !['queued', 'running'].includes(libraryStatus.dataset.status)) {
+        return;
+    }
+
+    pollJob(libraryStatus.dataset.jobId, function (job) {
+        const failed = job.result && job.result.failed ? Object.keys(job.result.failed).length : 0;
+        if (job.status === 'done' && !failed) {
+            libraryStatus.className = 'small mb-0 text-success';
+            libraryStatus.innerHTML = '<i class="fas fa-check-circle mr-1"></i>Biblioteca carregada.';
+        } else if (job.status === 'done' || job.status === 'failed') {
+            libraryStatus.textContent = 'Parte da biblioteca será carregada ao abrir cada página.';
+        } else if (job.progress && job.progress.total) {
+            libraryStatus.innerHTML = '<i class="fas fa-sync fa-spin mr-1"></i>Carregando sua biblioteca em segundo plano... '
+                + `(${job.progress.done} de ${job.progress.total})`;
         }
+    }, 1000).catch(error => {
+        console.error('Erro ao consultar o carregamento da biblioteca:', error);
     });
+});
 
-    // Cria a playlist
-    document.getElementById('create-playlist-btn').addEventListener('click', function () {
-        const playlistName = document.getElementById('playlist_name').value.trim();
-        const artistNames = document.getElementById('artist_names').value.trim();
+// Estatísticas da biblioteca no dashboard, carregadas depois da página
+document.addEventListener('DOMContentLoaded', function () {
+    const panel = document.getElementById('library-stats');
+    if (!panel) {
+        return;
+    }
 
-        // Verificação de campos obrigatórios
-        if (!playlistName) {
-            alert('Por favor, insira um nome para a playlist.');
-            return;
-        }
+    function escapeHtml(text) {
+        const element = document.createElement('span');
+        element.textContent = text == null ? '' : String(text);
+        return element.innerHTML;
+    }
 
-        if (!artistNames) {
-            alert('Por favor, adicione pelo menos um artista à playlist.');
-            return;
+    function renderList(id, items) {
+        document.getElementById(id).innerHTML = items
+            .map(item => `<li>${escapeHtml(item.name)} <span class="text-muted">(${item.tracks})</span></li>`)
+            .join('');
+    }
+
+    function renderPlaylists(overlap) {
+        const container = document.getElementById('stats-playlists');
+        container.innerHTML = `<p class="mb-1">${overlap.in_playlists} curtidas estão em alguma playlist; `
+            + `${overlap.only_liked} só na lista de curtidas.</p>`
+            + overlap.playlists
+                .map(playlist => `<div>${escapeHtml(playlist.name)} <span class="text-muted">`
+                    + `(${playlist.liked} de ${playlist.tracks} músicas curtidas)</span></div>`)
+                .join('');
+    }
+
+    function render(stats) {
+        panel.classList.remove('d-none');
+        document.getElementById('stats-totals').textContent =
+            `${stats.total} músicas curtidas de ${stats.artists_total} artistas e ${stats.albums_total} álbuns.`;
+        renderList('stats-recent-artists', stats.recent_artists);
+        renderList('stats-top-artists', stats.top_artists);
+        renderList('stats-top-albums', stats.top_albums);
+
+        // Últimos 24 meses, em barras proporcionais ao mês com mais curtidas
+        const months = stats.months.slice(-24);
+        const peak = Math.max(1, ...months.map(month => month.tracks));
+        document.getElementById('stats-months').innerHTML = months
+            .map(month => `<div class="flex-fill mx-1 bg-success" title="${month.month}: ${month.tracks}" `
+                + `style="height: ${Math.max(2, Math.round(month.tracks / peak * 100))}%;"></div>`)
+            .join('');
+        if (stats.playlists) {
+            renderPlaylists(stats.playlists);
         }
+    }
 
-        // Enviar requisição ao servidor para criar a playlist
-        fetch('/create_playlist', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/x-www-form-urlencoded'
-            },
-            body: new URLSearchParams({
-                'playlist_name': playlistName,
-                'artist_names': artistNames
-            })
-        })
-            .then(response => {
-                if (response.ok) {
-                    alert('Playlist criada com sucesso!');
-                    // Limpa o formulário
-                    document.getElementById('playlist_name').value = ''; // Limpa o campo de nome
-                    document.getElementById('artist_names').value = ''; // Limpa a lista de artistas
-                    document.getElementById('artist-list').innerHTML = ''; // Limpa a lista visual
-                } else {
-                    alert('Erro ao criar a playlist.');
+    function load(url) {
+        return fetch(url, { headers: { 'Accept': 'application/json' } })
+            .then(response => response.json().then(stats => ({ ok: response.ok, stats })))
+            .then(({ ok, stats }) => {
+                if (!ok) {
+                    throw new Error(stats.error);
                 }
-            })
-            .catch(error => {
-                console.error('Erro ao criar a playlist:', error);
-                alert('Erro ao criar a playlist.');
+                render(stats);
             });
+    }
+
+    load(panel.dataset.url).catch(error => {
+        console.error('Erro ao carregar as estatísticas:', error);
     });
 
-    // Função para remover uma faixa
-    function removeTrack(trackId) {
-        fetch('/liked_tracks', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/x-www-form-urlencoded'
-            },
-            body: new URLSearchParams({
-                'track_ids': trackId // Passa o ID da faixa a ser removida
-            })
-        }).then(response => {
-            if (response.ok) {
-                alert('Música removida com sucesso!');
-                loadLikedTracks(); // Recarrega a lista de faixas após a remoção
-            } else {
-                alert('Erro ao remover a música.');
-            }
-        }).catch(error => {
-            console.error('Erro ao remover a música:', error);
-            alert('Erro ao remover a música.');
+    document.getElementById('stats-overlap').addEventListener('click', function () {
+        this.disabled = true;
+        this.textContent = 'Lendo as playlists...';
+        load(`${panel.dataset.url}?overlap=1`).catch(error => {
+            console.error('Erro ao calcular a sobreposição com playlists:', error);
+            this.textContent = 'Erro ao ler as playlists. Tente novamente.';
+            this.disabled = false;
         });
-    }
-});
\ No newline at end of file
+    });
+});
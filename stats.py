@@ -0,0 +1,219 @@
+# stats.py
+import logging
+import threading
+import time
+import numpy as np
+from config import Config
+
+# Configuração do logger
+logger = logging.getLogger(__name__)
+
+# Artistas, álbuns e playlists listados em cada ranking do resumo
+TOP_SIZE = 10
+# Máximo de sementes aceito pelas recomendações do Spotify
+SEED_LIMIT = 5
+# Segundos por dia (as datas de curtida ficam em dias, como float)
+DAY = 86400
+
+
+class Codes:
+    """Códigos inteiros sequenciais para artistas ou álbuns, com o ID e o nome exibido.
+
+    Itens sem ID (faixas locais) são agrupados pelo nome e ficam com ID None.
+    """
+
+    def __init__(self):
+        self.codes = {}
+        self.ids = []
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, item_id, name):
+        key = item_id or (None, name)
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.names)
+            self.ids.append(item_id)
+            self.names.append(name or '')
+        return code
+
+
+def _top(values, limit, codes, tiebreak=None):
+    """Posições dos `limit` maiores valores positivos, em ordem decrescente.
+
+    Empates são desfeitos por `tiebreak` (também decrescente), se informado, e depois
+    pelo nome e ID em `codes`: o ranking não depende da ordem em que os códigos foram
+    criados, então as colunas atualizadas aos poucos dão o mesmo resultado que as
+    montadas do zero.
+    """
+    candidates = np.flatnonzero(values > 0)
+    if limit < len(candidates):
+        # Entram todos os empatados com o último colocado, para o desempate escolher
+        threshold = np.partition(values[candidates], -limit)[-limit]
+        candidates = candidates[values[candidates] >= threshold]
+
+    def key(code):
+        return -values[code], -tiebreak[code] if tiebreak is not None else 0, codes.names[code], codes.ids[code] or ''
+
+    return sorted(candidates, key=key)[:limit]
+
+
+class LibraryStats:
+    """Agregados das músicas curtidas em colunas NumPy, mantidos de forma incremental.
+
+    Cada música é uma linha (data da curtida, mês, álbum); os artistas ficam como pares
+    achatados (linha, código do artista), como em cleanup.TrackColumns. Curtidas novas
+    viram linhas no fim das colunas e remoções só desligam a linha em `alive`, então a
+    biblioteca não é relida a cada mudança. Os rankings são calculados com bincount
+    sobre as linhas vivas e guardados até a próxima mudança.
+    """
+
+    def __init__(self, tracks, half_life_days=None):
+        self.half_life = half_life_days or Config.STATS_RECENCY_HALF_LIFE
+        self.artists = Codes()
+        self.albums = Codes()
+        self.rows = {}  # ID da música -> linha
+        self.ids = []  # linha -> ID da música
+        self.alive = np.zeros(0, dtype=bool)
+        self.added = np.zeros(0, dtype=np.float64)  # dias desde 1970
+        self.month = np.zeros(0, dtype=np.int32)  # meses desde 1970-01
+        self.album = np.zeros(0, dtype=np.int32)
+        self.artist_row = np.zeros(0, dtype=np.int32)
+        self.artist_code = np.zeros(0, dtype=np.int32)
+        self.version = 0  # Muda a cada curtida adicionada ou removida
+        self._summary = None
+        self._lock = threading.Lock()
+        self.add(tracks)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add(self, tracks):
+        """Acrescenta músicas curtidas (as que já estão nas colunas são ignoradas)."""
+        with self._lock:
+            tracks = [track for track in tracks if track.id not in self.rows]
+            if not tracks:
+                return
+            start = len(self.ids)
+            added_at = np.array([(track.added_at or '1970-01-01')[:19] for track in tracks], dtype='datetime64[s]')
+            artist_row, artist_code, album = [], [], []
+            for row, track in enumerate(tracks, start):
+                self.rows[track.id] = row
+                self.ids.append(track.id)
+                album.append(self.albums.code(track.album_id, track.album_name))
+                for artist_id, name in zip(track.artist_ids, track.artists):
+                    artist_row.append(row)
+                    artist_code.append(self.artists.code(artist_id, name))
+
+            self.alive = np.concatenate([self.alive, np.ones(len(tracks), dtype=bool)])
+            self.added = np.concatenate([self.added, added_at.astype(np.int64) / DAY])
+            self.month = np.concatenate([self.month, added_at.astype('datetime64[M]').astype(np.int32)])
+            self.album = np.concatenate([self.album, np.array(album, dtype=np.int32)])
+            self.artist_row = np.concatenate([self.artist_row, np.array(artist_row, dtype=np.int32)])
+            self.artist_code = np.concatenate([self.artist_code, np.array(artist_code, dtype=np.int32)])
+            self.version += 1
+
+    def remove(self, track_ids):
+        """Desliga as linhas das músicas removidas; compacta quando metade está desligada."""
+        with self._lock:
+            rows = [self.rows.pop(track_id) for track_id in track_ids if track_id in self.rows]
+            if not rows:
+                return
+            self.alive[rows] = False
+            self.version += 1
+            if len(self.rows) * 2 < len(self.ids):
+                self._compact()
+
+    def update(self, added, removed_ids):
+        self.remove(removed_ids)
+        self.add(added)
+
+    def _compact(self):
+        keep = np.flatnonzero(self.alive)
+        position = np.full(len(self.alive), -1, dtype=np.int32)
+        position[keep] = np.arange(len(keep), dtype=np.int32)
+        pairs = self.alive[self.artist_row]
+        self.artist_row = position[self.artist_row[pairs]]
+        self.artist_code = self.artist_code[pairs]
+        self.ids = [self.ids[row] for row in keep]
+        self.rows = {track_id: row for row, track_id in enumerate(self.ids)}
+        self.added, self.month, self.album = self.added[keep], self.month[keep], self.album[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+
+    def summary(self, limit=TOP_SIZE):
+        """Resumo da biblioteca: totais, artistas e álbuns mais curtidos, curtidas por mês
+        e artistas mais curtidos recentemente (peso que cai pela metade a cada
+        STATS_RECENCY_HALF_LIFE dias). Guardado até a próxima mudança ou a virada do dia.
+        """
+        now = time.time() / DAY
+        key = (self.version, int(now), limit)
+        cached = self._summary
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        with self._lock:
+            started = time.perf_counter()
+            alive = self.alive
+            pairs = alive[self.artist_row]
+            rows, codes = self.artist_row[pairs], self.artist_code[pairs]
+            artist_tracks = np.bincount(codes, minlength=len(self.artists))
+            weights = 0.5 ** (np.maximum(now - self.added, 0) / self.half_life)
+            artist_scores = np.bincount(codes, weights=weights[rows], minlength=len(self.artists))
+            album_tracks = np.bincount(self.album[alive], minlength=len(self.albums))
+            months, month_tracks = np.unique(self.month[alive], return_counts=True)
+
+            def artist(code):
+                return {
+                    'id': self.artists.ids[code], 'name': self.artists.names[code],
+                    'tracks': int(artist_tracks[code]), 'score': round(float(artist_scores[code]), 2),
+                }
+
+            recent = _top(artist_scores, limit, self.artists, artist_tracks)
+            result = {
+                'total': len(self.rows),
+                'artists_total': int(np.count_nonzero(artist_tracks)),
+                'albums_total': int(np.count_nonzero(album_tracks)),
+                'top_artists': [artist(code) for code in _top(artist_tracks, limit, self.artists, artist_scores)],
+                'recent_artists': [artist(code) for code in recent],
+                'top_albums': [
+                    {'id': self.albums.ids[code], 'name': self.albums.names[code], 'tracks': int(album_tracks[code])}
+                    for code in _top(album_tracks, limit, self.albums)
+                ],
+                'months': [
+                    {'month': str(np.datetime64(int(month), 'M')), 'tracks': int(count)}
+                    for month, count in zip(months, month_tracks)
+                ],
+                # Artistas de faixas locais não têm ID e não servem de semente
+                'seeds': [self.artists.ids[code] for code in recent if self.artists.ids[code]][:SEED_LIMIT],
+            }
+            result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            self._summary = (key, result)
+        logger.info(f"Estatísticas de {result['total']} músicas calculadas ({result['elapsed_ms']}ms).")
+        return result
+
+    def seeds(self):
+        """IDs dos artistas mais curtidos recentemente, para as recomendações do Spotify."""
+        return self.summary()['seeds']
+
+    def playlist_overlap(self, playlist_track_ids, limit=TOP_SIZE):
+        """Quantas curtidas estão em alguma playlist e as playlists com mais curtidas.
+
+        `playlist_track_ids` é {playlist_id: frozenset de IDs de faixas}.
+        """
+        liked = self.rows.keys()
+        in_playlists = frozenset().union(*playlist_track_ids.values()) if playlist_track_ids else frozenset()
+        overlap = sorted(
+            ((playlist_id, len(liked & track_ids), len(track_ids)) for playlist_id, track_ids in playlist_track_ids.items()),
+            key=lambda entry: entry[1], reverse=True
+        )
+        in_any = len(liked & in_playlists)
+        return {
+            'in_playlists': in_any,
+            'only_liked': len(self.rows) - in_any,
+            'playlists': [
+                {'id': playlist_id, 'liked': liked_count, 'tracks': total}
+                for playlist_id, liked_count, total in overlap[:limit] if liked_count
+            ],
+        }
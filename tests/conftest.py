@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# Os módulos do app ficam na raiz do repositório, sem pacote
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import Track  # noqa: E402
+
+
+@pytest.fixture
+def make_track():
+    """Fábrica de registros Track com valores padrão para os campos não informados."""
+    def make(track_id, name=None, artists=('Artista',), artist_ids=None, added_at='2024-01-01T00:00:00Z',
+             album_id=None, album_name=None, duration_ms=200000, explicit=False, isrc=None):
+        artists = tuple(artists)
+        return Track(
+            id=track_id, added_at=added_at, name=name or f'Música {track_id}', artists=artists,
+            artist_ids=tuple(artist_ids) if artist_ids is not None else tuple(f'id-{name}' for name in artists),
+            album_id=album_id, album_name=album_name, image=None, duration_ms=duration_ms,
+            explicit=explicit, isrc=isrc,
+        )
+    return make
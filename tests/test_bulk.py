@@ -0,0 +1,113 @@
+# tests/test_bulk.py
+import asyncio
+
+import pytest
+
+import bulk
+from bulk import chunked, run_bulk_async
+
+
+class Retryable(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(bulk, 'RETRY_BACKOFF', 0)
+
+
+def _run(call, ids, chunk_size=2, **kwargs):
+    kwargs.setdefault('is_retryable', lambda error: isinstance(error, Retryable))
+    return asyncio.run(run_bulk_async(call, ids, chunk_size, **kwargs))
+
+
+def test_chunked():
+    assert chunked(list('abcde'), 2) == [['a', 'b'], ['c', 'd'], ['e']]
+    assert chunked([], 2) == []
+
+
+def test_ids_are_deduplicated_and_chunked():
+    calls = []
+
+    async def call(chunk):
+        calls.append(chunk)
+
+    report = _run(call, ['a', 'b', '', 'a', 'c', None, 'd', 'e'])
+
+    assert sorted(calls) == [['a', 'b'], ['c', 'd'], ['e']]
+    assert report.succeeded == ['a', 'b', 'c', 'd', 'e']
+    assert report.failed == {}
+
+
+def test_retryable_failures_are_retried_once_recovered():
+    attempts = {}
+
+    async def call(chunk):
+        attempts[chunk[0]] = attempts.get(chunk[0], 0) + 1
+        if chunk[0] == 'c' and attempts['c'] < 3:
+            raise Retryable('429')
+
+    report = _run(call, list('abcd'), retries=2)
+
+    assert report.failed == {}
+    assert attempts == {'a': 1, 'c': 3}
+
+
+def test_retryable_failures_give_up_after_last_round():
+    attempts = []
+
+    async def call(chunk):
+        attempts.append(chunk)
+        raise Retryable('503')
+
+    report = _run(call, ['a'], retries=2)
+
+    assert len(attempts) == 3
+    assert report.failed == {'a': '503'}
+
+
+def test_permanent_failures_are_not_retried():
+    attempts = []
+
+    async def call(chunk):
+        attempts.append(chunk)
+        if 'b' in chunk:
+            raise ValueError('404')
+
+    report = _run(call, list('abc'), chunk_size=1)
+
+    assert sorted(attempts) == [['a'], ['b'], ['c']]
+    assert report.succeeded == ['a', 'c']
+    assert report.failed == {'b': '404'}
+
+
+def test_max_workers_one_keeps_order():
+    calls, running = [], []
+
+    async def call(chunk):
+        running.append(chunk)
+        assert len(running) == 1
+        await asyncio.sleep(0)
+        calls.append(chunk)
+        running.remove(chunk)
+
+    _run(call, list('abcdefg'), chunk_size=2, max_workers=1)
+
+    assert calls == [['a', 'b'], ['c', 'd'], ['e', 'f'], ['g']]
+
+
+def test_progress_fires_as_each_chunk_finishes():
+    """O progresso de um bloco rápido sai antes de o bloco lento da mesma rodada terminar."""
+    events = []
+    delays = {'slow': 0.05, 'fast': 0}
+
+    async def call(chunk):
+        await asyncio.sleep(delays[chunk[0]])
+        events.append(f'done {chunk[0]}')
+
+    def progress(report, total):
+        events.append((len(report.results), total))
+
+    _run(call, ['slow', 'fast'], chunk_size=1, progress=progress)
+
+    assert events == ['done fast', (1, 2), 'done slow', (2, 2)]
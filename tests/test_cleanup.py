@@ -0,0 +1,92 @@
+# tests/test_cleanup.py
+import numpy as np
+import pytest
+
+from cleanup import MATCH_ALL, MATCH_ANY, TrackColumns, cleanup_plan, parse_rules
+
+
+@pytest.fixture
+def columns(make_track):
+    return TrackColumns([
+        make_track('a', artists=('Beyoncé',), added_at='2019-06-01T10:00:00Z', duration_ms=30000),
+        make_track('b', artists=('Jay-Z', 'Beyoncé'), added_at='2021-03-15T00:00:00Z', explicit=True),
+        make_track('c', artists=('Nina Simone',), added_at='2023-01-10T00:00:00Z', duration_ms=400000),
+        make_track('d', artists=('Local',), added_at=None, duration_ms=None),
+    ])
+
+
+def test_parse_rules():
+    rules, match = parse_rules({
+        'added_before': '2020-01-01', 'duration_lt': '45.5', 'artist_in': 'Beyonce, , Nina Simone',
+        'explicit': 'on', 'not_in_playlist': '0', 'duration_gt': '  ', 'match': MATCH_ANY,
+    })
+
+    assert match == MATCH_ANY
+    assert rules == [
+        ('added_before', np.datetime64('2020-01-01', 's')),
+        ('artist_in', ['Beyonce', 'Nina Simone']),
+        ('duration_lt', 45500),
+        ('explicit', True),
+    ]
+    assert parse_rules({'match': 'qualquer'}) == ([], MATCH_ALL)
+
+
+@pytest.mark.parametrize('args', [
+    {'added_after': '31/12/2020'},
+    {'duration_gt': 'três'},
+    {'duration_lt': 'inf'},
+    {'duration_lt': 'nan'},
+    {'duration_gt': '1e400'},
+])
+def test_parse_rules_rejects_invalid_values(args):
+    with pytest.raises(ValueError):
+        parse_rules(args)
+
+
+def _plan(columns, args, **kwargs):
+    rules, match = parse_rules(args)
+    return cleanup_plan(columns, rules, match, **kwargs)
+
+
+def test_no_rules_selects_nothing(columns):
+    plan = _plan(columns, {})
+    assert (plan['matched'], plan['kept'], plan['track_ids']) == (0, 4, [])
+
+
+def test_artist_rule_ignores_accents_and_case(columns):
+    plan = _plan(columns, {'artist_in': 'BEYONCE'})
+
+    assert plan['track_ids'] == ['a', 'b']
+    assert plan['artists'] == [('Beyoncé', 2), ('Jay-Z', 1)]
+
+
+def test_match_all_and_any(columns):
+    args = {'added_before': '2022-01-01', 'explicit': '1'}
+
+    all_plan = _plan(columns, args)
+    any_plan = _plan(columns, dict(args, match=MATCH_ANY))
+
+    assert all_plan['track_ids'] == ['b']
+    assert any_plan['track_ids'] == ['a', 'b', 'd']
+    assert all_plan['rules'] == any_plan['rules'] == {'added_before': 3, 'explicit': 1}
+
+
+def test_dates_and_durations(columns):
+    # added_after inclui só o dia seguinte em diante; sem data conta como 1970
+    assert _plan(columns, {'added_after': '2021-03-15'})['track_ids'] == ['c']
+    # Faixas sem duração não contam como curtas
+    assert _plan(columns, {'duration_lt': '60'})['track_ids'] == ['a']
+    assert _plan(columns, {'duration_gt': '300'})['track_ids'] == ['c']
+
+
+def test_not_in_playlist(columns):
+    plan = _plan(columns, {'not_in_playlist': '1'}, playlist_track_ids={'b', 'c', 'unknown'})
+    assert plan['track_ids'] == ['a', 'd']
+
+
+def test_preview_is_limited_but_ids_are_complete(columns):
+    plan = _plan(columns, {'added_before': '2030-01-01'}, preview_size=2)
+
+    assert [track['id'] for track in plan['tracks']] == ['a', 'b']
+    assert plan['tracks'][1]['artist'] == 'Jay-Z'
+    assert plan['track_ids'] == ['a', 'b', 'c', 'd']
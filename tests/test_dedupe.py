@@ -0,0 +1,73 @@
+# tests/test_dedupe.py
+import pytest
+
+from dedupe import DURATION_BUCKET_MS, find_duplicates, recording_key, recording_title
+
+
+@pytest.mark.parametrize('name, title', [
+    ('Garota de Ipanema', 'garota de ipanema'),
+    ('Garota de Ipanema (Remastered 2011)', 'garota de ipanema'),
+    ('Garota de Ipanema - Single Version', 'garota de ipanema'),
+    ('Águas de Março [Versão Deluxe]', 'aguas de marco'),
+    ('Live (at Rio)', 'live at rio'),
+])
+def test_recording_title(name, title):
+    assert recording_title(name) == title
+
+
+def test_recording_key_needs_title_artist_and_duration(make_track):
+    assert recording_key(make_track('a', name='Só', artists=('Ná',), duration_ms=61000)) == ('na', 'so', 30)
+    assert recording_key(make_track('a', artists=())) is None
+    assert recording_key(make_track('a', duration_ms=None)) is None
+
+
+def _playlist_track(track_id, position, **fields):
+    return dict({'id': track_id, 'name': f'Faixa {track_id}', 'artists': ['Outro'], 'duration_ms': 100000},
+                position=position, **fields)
+
+
+def test_same_isrc_keeps_oldest_like(make_track):
+    saved = [
+        make_track('new', name='Canção', isrc='brabc', added_at='2024-05-01T00:00:00Z'),
+        make_track('old', name='Canção (Remastered)', isrc='BRABC', added_at='2020-01-01T00:00:00Z'),
+        make_track('other', name='Outra canção', duration_ms=90000),
+    ]
+    result = find_duplicates(saved)
+
+    assert result['saved_track_ids'] == ['new']
+    assert len(result['groups']) == 1
+    assert result['groups'][0]['keep'] == 'old'
+    assert {occurrence['id'] for occurrence in result['groups'][0]['occurrences']} == {'new', 'old'}
+
+
+def test_neighbouring_duration_buckets_match(make_track):
+    # Mesma gravação com durações que caem em faixas de 2s vizinhas
+    saved = [
+        make_track('a', name='Tema', added_at='2024-01-01T00:00:00Z', duration_ms=DURATION_BUCKET_MS * 50 - 100),
+        make_track('b', name='Tema - Album Version', added_at='2024-02-01T00:00:00Z', duration_ms=DURATION_BUCKET_MS * 50 + 100),
+        make_track('c', name='Tema', added_at='2024-03-01T00:00:00Z', duration_ms=DURATION_BUCKET_MS * 60),
+    ]
+    assert find_duplicates(saved)['saved_track_ids'] == ['b']
+
+
+def test_repeats_inside_editable_playlists(make_track):
+    playlists = [
+        {'id': 'p1', 'name': 'Minha', 'editable': True,
+         'tracks': [_playlist_track('x', 0), _playlist_track('y', 1), _playlist_track('x', 2), _playlist_track('x', 5)]},
+        {'id': 'p2', 'name': 'De outra pessoa', 'editable': False,
+         'tracks': [_playlist_track('x', 0), _playlist_track('x', 1)]},
+    ]
+    result = find_duplicates([], playlists)
+
+    assert result['saved_track_ids'] == []
+    assert result['playlist_items'] == {
+        'p1': [{'uri': 'spotify:track:x', 'position': 2}, {'uri': 'spotify:track:x', 'position': 5}],
+    }
+    assert len(result['groups']) == 1
+
+
+def test_liked_track_also_in_a_playlist_once_is_not_a_duplicate(make_track):
+    playlists = [{'id': 'p1', 'name': 'Minha', 'editable': True, 'tracks': [_playlist_track('a', 0)]}]
+    result = find_duplicates([make_track('a')], playlists)
+
+    assert result == {'groups': [], 'saved_track_ids': [], 'playlist_items': {}}
@@ -0,0 +1,89 @@
+# tests/test_json_api.py
+import pytest
+
+from config import Config
+from json_api import ApiError, FIELDS, cursor_offset, decode_cursor, encode_cursor, page, page_limit, parse_fields
+
+
+@pytest.fixture
+def tracks(make_track):
+    return [make_track(f't{number:02d}') for number in range(25)]
+
+
+def _walk(items_by_version, limit, fields=('id',)):
+    """Percorre as páginas seguindo next_cursor; `items_by_version` dá os itens a cada página."""
+    seen, cursor, number = [], None, 0
+    while True:
+        version, items = items_by_version(number)
+        result = page(items, cursor, limit, fields, version)
+        seen.extend(item['id'] for item in result['items'])
+        cursor, number = result['next_cursor'], number + 1
+        if cursor is None:
+            return seen
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(7, 40, 'abc')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (7, 40, 'abc')
+
+
+@pytest.mark.parametrize('cursor', ['@@@', 'bm90LWpzb24', encode_cursor(1, 2, 'x')[:-3]])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ApiError):
+        decode_cursor(cursor)
+
+
+def test_cursor_offset(tracks):
+    assert cursor_offset(tracks, None, 1) == 0
+    # Mesma versão: o deslocamento vale direto
+    assert cursor_offset(tracks, encode_cursor(1, 10, 't03'), 1) == 10
+    # Versão nova: continua depois do último item entregue
+    assert cursor_offset(tracks, encode_cursor(1, 10, 't03'), 2) == 4
+    # Último item sumiu (ou ausente): volta ao deslocamento, limitado ao tamanho da lista
+    assert cursor_offset(tracks, encode_cursor(1, 10, 'gone'), 2) == 10
+    assert cursor_offset(tracks, encode_cursor(1, 99, None), 2) == len(tracks)
+
+
+def test_parse_fields():
+    assert parse_fields('tracks', None) == FIELDS['tracks'][1]
+    assert parse_fields('tracks', ' id, name ,artist') == ('id', 'name', 'artist')
+    with pytest.raises(ApiError):
+        parse_fields('tracks', 'id,markets')
+    with pytest.raises(ApiError):
+        parse_fields('artists', ' , ')
+
+
+def test_page_projects_fields(tracks):
+    result = page(tracks, None, 2, ('id', 'artist'), 5)
+
+    assert result['items'] == [{'id': 't00', 'artist': 'Artista'}, {'id': 't01', 'artist': 'Artista'}]
+    assert result['total'] == 25
+    assert result['version'] == 5
+    assert decode_cursor(result['next_cursor']) == (5, 2, 't01')
+
+
+def test_pages_cover_every_item_once(tracks):
+    assert _walk(lambda number: (1, tracks), 10) == [track.id for track in tracks]
+
+
+def test_pages_survive_library_changes(tracks, make_track):
+    """Remoções e curtidas novas entre as páginas não fazem pular nem repetir itens."""
+    def items_by_version(number):
+        if number == 0:
+            return 1, tracks
+        # Depois da primeira página: duas músicas já entregues e uma ainda não saíram
+        remaining = [track for track in tracks if track.id not in ('t02', 't05', 't12')]
+        return 2, [make_track('new')] + remaining
+
+    seen = _walk(items_by_version, 8)
+    expected = [track.id for track in tracks if track.id != 't12']
+    assert seen == expected
+
+
+def test_page_limit():
+    assert page_limit(None) == Config.API_PAGE_SIZE
+    assert page_limit('0') == 1
+    assert page_limit(str(Config.API_MAX_PAGE_SIZE + 1)) == Config.API_MAX_PAGE_SIZE
+    with pytest.raises(ApiError):
+        page_limit('dez')
@@ -0,0 +1,78 @@
+# tests/test_remove_by_artist.py
+import pytest
+
+import api
+from bulk import BulkReport
+from library_store import LibraryStore, track_row
+
+
+def _item(track_id, *artists):
+    return {'added_at': '2024-01-01T00:00:00Z', 'track': {
+        'id': track_id, 'name': f'Música {track_id}', 'album': {'id': 'al1', 'name': 'Álbum', 'images': []},
+        'artists': [{'id': artist_id, 'name': name} for artist_id, name in artists],
+    }}
+
+
+class FakeAio:
+    """Só o remove_liked_tracks do AsyncSpotifyHandler, guardando os IDs recebidos."""
+
+    def __init__(self, token_info):
+        self.token_info = token_info
+        self.user_id = 'user'
+        self.removed = None
+
+    async def remove_liked_tracks(self, track_ids, progress=None):
+        self.removed = list(track_ids)
+        return BulkReport()
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LibraryStore(str(tmp_path / 'library.db'))
+    items = [
+        _item('t1', ('acdc', 'AC/DC')),
+        _item('t2', ('acdc', 'AC/DC')),
+        _item('t3', ('acdc-cover', 'AC DC')),
+        _item('t4', ('sigur', 'Sigur Rós'), ('acdc', 'AC/DC')),
+        _item('t5', ('other', 'Outro')),
+    ]
+    store.replace_saved_tracks('user', [track_row(item) for item in items], len(items))
+    return store
+
+
+@pytest.fixture
+def handler(store, monkeypatch):
+    monkeypatch.setattr(api, 'get_oauth_manager', lambda: None)
+    monkeypatch.setattr(api, 'get_library_store', lambda: store)
+    handler = api.SpotifyHandler()
+    handler.token_info = {'access_token': 'token'}
+    handler.user_id = 'user'
+    handler.sp = object()
+    handler._aio = FakeAio(handler.token_info)
+    monkeypatch.setattr(handler, 'sync_saved_tracks', lambda: None)
+    return handler
+
+
+def test_saved_artists_by_name_groups_by_artist_id(store):
+    assert store.saved_artists_by_name('user', 'ac/dc') == [
+        {'id': 'acdc', 'name': 'AC/DC', 'track_count': 3},
+        {'id': 'acdc-cover', 'name': 'AC DC', 'track_count': 1},
+    ]
+    assert store.saved_artists_by_name('user', 'sigur ros') == [{'id': 'sigur', 'name': 'Sigur Rós', 'track_count': 1}]
+    assert store.saved_artists_by_name('user', 'Ninguém') == []
+
+
+def test_name_matching_several_artists_removes_nothing(handler):
+    with pytest.raises(api.AmbiguousArtistError) as error:
+        handler.remove_liked_tracks(artist_list=['AC/DC'])
+
+    assert [artist['id'] for artist in error.value.candidates] == ['acdc', 'acdc-cover']
+    assert handler._aio.removed is None
+
+
+def test_remove_by_unique_name_or_chosen_id(handler):
+    handler.remove_liked_tracks(artist_list=['SIGUR ROS'])
+    assert handler._aio.removed == ['t4']
+
+    handler.remove_liked_tracks(artist_ids=['acdc-cover'])
+    assert handler._aio.removed == ['t3']
@@ -0,0 +1,76 @@
+# tests/test_saved_tracks_sync.py
+import pytest
+
+import api
+from library_store import LibraryStore, SAVED_TRACKS, track_row
+
+ALBUM_SAVED_AT = '2024-03-01T12:00:00Z'
+
+
+def _item(track_id, added_at):
+    return {'added_at': added_at, 'track': {
+        'id': track_id, 'name': f'Música {track_id}', 'artists': [{'id': 'ar1', 'name': 'Artista'}],
+        'album': {'id': 'al1', 'name': 'Álbum', 'images': []}, 'duration_ms': 200000,
+    }}
+
+
+class FakeSavedTracks:
+    """Só o /me/tracks do spotipy, da mais recente para a mais antiga."""
+
+    def __init__(self, items):
+        self.items = items
+        self.calls = 0
+
+    def current_user_saved_tracks(self, limit, offset):
+        self.calls += 1
+        return {'items': self.items[offset:offset + limit], 'total': len(self.items)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LibraryStore(str(tmp_path / 'library.db'))
+
+
+@pytest.fixture
+def handler(store, monkeypatch):
+    monkeypatch.setattr(api, 'get_oauth_manager', lambda: None)
+    monkeypatch.setattr(api, 'get_library_store', lambda: store)
+    handler = api.SpotifyHandler()
+    handler.user_id = 'user'
+
+    def full_sync(user_id):
+        raise AssertionError('a sincronização incremental não deveria recarregar a biblioteca')
+    monkeypatch.setattr(handler, '_full_sync_saved_tracks', full_sync)
+    return handler
+
+
+def test_latest_saved_tracks_returns_every_id_at_the_latest_instant(store):
+    items = [_item('a', ALBUM_SAVED_AT), _item('b', ALBUM_SAVED_AT), _item('old', '2024-01-01T00:00:00Z')]
+    store.replace_saved_tracks('user', [track_row(item) for item in items], len(items))
+
+    assert store.latest_saved_tracks('user') == (ALBUM_SAVED_AT, {'a', 'b'})
+    assert store.latest_saved_tracks('other') is None
+
+
+def test_incremental_sync_with_tied_added_at_does_not_reload(store, handler):
+    # Álbum salvo de uma vez: as faixas têm o mesmo added_at, e o Spotify pode
+    # devolvê-las em qualquer ordem entre uma leitura e outra
+    album = [_item(track_id, ALBUM_SAVED_AT) for track_id in ('t1', 't2', 't3')]
+    older = [_item('old', '2024-01-01T00:00:00Z')]
+    store.replace_saved_tracks('user', [track_row(item) for item in album + older], 4)
+
+    new = [_item('new', '2024-04-01T00:00:00Z')]
+    handler.sp = FakeSavedTracks(new + album[::-1] + older)
+    handler.sync_saved_tracks()
+
+    assert set(store.saved_track_ids('user')) == {'new', 't1', 't2', 't3', 'old'}
+    assert store.get_sync_state('user', SAVED_TRACKS)[1] == 5
+
+
+def test_incremental_sync_keeps_new_tracks_saved_in_the_same_instant(store, handler):
+    store.replace_saved_tracks('user', [track_row(_item('t1', ALBUM_SAVED_AT))], 1)
+
+    handler.sp = FakeSavedTracks([_item('t1', ALBUM_SAVED_AT), _item('t2', ALBUM_SAVED_AT)])
+    handler.sync_saved_tracks()
+
+    assert set(store.saved_track_ids('user')) == {'t1', 't2'}
@@ -0,0 +1,125 @@
+# tests/test_stats.py
+import random
+import time
+
+import pytest
+
+from stats import LibraryStats, SEED_LIMIT
+
+
+def _added_at(seconds_ago):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() - seconds_ago))
+
+
+@pytest.fixture
+def library(make_track):
+    """Biblioteca sintética: 600 músicas, 40 artistas (algumas com dois), 60 álbuns em ~2 anos."""
+    rng = random.Random(7)
+    artists = [f'Artista {number}' for number in range(40)]
+    tracks = []
+    for number in range(600):
+        names = rng.sample(artists, rng.choice((1, 1, 1, 2)))
+        album = rng.randrange(60)
+        tracks.append(make_track(
+            f't{number}', artists=names, album_id=f'al{album}', album_name=f'Álbum {album}',
+            # Segundos distintos por música: os pesos por recência não empatam
+            added_at=_added_at(number * 86400 + rng.randrange(86400)),
+        ))
+    return tracks
+
+
+def _summary(stats):
+    summary = dict(stats.summary())
+    summary.pop('elapsed_ms')
+    return summary
+
+
+def test_summary_counts(make_track):
+    tracks = [
+        make_track('a', artists=('X',), album_id='al1', album_name='Um', added_at='2024-01-05T00:00:00Z'),
+        make_track('b', artists=('X', 'Y'), album_id='al1', album_name='Um', added_at='2024-01-20T00:00:00Z'),
+        make_track('c', artists=('Z',), album_id='al2', album_name='Dois', added_at='2024-03-01T00:00:00Z'),
+    ]
+    summary = LibraryStats(tracks).summary()
+
+    assert summary['total'] == 3
+    assert summary['artists_total'] == 3
+    assert summary['albums_total'] == 2
+    assert summary['top_artists'][0]['name'] == 'X'
+    assert summary['top_artists'][0]['tracks'] == 2
+    assert summary['top_albums'][0] == {'id': 'al1', 'name': 'Um', 'tracks': 2}
+    assert summary['months'] == [{'month': '2024-01', 'tracks': 2}, {'month': '2024-03', 'tracks': 1}]
+
+
+def test_recent_artists_weigh_recent_likes_more(make_track):
+    # Velho tem mais músicas, mas curtidas há anos; Novo tem menos, curtidas hoje
+    tracks = [make_track(f'old{n}', artists=('Velho',), added_at=_added_at(1000 * 86400 + n)) for n in range(5)]
+    tracks += [make_track(f'new{n}', artists=('Novo',), added_at=_added_at(n)) for n in range(2)]
+    summary = LibraryStats(tracks, half_life_days=30).summary()
+
+    assert summary['top_artists'][0]['name'] == 'Velho'
+    assert summary['recent_artists'][0]['name'] == 'Novo'
+    assert summary['seeds'][0] == 'id-Novo'
+
+
+def test_seeds_skip_local_artists_and_respect_limit(make_track):
+    tracks = [make_track('local', artists=('Local',), artist_ids=(None,), added_at=_added_at(0))]
+    tracks += [make_track(f't{n}', artists=(f'A{n}',), added_at=_added_at(n + 1)) for n in range(SEED_LIMIT + 3)]
+    seeds = LibraryStats(tracks).seeds()
+
+    assert None not in seeds
+    assert len(seeds) == SEED_LIMIT
+
+
+def test_add_ignores_known_tracks(library):
+    stats = LibraryStats(library[:10])
+    version = stats.version
+    stats.add(library[:10])
+
+    assert len(stats) == 10
+    assert stats.version == version
+
+
+def test_incremental_update_matches_rebuild(library):
+    """update() aplicado em várias rodadas dá o mesmo resumo que montar as colunas do zero."""
+    rng = random.Random(3)
+    current = {track.id: track for track in library[:400]}
+    stats = LibraryStats(list(current.values()))
+    pending = library[400:]
+
+    for _ in range(6):
+        removed = rng.sample(sorted(current), 70)
+        added, pending = pending[:30], pending[30:]
+        stats.update(added, removed)
+        for track_id in removed:
+            del current[track_id]
+        current.update((track.id, track) for track in added)
+
+        rebuilt = LibraryStats(sorted(current.values(), key=lambda track: track.added_at, reverse=True))
+        assert len(stats) == len(rebuilt) == len(current)
+        assert _summary(stats) == _summary(rebuilt)
+
+    # Mais da metade das linhas originais saiu: as colunas foram compactadas no caminho
+    assert len(stats.ids) < 400 + 180
+
+
+def test_removed_tracks_can_be_added_back(library):
+    stats = LibraryStats(library[:50])
+    stats.remove([track.id for track in library[:50]])
+    assert stats.summary()['total'] == 0
+
+    stats.add(library[:5])
+    assert _summary(stats) == _summary(LibraryStats(library[:5]))
+
+
+def test_playlist_overlap(make_track):
+    stats = LibraryStats([make_track(track_id) for track_id in 'abcd'])
+    overlap = stats.playlist_overlap({
+        'p1': frozenset({'a', 'b', 'x'}),
+        'p2': frozenset({'b'}),
+        'p3': frozenset({'y'}),
+    })
+
+    assert overlap['in_playlists'] == 2
+    assert overlap['only_liked'] == 2
+    assert overlap['playlists'] == [{'id': 'p1', 'liked': 2, 'tracks': 3}, {'id': 'p2', 'liked': 1, 'tracks': 1}]